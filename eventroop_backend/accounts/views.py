@@ -8,6 +8,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated,AllowAny
 from django.shortcuts import get_object_or_404
+from django.db.models import Count, Q
 from .permissions import IsVSREOwner,IsCreator,IsVSREOwnerOrManager,IsMasterAdmin
 from .models import CustomUser, UserHierarchy, PricingModel, UserPlan
 from .serializers import *
@@ -144,28 +145,44 @@ class OwnerViewSet(viewsets.ReadOnlyModelViewSet):
         return user
     
     def list(self, request, *args, **kwargs):
-        owners = self.filter_queryset(self.get_queryset())
-
-        # Use CustomUserManager methods for counts
-        data = []
-        for owner in owners:
-            managers = CustomUser.objects.get_all_managers_under_owner(owner)
-            staff = CustomUser.objects.get_staff_under_owner(owner)
+        # Same counts as CustomUserManager.get_all_managers_under_owner /
+        # get_staff_under_owner, for the whole page in one GROUP BY
+        # (a GROUP BY drops Meta.ordering: order explicitly for stable pages)
+        owners = self.filter_queryset(
+            self.get_queryset()
+            .annotate(
+                manager_count=Count(
+                    "organization_users",
+                    filter=Q(organization_users__user__user_type__in=[
+                        CustomUser.UserTypes.VSRE_MANAGER,
+                        CustomUser.UserTypes.LINE_MANAGER,
+                    ]),
+                ),
+                staff_count=Count(
+                    "organization_users",
+                    filter=Q(organization_users__user__user_type=CustomUser.UserTypes.VSRE_STAFF),
+                ),
+            )
+            .order_by("id")
+        )
 
-            data.append({
+        page = self.paginate_queryset(owners)
+        data = [
+            {
                 "id": owner.id,
                 "first_name": owner.first_name,
                 "last_name": owner.last_name,
                 "email": owner.email,
                 "mobile_number": owner.mobile_number,
                 "city": owner.city,
-                "manager_count": managers.count(),
-                "staff_count": staff.count(),
-            })
+                "manager_count": owner.manager_count,
+                "staff_count": owner.staff_count,
+            }
+            for owner in (page if page is not None else owners)
+        ]
 
-        page = self.paginate_queryset(data)
         if page is not None:
-            return self.get_paginated_response(page)
+            return self.get_paginated_response(data)
 
         return Response(data)
 
@@ -4,6 +4,7 @@ from django.db.models import Sum
 from django.utils.timezone import now
 from django.urls import reverse
 from .models import AttendanceStatus, Attendance,AttendanceReport
+from . import recompute, registry
 
 
 # ------------------------------------------
@@ -126,14 +127,18 @@ class AttendanceAdmin(admin.ModelAdmin):
     # ----------------------------
     @admin.action(description="Mark selected as Present")
     def mark_present(self, request, queryset):
-        status = AttendanceStatus.objects.filter(code="P", is_active=True).first()
+        status = registry.resolve("present")
         if status:
+            # update() sends no post_save: queue the reports it makes stale
+            recompute.enqueue(queryset.values_list("user_id", "date"))
             queryset.update(status=status)
 
     @admin.action(description="Mark selected as Absent")
     def mark_absent(self, request, queryset):
-        status = AttendanceStatus.objects.filter(code="A", is_active=True).first()
+        status = registry.resolve("absent")
         if status:
+            # update() sends no post_save: queue the reports it makes stale
+            recompute.enqueue(queryset.values_list("user_id", "date"))
             queryset.update(status=status)
 
     # ----------------------------
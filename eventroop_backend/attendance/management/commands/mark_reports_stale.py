@@ -0,0 +1,39 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Min
+
+from attendance import recompute
+from attendance.models import Attendance
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark users' attendance and salary reports stale from their first attendance "
+        "(or --since) so the attendance worker rebuilds them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, nargs="*", help="Only these user ids")
+        parser.add_argument("--since", help="Rebuild from this date (YYYY-MM-DD) instead")
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            try:
+                since = date.fromisoformat(options["since"])
+            except ValueError:
+                raise CommandError("--since must be a YYYY-MM-DD date")
+
+        first_dates = Attendance.objects.values("user_id").annotate(first=Min("date")).order_by()
+        if options["user"]:
+            first_dates = first_dates.filter(user_id__in=options["user"])
+
+        with transaction.atomic():
+            count = 0
+            for row in first_dates:
+                recompute.mark_stale(row["user_id"], since or row["first"])
+                count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Marked reports of {count} users stale"))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-16 19:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_customuser_is_deleted'),
+        ('attendance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportFreshness',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='report_freshness', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('stale_from', models.DateField(blank=True, null=True)),
+                ('marked_at', models.DateTimeField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Report Freshness',
+                'verbose_name_plural': 'Report Freshness',
+                'indexes': [models.Index(condition=models.Q(('stale_from__isnull', False)), fields=['stale_from'], name='report_freshness_stale')],
+            },
+        ),
+    ]
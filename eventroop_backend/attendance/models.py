@@ -169,4 +169,39 @@ class AttendanceReport(models.Model):
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.start_date} to {self.end_date}"
-    
\ No newline at end of file
+
+
+class ReportFreshness(models.Model):
+    """
+    Dirty marker of one user's stored AttendanceReport and SalaryReport rows.
+
+    stale_from is the earliest date whose reports no longer match their
+    sources (None when fresh). Report reads only check it; the
+    attendance.recompute worker rebuilds the periods from there on and
+    clears it.
+    """
+
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="report_freshness",
+    )
+    stale_from = models.DateField(null=True, blank=True)
+    marked_at = models.DateTimeField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Report Freshness"
+        verbose_name_plural = "Report Freshness"
+        indexes = [
+            models.Index(
+                fields=["stale_from"],
+                name="report_freshness_stale",
+                condition=models.Q(stale_from__isnull=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} stale from {self.stale_from}" if self.stale_from else f"{self.user_id} fresh"
+
@@ -0,0 +1,307 @@
+"""
+Queued attendance → AttendanceReport → SalaryReport recomputation.
+
+Saving or deleting an Attendance no longer recomputes anything in the
+request. Once its transaction commits, the signal adds "<user_id>:<date>" to
+a Redis set (duplicates collapse) and, at most once per DEBOUNCE_SECONDS,
+schedules attendance.tasks.drain_attendance_queue.
+
+The worker pops the set in batches and for each batch:
+    1. resolves every user's salary period type with one SalaryStructure query
+    2. folds the dates into (user, period) pairs, each recomputed once
+    3. aggregates them with one GROUP BY per period type (aggregate_periods)
+    4. upserts their AttendanceReports with one bulk INSERT ... ON CONFLICT
+    5. refreshes each user's SalaryReports once (SalaryCalculator)
+
+A batch that fails is pushed back onto the set and retried by the next run.
+If Redis or the broker is unreachable when enqueueing, the periods are
+recomputed in the request instead, so a report is never left stale.
+
+Changes that stale a whole stretch of history (salary structures, salary
+payments: the salary carry-forward runs through every later period) are
+recorded durably instead, as a ReportFreshness.stale_from date per user
+(mark_stale). The same worker rebuilds every period from that date and
+clears the marker, unless it was marked again meanwhile.
+
+Report GETs never recompute: they serve the stored rows and use
+stale_from() to tell the client (and the worker) when those are behind.
+"""
+import bisect
+from collections import defaultdict
+from datetime import date, timedelta
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+
+QUEUE_KEY = "attendance:recompute:pending"
+SCHEDULED_KEY = "attendance:recompute:scheduled"
+
+DEBOUNCE_SECONDS = 5
+BATCH_SIZE = 500
+MARKER_BATCH_SIZE = 50
+
+DEFAULT_PERIOD_TYPE = "MONTHLY"
+
+_client = None
+
+
+def _redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.ATTENDANCE_QUEUE_URL)
+    return _client
+
+
+def _member(user_id, day):
+    return f"{user_id}:{day.isoformat()}"
+
+
+def _parse(member):
+    if isinstance(member, bytes):
+        member = member.decode()
+    user_id, day = member.split(":", 1)
+    return int(user_id), date.fromisoformat(day)
+
+
+# ── Enqueue ────────────────────────────────────────────────────────────────────
+def enqueue(entries):
+    """Queue (user_id, date) pairs for recomputation once the current transaction commits."""
+    entries = {(user_id, day) for user_id, day in entries if user_id and day}
+    if entries:
+        transaction.on_commit(lambda: push(entries))
+
+
+def _schedule(client):
+    """Schedule a drain unless one is already due (debounce)."""
+    from .tasks import drain_attendance_queue
+
+    # The first change of a window schedules the drain, later ones ride along
+    if client.set(SCHEDULED_KEY, 1, nx=True, ex=DEBOUNCE_SECONDS):
+        drain_attendance_queue.apply_async(countdown=DEBOUNCE_SECONDS)
+
+
+def push(entries):
+    """Add (user_id, date) pairs to the queue now and make sure a drain is scheduled."""
+    try:
+        client = _redis()
+        client.sadd(QUEUE_KEY, *(_member(user_id, day) for user_id, day in entries))
+        _schedule(client)
+    except (redis.RedisError, OperationalError) as e:
+        print(f"Attendance queue unavailable, recomputing inline: {e}")
+        recompute(entries)
+
+
+# ── Freshness markers ──────────────────────────────────────────────────────────
+def mark_stale(user_id, since):
+    """Record, once the current transaction commits, that the user's reports from `since` on are stale."""
+    if user_id and since:
+        transaction.on_commit(lambda: _mark(user_id, since))
+
+
+def _mark(user_id, since):
+    from accounts.models import CustomUser
+
+    from .models import ReportFreshness
+
+    # The user may be going away with the change that marked it (cascading delete)
+    if not CustomUser.objects.filter(pk=user_id).exists():
+        return
+
+    now = timezone.now()
+    marker, created = ReportFreshness.objects.get_or_create(
+        user_id=user_id, defaults={"stale_from": since, "marked_at": now},
+    )
+    if not created:
+        # Keep the earliest stale date of concurrent marks
+        ReportFreshness.objects.filter(pk=user_id).update(
+            stale_from=Least(Coalesce("stale_from", Value(since)), Value(since)),
+            marked_at=now,
+        )
+
+    try:
+        _schedule(_redis())
+    except (redis.RedisError, OperationalError) as e:
+        # The marker is durable: the periodic drain picks it up
+        print(f"Attendance queue unavailable, leaving reports of user {user_id} to the next drain: {e}")
+
+
+def _pending_from(user_id):
+    """Earliest date of the user still waiting in the queue (drained within seconds, so short)."""
+    try:
+        members = _redis().sscan_iter(QUEUE_KEY, match=f"{user_id}:*", count=BATCH_SIZE)
+        return min((_parse(member)[1] for member in members), default=None)
+    except redis.RedisError:
+        return None
+
+
+def stale_from(user_id):
+    """
+    Earliest stale report date of the user, None when fresh: the durable
+    marker (one primary key read) or an attendance change still queued.
+    A batch a worker has already popped and is recomputing is not seen.
+    """
+    from .models import ReportFreshness
+
+    marked = (
+        ReportFreshness.objects
+        .filter(pk=user_id, stale_from__isnull=False)
+        .values_list("stale_from", flat=True)
+        .first()
+    )
+    pending = _pending_from(user_id)
+    return min((day for day in (marked, pending) if day), default=None)
+
+
+def _refresh_marked(batch_size=MARKER_BATCH_SIZE):
+    """Rebuild every period from stale_from of up to `batch_size` marked users."""
+    from .models import ReportFreshness
+
+    markers = list(
+        ReportFreshness.objects
+        .filter(stale_from__isnull=False)
+        .order_by("stale_from")
+        .values_list("user_id", "stale_from", "marked_at")[:batch_size]
+    )
+    if not markers:
+        return 0, 0
+
+    today = date.today()
+    entries = [
+        (user_id, since + timedelta(days=offset))
+        for user_id, since, _ in markers
+        for offset in range(max((today - since).days, 0) + 1)
+    ]
+    result = recompute(entries)
+
+    for user_id, _, marked_at in markers:
+        # A mark that arrived during the rebuild stays for the next run
+        ReportFreshness.objects.filter(pk=user_id, marked_at=marked_at).update(
+            stale_from=None, refreshed_at=timezone.now(),
+        )
+    return result
+
+
+# ── Drain ──────────────────────────────────────────────────────────────────────
+def drain(batch_size=BATCH_SIZE):
+    """
+    Pop and recompute the queue until it is empty, then rebuild the users
+    marked stale; returns (periods, users) recomputed.
+    """
+    client = _redis()
+    # Changes arriving from here on schedule a fresh drain
+    client.delete(SCHEDULED_KEY)
+
+    periods = users = 0
+    while True:
+        members = client.spop(QUEUE_KEY, batch_size)
+        if not members:
+            break
+        try:
+            batch_periods, batch_users = recompute(_parse(member) for member in members)
+        except Exception:
+            client.sadd(QUEUE_KEY, *members)
+            raise
+        periods += batch_periods
+        users += batch_users
+
+    while True:
+        batch_periods, batch_users = _refresh_marked()
+        if not batch_users:
+            return periods, users
+        periods += batch_periods
+        users += batch_users
+
+
+# ── Recompute ──────────────────────────────────────────────────────────────────
+def _period_types(user_ids):
+    """{user_id: ([effective_from, ...], [salary_type, ...])} from one query."""
+    from payroll.models import SalaryStructure
+
+    timelines = defaultdict(lambda: ([], []))
+    rows = (
+        SalaryStructure.objects
+        .filter(user_id__in=user_ids, change_type__in=["BASE_SALARY", "INCREMENT"])
+        .order_by("user_id", "effective_from")
+        .values_list("user_id", "effective_from", "salary_type")
+    )
+    for user_id, effective_from, salary_type in rows:
+        dates, types = timelines[user_id]
+        dates.append(effective_from)
+        types.append(salary_type)
+    return timelines
+
+
+def _period_type(timeline, day):
+    """Salary type of the latest structure effective on `day` (get_period_type)."""
+    dates, types = timeline
+    index = bisect.bisect_right(dates, day)
+    return types[index - 1] if index else DEFAULT_PERIOD_TYPE
+
+
+def recompute(entries):
+    """
+    Recompute the AttendanceReports of the periods containing the given
+    (user_id, date) pairs and then those users' SalaryReports.
+    Returns (periods, users) recomputed.
+    """
+    from accounts.models import CustomUser
+    from payroll.utils import SalaryCalculator
+
+    from .models import Attendance
+    from .utils import EMPTY_PERIOD, AttendanceCalculator, aggregate_periods, build_report, save_reports
+
+    dates_by_user = defaultdict(set)
+    for user_id, day in entries:
+        dates_by_user[user_id].add(day)
+    if not dates_by_user:
+        return 0, 0
+
+    users = CustomUser.objects.in_bulk(list(dates_by_user))
+    timelines = _period_types(list(users))
+
+    # {period_type: {(user_id, start, end)}}
+    periods = defaultdict(set)
+    for user_id in users:
+        for day in dates_by_user[user_id]:
+            period_type = _period_type(timelines[user_id], day)
+            start, end = AttendanceCalculator._get_period(day, period_type)
+            periods[period_type].add((user_id, start, end))
+
+    reports = []
+    with transaction.atomic():
+        # One GROUP BY per period type, over each user's span of queued periods
+        for period_type, wanted in periods.items():
+            spans = {}
+            for user_id, start, end in wanted:
+                first, last = spans.get(user_id, (start, end))
+                spans[user_id] = (min(first, start), max(last, end))
+            ranges = Q()
+            for user_id, span in spans.items():
+                ranges |= Q(user_id=user_id, date__range=span)
+            totals = aggregate_periods(Attendance.objects.filter(ranges), period_type)
+
+            for user_id, start, end in sorted(wanted):
+                metrics = totals.get((user_id, start), EMPTY_PERIOD)
+                reports.append(build_report(users[user_id], start, end, period_type, metrics))
+
+        # One upsert for the batch; fires no post_save, so salaries are refreshed below once per user
+        save_reports(reports)
+
+        # The salary ledger only changes from each user's earliest recomputed period on
+        since = {}
+        for report in reports:
+            if report.user_id not in since or report.start_date < since[report.user_id]:
+                since[report.user_id] = report.start_date
+        for user_id, user in users.items():
+            SalaryCalculator(user).refresh_salary_reports(since=since[user_id])
+
+    for user_id in users:
+        cache.delete(f"attendance_reports_{user_id}")
+
+    return len(reports), len(users)
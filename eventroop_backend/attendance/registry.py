@@ -0,0 +1,133 @@
+"""
+Process-wide registry of AttendanceStatus rows.
+
+Statuses change a few times a year but are resolved on every attendance
+save, report and salary run. Each process keeps them all in memory, loaded
+with one query and keyed by:
+    pk                        → status              (serializers)
+    code                      → status              (codes are unique)
+    owner id, canonical code  → status              (calculators, bulk marking)
+
+Canonical codes are CANONICAL_CODES' keys ("present", "absent", ...).
+A status maps to one when its code equals the key's code or one of its
+aliases. Failing that, the key falls back to the first status, by label,
+whose code contains the key's code, as the old `code__icontains` lookups
+did. Statuses owned by a superuser are the global ones (owner None).
+
+The post_save / post_delete handlers in attendance.signals drop the local
+copy and, once the transaction commits, bump a version key in the shared
+cache. Other processes compare that version on every lookup (one cache
+read, no query) and reload when it moved.
+"""
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = "attendance:statuses:v"
+VERSION_TIMEOUT = 60 * 60 * 24 * 30
+
+CANONICAL_CODES = {
+    "present": ("PRESENT", "P"),
+    "absent": ("ABSENT", "A"),
+    "paid_leave": ("PAID_LEAVE",),
+    "half_day": ("HALF_DAY",),
+    "weekly_off": ("WEEKLY_OFF",),
+    "unpaid_leave": ("UNPAID_LEAVE",),
+}
+
+_registry = None
+
+
+class StatusRegistry:
+    def __init__(self, statuses, version):
+        self.version = version
+        self.by_pk = {status.pk: status for status in statuses}
+        self.by_code = {status.code.upper(): status for status in statuses}
+        self.by_owner = {}
+
+        grouped = defaultdict(list)
+        for status in statuses:
+            grouped[None if status.owner.is_superuser else status.owner_id].append(status)
+        for owner_id, owned in grouped.items():
+            active = sorted((status for status in owned if status.is_active), key=lambda s: s.label)
+            self.by_owner[owner_id] = {
+                key: self._match(active, codes) for key, codes in CANONICAL_CODES.items()
+            }
+
+    @staticmethod
+    def _match(statuses, codes):
+        for status in statuses:
+            if status.code.upper() in codes:
+                return status
+        for status in statuses:
+            if codes[0] in status.code.upper():
+                return status
+        return None
+
+    def resolve(self, key, owner_id=None):
+        """Active status for canonical `key`: the owner's own, else the global one."""
+        if owner_id is not None:
+            status = self.by_owner.get(owner_id, {}).get(key)
+            if status is not None:
+                return status
+        return self.by_owner.get(None, {}).get(key)
+
+    def canonical(self, owner_id=None):
+        """{canonical key: status or None} (AttendanceCalculator.status)."""
+        return {key: self.resolve(key, owner_id) for key in CANONICAL_CODES}
+
+
+# ── Access ─────────────────────────────────────────────────────────────────────
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), VERSION_TIMEOUT)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_registry():
+    global _registry
+    from .models import AttendanceStatus
+
+    version = _current_version()
+    registry = _registry
+    if registry is None or registry.version != version:
+        statuses = list(AttendanceStatus.objects.select_related("owner"))
+        registry = _registry = StatusRegistry(statuses, version)
+    return registry
+
+
+def by_pk(pk):
+    return get_registry().by_pk.get(pk)
+
+
+def by_code(code):
+    return get_registry().by_code.get((code or "").upper())
+
+
+def resolve(key, owner_id=None):
+    return get_registry().resolve(key, owner_id)
+
+
+def canonical(owner_id=None):
+    return get_registry().canonical(owner_id)
+
+
+# ── Invalidation ───────────────────────────────────────────────────────────────
+def _bump():
+    global _registry
+    _registry = None
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), VERSION_TIMEOUT)
+
+
+def invalidate():
+    """Drop this process's copy now and every other process's once the transaction commits."""
+    global _registry
+    _registry = None
+    transaction.on_commit(_bump)
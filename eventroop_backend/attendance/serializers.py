@@ -1,6 +1,7 @@
 # serializers.py
 from rest_framework import serializers
 from .models import Attendance, AttendanceStatus,AttendanceReport
+from . import registry
 
 
 class AttendanceStatusSerializer(serializers.ModelSerializer):    
@@ -10,10 +11,27 @@ class AttendanceStatusSerializer(serializers.ModelSerializer):
         read_only_fields = ['owner']
 
 
+class RegistryStatusField(serializers.PrimaryKeyRelatedField):
+    """AttendanceStatus by pk, resolved from attendance.registry instead of a query."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            status = registry.by_pk(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if status is None:
+            self.fail('does_not_exist', pk_value=data)
+        return status
+
+
 class AttendanceSerializer(serializers.ModelSerializer):
+    status = RegistryStatusField(queryset=AttendanceStatus.objects.all())
+
     # Quick access fields
-    status_label = serializers.CharField(source='status.label', read_only=True)
-    status_code = serializers.CharField(source='status.code', read_only=True)
+    status_label = serializers.SerializerMethodField()
+    status_code = serializers.SerializerMethodField()
     
     class Meta:
         model = Attendance
@@ -27,6 +45,17 @@ class AttendanceSerializer(serializers.ModelSerializer):
             'reason',
         ]
     
+    def _status(self, obj):
+        return registry.by_pk(obj.status_id)
+
+    def get_status_label(self, obj):
+        status = self._status(obj)
+        return status.label if status else None
+
+    def get_status_code(self, obj):
+        status = self._status(obj)
+        return status.code if status else None
+
     def validate(self, data):
         """Validate attendance data"""
         user = data.get('user')
@@ -2,7 +2,8 @@
 from celery import shared_task
 from django.utils import timezone
 from datetime import date
-from attendance.models import Attendance, AttendanceStatus
+from attendance.models import Attendance
+from attendance import recompute, registry
 from accounts.models import CustomUser
 
 
@@ -12,10 +13,9 @@ def mark_attendance_present():
     Mark attendance for all staff as Present for today.
     This task is scheduled to run daily via Celery Beat.
     """
-    try:
-        # Get the "Present" status with code "PRESENT"
-        present_status = AttendanceStatus.objects.get(code='PRESENT')
-    except AttendanceStatus.DoesNotExist:
+    # Get the "Present" status with code "PRESENT"
+    present_status = registry.by_code('PRESENT')
+    if present_status is None:
         return {
             'status': 'error',
             'message': "AttendanceStatus with code 'PRESENT' not found."
@@ -72,6 +72,8 @@ def mark_attendance_present():
             batch_size=5000,
             ignore_conflicts=False
         )
+        # bulk_create sends no post_save: queue the reports it made stale
+        recompute.enqueue((record.user_id, record.date) for record in created)
         return {
             'status': 'success',
             'message': f"Created {len(created)} attendance records marked as Present."
@@ -82,4 +84,30 @@ def mark_attendance_present():
             'status': 'warning',
             'message': "No new attendance records to create."
         }
-        
\ No newline at end of file
+
+
+@shared_task
+def drain_attendance_queue(batch_size=recompute.BATCH_SIZE):
+    """
+    Recompute the attendance and salary reports queued by the Attendance
+    signals (see attendance.recompute), one batch of (user, date) pairs at
+    a time, each (user, period) once.
+    """
+    try:
+        periods, users = recompute.drain(batch_size=batch_size)
+    except Exception as e:
+        return {
+            'status': 'error',
+            'message': f"Error recomputing attendance reports: {str(e)}"
+        }
+
+    if not users:
+        return {
+            'status': 'warning',
+            'message': "No queued attendance to recompute."
+        }
+
+    return {
+        'status': 'success',
+        'message': f"Recomputed {periods} attendance periods for {users} users."
+    }
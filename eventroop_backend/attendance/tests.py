@@ -1,3 +1,106 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import CustomUser
+
+from .models import Attendance, AttendanceStatus
+from .utils import REPORT_FIELDS, AttendanceCalculator
+
+STATUS_CODES = ["PRESENT", "ABSENT", "PAID_LEAVE", "HALF_DAY", "WEEKLY_OFF", "UNPAID_LEAVE"]
+
+
+def make_statuses(owner):
+    return [
+        AttendanceStatus.objects.create(owner=owner, code=code, label=code.title())
+        for code in STATUS_CODES
+    ]
+
+
+def make_staff(index):
+    return CustomUser.objects.create_user(
+        f"staff{index}@attendance.test", f"71100000{index:02}", "pw", first_name="S",
+        last_name=str(index), gender="M", user_type=CustomUser.UserTypes.VSRE_STAFF,
+        address="-", city="-",
+    )
+
+
+def seed_attendance(users, statuses, start, end, seed):
+    """A random status (and duration) on most days of the range; some days are left out."""
+    rng = random.Random(seed)
+    rows = []
+    for user in users:
+        day = start
+        while day <= end:
+            if rng.random() < 0.85:
+                rows.append(Attendance(
+                    user=user,
+                    date=day,
+                    status=rng.choice(statuses),
+                    duration=timedelta(minutes=rng.randrange(0, 10 * 60, 15)) if rng.random() < 0.7 else None,
+                ))
+            day += timedelta(days=1)
+    # bulk_create: no report recomputation is queued
+    Attendance.objects.bulk_create(rows)
+
+
+# ----------------------------------------------------------
+# GROUP BY PERIOD vs. ONE AGGREGATE PER PERIOD
+# ----------------------------------------------------------
+class PeriodAggregationTests(TestCase):
+    # Crosses month ends and the 2030/2031 new year, mid-week and mid-fortnight
+    START = date(2030, 11, 20)
+    END = date(2031, 2, 9)
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = CustomUser.objects.create_superuser(
+            "admin@attendance.test", "7110000000", "pw", first_name="A", last_name="A",
+            gender="M", address="-", city="-",
+        )
+        statuses = make_statuses(owner)
+        cls.users = [make_staff(index) for index in (1, 2)]
+        seed_attendance(cls.users, statuses, cls.START, cls.END, seed=23)
+
+    def assert_matches_per_period(self, reports):
+        self.assertTrue(reports)
+        for report in reports:
+            expected = AttendanceCalculator(report.user)._aggregate(report.start_date, report.end_date)
+            for field in REPORT_FIELDS:
+                with self.subTest(user=report.user_id, start=report.start_date, field=field):
+                    self.assertEqual(getattr(report, field), Decimal(str(expected[field])))
+
+    def test_periods_match_per_period_aggregates(self):
+        for period_type in ("WEEKLY", "FORTNIGHTLY", "MONTHLY"):
+            with self.subTest(period_type=period_type):
+                reports = AttendanceCalculator.build_all_periods_reports(
+                    self.users, self.START, self.END, period_type,
+                )
+                self.assert_matches_per_period(reports)
+
+    def test_periods_from_first_attendance(self):
+        for period_type in ("WEEKLY", "FORTNIGHTLY", "MONTHLY"):
+            with self.subTest(period_type=period_type):
+                reports = AttendanceCalculator.build_all_periods_reports(
+                    self.users, end_date=self.END, period_type=period_type,
+                )
+                self.assert_matches_per_period(reports)
+
+    def test_periods_cover_the_range_without_gaps(self):
+        expected_starts = {
+            "WEEKLY": [date(2030, 12, 23), date(2030, 12, 30), date(2031, 1, 6)],
+            "FORTNIGHTLY": [date(2030, 12, 16), date(2031, 1, 1), date(2031, 1, 16)],
+            "MONTHLY": [date(2030, 12, 1), date(2031, 1, 1), date(2031, 2, 1)],
+        }
+        for period_type, starts in expected_starts.items():
+            with self.subTest(period_type=period_type):
+                reports = AttendanceCalculator.build_all_periods_reports(
+                    self.users[:1], self.START, self.END, period_type,
+                )
+                for previous, report in zip(reports, reports[1:]):
+                    self.assertEqual(report.start_date, previous.end_date + timedelta(days=1))
+                self.assertLessEqual(reports[0].start_date, self.START)
+                self.assertGreaterEqual(reports[-1].end_date, self.END)
+                self.assertTrue(set(starts) <= {report.start_date for report in reports})
@@ -1,8 +1,119 @@
 import calendar
 from datetime import date, timedelta
 from decimal import Decimal
-from django.db.models import Count, Sum, Q
-from .models import Attendance, AttendanceStatus,AttendanceReport
+from django.db.models import Case, Count, DateField, F, Q, Sum, When
+from django.db.models.functions import Cast, TruncMonth, TruncWeek
+from .models import Attendance, AttendanceReport
+from . import registry
+
+REPORT_FIELDS = [
+    "present_days",
+    "absent_days",
+    "half_day_count",
+    "paid_leave_days",
+    "weekly_Offs",
+    "unpaid_leaves",
+    "total_payable_days",
+    "total_payable_hours",
+]
+
+
+# ---------------- Aggregation ----------------
+def _status_counts(status):
+    """Aggregates of one period, counting attendance per canonical status."""
+    return {
+        "present": Count("id", filter=Q(status=status["present"])),
+        "absent": Count("id", filter=Q(status=status["absent"])),
+        "paid_leave": Count("id", filter=Q(status=status["paid_leave"])),
+        "half_day": Count("id", filter=Q(status=status["half_day"])),
+        "weekly_off": Count("id", filter=Q(status=status["weekly_off"])),
+        "unpaid_leave": Count("id", filter=Q(status=status["unpaid_leave"])),
+        "total_duration": Sum("duration"),
+    }
+
+
+def _summarize(agg):
+    hours = (
+        Decimal(agg["total_duration"].total_seconds()) / 3600
+        if agg["total_duration"] else Decimal("0")
+    )
+
+    payable_days = agg["present"] + agg["paid_leave"] + Decimal("0.5") * agg["half_day"]
+
+    return {
+        "present_days": agg["present"],
+        "absent_days": agg["absent"],
+        "half_day_count": agg["half_day"],
+        "paid_leave_days": agg["paid_leave"],
+        "weekly_Offs": agg["weekly_off"],
+        "unpaid_leaves": agg["unpaid_leave"],
+        "total_payable_days": float(payable_days),
+        "total_payable_hours": float(hours),
+    }
+
+
+EMPTY_PERIOD = _summarize({
+    "present": 0, "absent": 0, "paid_leave": 0, "half_day": 0,
+    "weekly_off": 0, "unpaid_leave": 0, "total_duration": None,
+})
+
+
+def period_bucket(period_type):
+    """SQL expression for the start of the `period_type` period an Attendance.date falls in."""
+    if period_type in ("HOURLY", "DAILY"):
+        return F("date")
+
+    if period_type == "WEEKLY":
+        return TruncWeek("date", output_field=DateField())
+
+    month = TruncMonth("date", output_field=DateField())
+    if period_type == "FORTNIGHTLY":
+        # Nested, DATE_TRUNC's timestamp is not converted back to a date: cast both branches
+        return Case(
+            When(date__day__lte=15, then=Cast(month, output_field=DateField())),
+            default=Cast(month + timedelta(days=15), output_field=DateField()),
+            output_field=DateField(),
+        )
+
+    # MONTHLY
+    return month
+
+
+def aggregate_periods(queryset, period_type, status=None):
+    """
+    Attendance of `queryset` summed per user and `period_type` period in one
+    GROUP BY: {(user_id, period start): report metrics}. Periods without
+    attendance are absent (see EMPTY_PERIOD).
+    """
+    status = status or registry.canonical()
+    rows = (
+        queryset
+        .order_by()
+        .annotate(period_start=period_bucket(period_type))
+        .values("user_id", "period_start")
+        .annotate(**_status_counts(status))
+    )
+    return {(row["user_id"], row["period_start"]): _summarize(row) for row in rows}
+
+
+def build_report(user, start, end, period_type, metrics):
+    return AttendanceReport(
+        user=user,
+        start_date=start,
+        end_date=end,
+        period_type=period_type,
+        **{field: Decimal(str(metrics.get(field, 0))) for field in REPORT_FIELDS},
+    )
+
+
+def save_reports(reports):
+    """Upsert AttendanceReports in one statement (sends no post_save)."""
+    return AttendanceReport.objects.bulk_create(
+        reports,
+        update_conflicts=True,
+        unique_fields=["user", "start_date", "end_date", "period_type"],
+        update_fields=REPORT_FIELDS + ["updated_at"],
+    )
 
 
 class AttendanceCalculator:
@@ -13,7 +124,8 @@ class AttendanceCalculator:
         self.status = self._load_statuses()
 
     # ---------------- Period Helpers ----------------
-    def _get_period(self, base, period):
+    @staticmethod
+    def _get_period(base, period):
         if period in ("HOURLY", "DAILY"):
             return base, base
 
@@ -34,21 +146,27 @@ class AttendanceCalculator:
         last = calendar.monthrange(base.year, base.month)[1]
         return first, base.replace(day=last)
 
+    @classmethod
+    def _iter_periods(cls, start_date, end_date, period_type):
+        """(start, end) of every period from the one containing start_date through end_date."""
+        current = start_date
+        while current <= end_date:
+            start, end = cls._get_period(current, period_type)
+            yield start, end
+
+            # Move to next period
+            if period_type == "MONTHLY":
+                if start.month == 12:
+                    current = date(start.year + 1, 1, 1)
+                else:
+                    current = date(start.year, start.month + 1, 1)
+            else:
+                current = end + timedelta(days=1)
+
     # ---------------- Status ----------------
     def _load_statuses(self):
-        qs = AttendanceStatus.objects.filter(owner__is_superuser=True, is_active=True)
-
-        return {
-            k: qs.filter(code__icontains=k.upper()).first()
-            for k in [
-                "present",
-                "absent",
-                "paid_leave",
-                "half_day",
-                "weekly_off",
-                "unpaid_leave",
-            ]
-        }
+        # Global statuses by canonical code, from the in-process registry (no query)
+        return registry.canonical()
 
     # ---------------- Core Calculation ----------------
     def _aggregate(self, start, end):
@@ -56,35 +174,8 @@ class AttendanceCalculator:
             user=self.user,
             date__range=(start, end)
         )
+        return _summarize(qs.aggregate(**_status_counts(self.status)))
 
-        agg = qs.aggregate(
-            present=Count("id", filter=Q(status=self.status["present"])),
-            absent=Count("id", filter=Q(status=self.status["absent"])),
-            paid_leave=Count("id", filter=Q(status=self.status["paid_leave"])),
-            half_day=Count("id", filter=Q(status=self.status["half_day"])),
-            weekly_off=Count("id", filter=Q(status=self.status["weekly_off"])),
-            unpaid_leave=Count("id", filter=Q(status=self.status["unpaid_leave"])),
-            duration=Sum("duration"),
-        )
-
-        hours = (
-            Decimal(agg["duration"].total_seconds()) / 3600
-            if agg["duration"] else Decimal("0")
-        )
-
-        payable_days = agg["present"] + agg["paid_leave"] + Decimal("0.5") * agg["half_day"]
-
-        return {
-            "present_days": agg["present"],
-            "absent_days": agg["absent"],
-            "half_day_count": agg["half_day"],
-            "paid_leave_days": agg["paid_leave"],
-            "weekly_Offs": agg["weekly_off"],
-            "unpaid_leaves": agg["unpaid_leave"],
-            "total_payable_days": float(payable_days),
-            "total_payable_hours": float(hours),
-        }
-    
     # ---------------- Public APIs ----------------
     def get_attendance_report(self, base_date=None, period_type="MONTHLY"):
         base = base_date or self.base_date
@@ -104,74 +195,65 @@ class AttendanceCalculator:
             **self._aggregate(start_date, end_date),
         }
 
-    def get_all_periods_attendance(
-        self,
+    @classmethod
+    def build_all_periods_reports(
+        cls,
+        users,
         start_date=None,
         end_date=None,
         period_type="MONTHLY",
+        status=None,
     ):
-        first = (
-            Attendance.objects
-            .filter(user=self.user)
-            .order_by("date")
-            .only("date")
-            .first()
+        """
+        Unsaved AttendanceReports of every `period_type` period of each of
+        `users`, from start_date (default: the user's first attendance)
+        through end_date (default: today), aggregated with one query.
+        """
+        users = list(users)
+        end_date = end_date or date.today()
+
+        queryset = Attendance.objects.filter(
+            user__in=users,
+            date__lte=cls._get_period(end_date, period_type)[1],
         )
+        if start_date:
+            queryset = queryset.filter(date__gte=cls._get_period(start_date, period_type)[0])
 
-        if not first and not start_date:
-            return []
+        totals = aggregate_periods(queryset, period_type, status=status)
 
-        current = start_date or first.date
-        end_date = end_date or date.today()
+        first_period = {}
+        for user_id, start in totals:
+            if user_id not in first_period or start < first_period[user_id]:
+                first_period[user_id] = start
 
-        reports_to_save = []
+        reports = []
+        for user in users:
+            first = start_date or first_period.get(user.pk)
+            if first is None:
+                continue
 
-        while current <= end_date:
-            start, end = self._get_period(current, period_type)
-
-            report = self.get_attendance_report(start, period_type)
-
-            reports_to_save.append(
-                AttendanceReport(
-                    user=self.user,
-                    start_date=start,
-                    end_date=end,
-                    period_type=report["period_type"],
-                    present_days=Decimal(report.get("present_days", 0)),
-                    absent_days=Decimal(report.get("absent_days", 0)),
-                    half_day_count=Decimal(report.get("half_day_count", 0)),
-                    paid_leave_days=Decimal(report.get("paid_leave_days", 0)),
-                    weekly_Offs=Decimal(report.get("weekly_Offs", 0)),
-                    unpaid_leaves=Decimal(report.get("unpaid_leaves", 0)),
-                    total_payable_days=Decimal(report.get("total_payable_days", 0)),
-                    total_payable_hours=Decimal(report.get("total_payable_hours", 0)),
-                )
-            )
+            for start, end in cls._iter_periods(first, end_date, period_type):
+                metrics = totals.get((user.pk, start), EMPTY_PERIOD)
+                reports.append(build_report(user, start, end, period_type, metrics))
 
-            # Move to next period
-            if period_type == "MONTHLY":
-                if start.month == 12:
-                    current = date(start.year + 1, 1, 1)
-                else:
-                    current = date(start.year, start.month + 1, 1)
-            else:
-                current = end + timedelta(days=1)
+        return reports
 
-        # 🔥 Bulk upsert (Postgres / Django 4.1+)
-        AttendanceReport.objects.bulk_create(
-            reports_to_save,
-            update_conflicts=True,
-            unique_fields=["user", "start_date", "end_date", "period_type"],
-            update_fields=[
-                "present_days",
-                "absent_days",
-                "half_day_count",
-                "paid_leave_days",
-                "weekly_Offs",
-                "unpaid_leaves",
-                "total_payable_days",
-                "total_payable_hours",
-            ],
+    def get_all_periods_attendance(
+        self,
+        start_date=None,
+        end_date=None,
+        period_type="MONTHLY",
+    ):
+        reports_to_save = self.build_all_periods_reports(
+            [self.user],
+            start_date=start_date,
+            end_date=end_date,
+            period_type=period_type,
+            status=self.status,
         )
 
+        # 🔥 Bulk upsert (Postgres / Django 4.1+)
+        if reports_to_save:
+            save_reports(reports_to_save)
+
         return reports_to_save
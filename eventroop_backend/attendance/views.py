@@ -3,12 +3,9 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
-from django.db import transaction
-from django.shortcuts import get_object_or_404
-from accounts.models import CustomUser
 
 from .models import Attendance, AttendanceStatus,AttendanceReport
-from .utils import AttendanceCalculator
+from . import recompute
 from .permissions import IsSuperUserOrOwnerOrReadOnly
 from .serializers import (
     AttendanceSerializer,
@@ -83,7 +80,7 @@ class AttendanceView(APIView):
         if date:
             queryset = queryset.filter(date=date)
 
-        queryset = queryset.select_related('user', 'status').order_by('-date')
+        queryset = queryset.select_related('user').order_by('-date')
         serializer = AttendanceSerializer(queryset, many=True)
         
         return Response({
@@ -110,7 +107,7 @@ class AttendanceView(APIView):
 
         # Check if attendance already exists
         try:
-            attendance = Attendance.objects.select_related('user', 'status').get(
+            attendance = Attendance.objects.select_related('user').get(
                 user_id=user_id, 
                 date=date
             )
@@ -172,15 +169,19 @@ class AttendanceReportView(generics.ListAPIView):
     ]
     ordering = ["-start_date"]
     
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+
+        # Read-only: stored rows are served as they are, stale ones are rebuilt by the worker
+        user_id = request.query_params.get("user_id")
+        if user_id and user_id.isdigit():
+            stale_from = recompute.stale_from(int(user_id))
+            if stale_from:
+                response["X-Reports-Stale-From"] = stale_from.isoformat()
+        return response
+
     def get_queryset(self):
         user = self.request.user
-        
-        user_id = self.request.query_params.get("user_id")
-        if user_id:
-            report_user = get_object_or_404(CustomUser, id=user_id)
-
-            with transaction.atomic():
-                AttendanceCalculator(report_user).get_all_periods_attendance()
 
         if user.is_superuser:
             return self.queryset
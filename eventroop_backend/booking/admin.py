@@ -11,6 +11,7 @@ from .models import (
     TotalInvoice,
     Payment,
 )
+from . import rollups
 
 # Location
 @admin.register(Location)
@@ -183,8 +184,7 @@ class PrimaryOrderAdmin(admin.ModelAdmin):
 
     @admin.action(description="Recalculate total bills")
     def recalculate_totals(self, request, queryset):
-        for order in queryset:
-            order.recalculate_total()
+        PrimaryOrder.bulk_recalculate_total(queryset.values_list("id", flat=True))
         self.message_user(request, f"Recalculated totals for {queryset.count()} orders.")
 
 # ── SecondaryOrder ─────────────────────────────────────────────────────────────
@@ -251,8 +251,7 @@ class SecondaryOrderAdmin(admin.ModelAdmin):
 
     @admin.action(description="Recalculate subtotals")
     def recalculate_subtotals(self, request, queryset):
-        for order in queryset:
-            order.recalculate_subtotal()
+        rollups.mark_dirty(secondary_ids=list(queryset.values_list("id", flat=True)))
         self.message_user(request, f"Recalculated subtotals for {queryset.count()} secondary orders.")
 
 # ── TernaryOrder ───────────────────────────────────────────────────────────────
@@ -400,8 +399,7 @@ class TotalInvoiceAdmin(admin.ModelAdmin):
 
     @admin.action(description="Recalculate payments & status")
     def recalculate_payments(self, request, queryset):
-        for inv in queryset:
-            inv.recalculate_payments()
+        TotalInvoice.bulk_recalculate_payments(queryset.values_list("id", flat=True))
         self.message_user(request, f"Recalculated payments for {queryset.count()} invoices.")
 
 # ── Payment ────────────────────────────────────────────────────────────────────
@@ -0,0 +1,208 @@
+"""
+Free/busy lookups and double-booking checks for venues and services.
+
+Occupied time comes from two places:
+- SecondaryOrders of PrimaryOrders booked on the venue/service (the actual
+  periods, so specific-date bookings do not block the gaps between dates)
+- TernaryOrders booked on the venue/service, unless they belong to a
+  PrimaryOrder of that same venue/service (its period already counts)
+
+Both are found through (venue|service, end_datetime, start_datetime) indexes:
+an overlap with [start, end) is `end_datetime > start AND start_datetime < end`,
+a range scan on end_datetime bounded by the request window, so history
+outside the window is never read.
+
+A venue can hold `capacity` concurrent bookings (0 = unset → 1); a service
+is exclusive.
+"""
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from venue_manager.models import Venue, Service
+
+from .constants import BookingEntity, BookingStatus
+from .models import SecondaryOrder, TernaryOrder
+
+
+class BookingConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "The venue or service is already booked for this time."
+    default_code = "booking_conflict"
+
+
+# Periods end at 23:59:59.999999; a gap this small is not free time
+CONTIGUOUS = timedelta(microseconds=1)
+
+ENTITY_FIELDS = {
+    BookingEntity.VENUE: "venue",
+    BookingEntity.SERVICE: "service",
+}
+
+
+def capacity_of(entity, entity_id, lock=False):
+    """
+    Concurrent bookings the venue/service accepts, or None if it doesn't exist.
+    lock=True takes a row lock so concurrent bookings of it are serialized.
+    """
+    model = Venue if entity == BookingEntity.VENUE else Service
+    queryset = model.objects.filter(pk=entity_id)
+    if lock:
+        queryset = queryset.select_for_update()
+
+    if entity == BookingEntity.SERVICE:
+        return 1 if queryset.values_list("pk", flat=True).first() else None
+
+    capacity = queryset.values_list("capacity", flat=True).first()
+    if capacity is None:
+        return None
+    return capacity or 1
+
+
+def booked_intervals(entity, entity_id, start, end, exclude_primary_id=None):
+    """(start, end) of every active booking of the venue/service overlapping [start, end)."""
+    field = ENTITY_FIELDS[entity]
+
+    periods = (
+        SecondaryOrder.objects
+        .filter(**{
+            f"primary_order__{field}_id": entity_id,
+            "primary_order__end_datetime__gt": start,
+            "primary_order__start_datetime__lt": end,
+            "end_datetime__gt": start,
+            "start_datetime__lt": end,
+        })
+        .exclude(status=BookingStatus.CANCELLED)
+        .exclude(primary_order__status=BookingStatus.CANCELLED)
+    )
+    services = (
+        TernaryOrder.objects
+        .filter(**{
+            f"{field}_id": entity_id,
+            "end_datetime__gt": start,
+            "start_datetime__lt": end,
+        })
+        .exclude(status=BookingStatus.CANCELLED)
+        # Inside a booking of this venue/service: its period already occupies it
+        .exclude(**{f"secondary_order__primary_order__{field}_id": entity_id})
+    )
+    if exclude_primary_id:
+        periods = periods.exclude(primary_order_id=exclude_primary_id)
+        services = services.exclude(secondary_order__primary_order_id=exclude_primary_id)
+
+    return list(
+        periods.order_by().values_list("start_datetime", "end_datetime")
+        .union(services.order_by().values_list("start_datetime", "end_datetime"), all=True)
+    )
+
+
+def occupancy(intervals):
+    """
+    Sweep the intervals into non-overlapping segments:
+        [(segment_start, segment_end, concurrent_bookings), ...]
+    Touching intervals ([a, b) and [b, c)) do not overlap.
+    """
+    # Ends sort before starts at the same instant
+    events = sorted(
+        [(s, 1) for s, e in intervals if s < e] + [(e, -1) for s, e in intervals if s < e]
+    )
+
+    segments = []
+    count = 0
+    for (instant, delta), (next_instant, _) in zip(events, events[1:]):
+        count += delta
+        if count > 0 and instant < next_instant:
+            segments.append((instant, next_instant, count))
+    return segments
+
+
+def peak(segments, start, end):
+    """Highest concurrency of `segments` within [start, end)."""
+    ends = [segment_end for _, segment_end, _ in segments]
+    best = 0
+    for segment_start, segment_end, count in segments[bisect_right(ends, start):]:
+        if segment_start >= end:
+            break
+        best = max(best, count)
+    return best
+
+
+def free_busy(entity, entity_id, start, end):
+    """Free/busy breakdown of a venue/service over [start, end)."""
+    capacity = capacity_of(entity, entity_id)
+    if capacity is None:
+        return None
+
+    segments = [
+        (max(s, start), min(e, end), count)
+        for s, e, count in occupancy(booked_intervals(entity, entity_id, start, end))
+    ]
+
+    busy = []
+    for s, e, count in segments:
+        if count < capacity:
+            continue
+        if busy and s - busy[-1][1] <= CONTIGUOUS:
+            busy[-1] = (busy[-1][0], e)
+        else:
+            busy.append((s, e))
+
+    free = []
+    cursor = start
+    for s, e in busy:
+        if s - cursor > CONTIGUOUS:
+            free.append((cursor, s))
+        cursor = max(cursor, e)
+    if end - cursor > CONTIGUOUS:
+        free.append((cursor, end))
+
+    local = timezone.localtime
+    return {
+        "entity": entity,
+        "id": entity_id,
+        "capacity": capacity,
+        "available": not busy,
+        "busy": [{"start": local(s), "end": local(e)} for s, e in busy],
+        "free": [{"start": local(s), "end": local(e)} for s, e in free],
+        "booked": [
+            {"start": local(s), "end": local(e), "count": count}
+            for s, e, count in segments
+        ],
+    }
+
+
+def ensure_available(intervals, venue_id=None, service_id=None, exclude_primary_id=None):
+    """
+    Raise BookingConflict if adding `intervals` would overbook the venue or
+    the service. Locks the venue/service row until the transaction ends, so
+    call it inside the transaction that writes the booking.
+    """
+    intervals = [(s, e) for s, e in intervals if s < e]
+    if not intervals:
+        return
+
+    window_start = min(s for s, _ in intervals)
+    window_end = max(e for _, e in intervals)
+
+    for entity, entity_id in ((BookingEntity.VENUE, venue_id), (BookingEntity.SERVICE, service_id)):
+        if not entity_id:
+            continue
+
+        capacity = capacity_of(entity, entity_id, lock=True)
+        if capacity is None:
+            continue
+
+        segments = occupancy(
+            booked_intervals(entity, entity_id, window_start, window_end, exclude_primary_id)
+        )
+        if not segments:
+            continue
+
+        for s, e in intervals:
+            if peak(segments, s, e) >= capacity:
+                raise BookingConflict(
+                    f"{entity.label} is fully booked between {s.isoformat()} and {e.isoformat()}."
+                )
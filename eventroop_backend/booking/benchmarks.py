@@ -0,0 +1,417 @@
+"""
+API benchmark and query-budget regression suite.
+
+seed()     builds a realistic dataset: owners with staff, venues, services and
+           DAILY packages, patients, multi-year DAILY bookings (periods and
+           invoices), payments, attendance, attendance/salary reports.
+run()      requests every SCENARIOS endpoint through the full DRF stack and
+           records status, query count and wall-clock timings.
+compare()  diffs a report against a baseline report (another commit).
+
+A scenario's `budget` is the most queries it may run whatever the data size.
+None marks endpoints whose query count still grows with their result size
+(a known N+1); they are measured and reported but not enforced.
+
+Used by `manage.py benchmark_api` (JSON report against a local Postgres)
+and booking.tests.QueryBudgetTests (budgets on the "smoke" scale).
+"""
+import platform
+import statistics
+import subprocess
+import time
+from collections import namedtuple
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, UserHierarchy
+from attendance.models import Attendance, AttendanceReport, AttendanceStatus
+from payroll.models import SalaryReport, SalaryStructure
+from venue_manager.models import Venue, Service
+
+from .constants import BookingEntity, BookingType, PaymentMethod, PeriodChoices
+from .models import Location, Package, Patient, PrimaryOrder, TotalInvoice, Payment
+
+REPORT_VERSION = 1
+
+BENCH_DOMAIN = "bench.local"
+BENCH_PASSWORD = "bench-password"
+
+Scale = namedtuple(
+    "Scale",
+    ["owners", "staff_per_owner", "patients", "bookings_per_owner", "years", "attendance_days"],
+)
+
+SCALES = {
+    # Enough rows that every list has several pages and every N+1 shows
+    "smoke": Scale(owners=3, staff_per_owner=2, patients=60, bookings_per_owner=2, years=1, attendance_days=45),
+    "full": Scale(owners=1000, staff_per_owner=5, patients=50000, bookings_per_owner=1, years=3, attendance_days=365),
+}
+
+Scenario = namedtuple("Scenario", ["name", "role", "path", "budget"])
+
+# Paths are formatted with the seeded ids (see Dataset.ids)
+SCENARIOS = [
+    # booking
+    Scenario("bookings.list", "owner", "/booking/bookings/", 12),
+    Scenario("bookings.retrieve", "owner", "/booking/bookings/{order_id}/", 8),
+    Scenario("bookings.by_venue", "owner", "/booking/bookings/by_venue/", 12),
+    Scenario("invoices.list", "owner", "/booking/invoices/", 10),
+    Scenario("invoices.summary", "owner", "/booking/invoices/summary/", 6),
+    Scenario("invoices.overdue", "owner", "/booking/invoices/overdue/", 10),
+    Scenario("payments.list", "owner", "/booking/payments/", 6),
+    Scenario("patients.list", "owner", "/booking/patients/", 6),
+    Scenario("patients.lookup", "owner", "/booking/patients/lookup/?q=bench", 4),
+    Scenario("patients.dropdown", "owner", "/booking/patients/patient_dropdown/", 4),
+    Scenario("packages.by_belongs_to", "owner", "/booking/packages/by_belongs_to/?entity=venue&id={venue_id}", 6),
+    Scenario("venues.dropdown", "anonymous", "/booking/public-venues/venue_dropdown/", 3),
+    # accounts
+    Scenario("owners.list", "admin", "/accounts/vsre-owner/", 4),
+    # attendance
+    Scenario("attendance.list", "owner", "/attendance/attendance/?start_date={month_start}", 6),
+    Scenario("attendance.reports", "owner", "/attendance/total-attendance/", 6),
+    # payroll
+    Scenario("payroll.structures", "owner", "/payroll/salary-structures/", 6),
+    Scenario("payroll.reports", "owner", "/payroll/salary-report/", 6),
+]
+
+
+# ── Seeding ────────────────────────────────────────────────────────────────────
+class Dataset:
+    """The users and ids the scenarios run against."""
+
+    def __init__(self, admin, owner, ids):
+        self.admin = admin
+        self.owner = owner
+        self.ids = ids
+
+    @classmethod
+    def load(cls):
+        """The dataset a previous seed() left in the database, or None."""
+        admin = CustomUser.objects.filter(email=f"admin@{BENCH_DOMAIN}").first()
+        owner = CustomUser.objects.filter(email=f"owner-0@{BENCH_DOMAIN}").first()
+        if admin is None or owner is None:
+            return None
+
+        order = PrimaryOrder.objects.filter(user=owner).order_by("id").first()
+        return cls(admin, owner, {
+            "order_id": order.pk,
+            "venue_id": order.venue_id,
+            "month_start": timezone.localdate().replace(day=1).isoformat(),
+        })
+
+
+def _user(kind, index, user_type, password):
+    return CustomUser(
+        email=f"{kind}-{index}@{BENCH_DOMAIN}",
+        mobile_number=f"{'7' if kind == 'owner' else '6'}{index:09d}",
+        password=password,
+        first_name=kind.title(),
+        last_name=str(index),
+        gender="M",
+        user_type=user_type,
+        address="Bench address",
+        city="Bench City",
+    )
+
+
+def _month_end(first):
+    return (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def seed(scale, stdout=None):
+    """Create the dataset for `scale` (a Scale) and return its Dataset."""
+    def log(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    password = make_password(BENCH_PASSWORD)
+    today = timezone.localdate()
+
+    with transaction.atomic():
+        admin = CustomUser(
+            email=f"admin@{BENCH_DOMAIN}", mobile_number="5000000000", password=password,
+            first_name="Bench", last_name="Admin", gender="M",
+            user_type=CustomUser.UserTypes.MASTER_ADMIN, address="-", city="-",
+            is_superuser=True, is_staff=True,
+        )
+        admin.save()
+
+        # ── Users ──
+        owners = CustomUser.objects.bulk_create(
+            [_user("owner", i, CustomUser.UserTypes.VSRE_OWNER, password) for i in range(scale.owners)],
+            batch_size=1000,
+        )
+        staff = CustomUser.objects.bulk_create(
+            [
+                _user("staff", i, CustomUser.UserTypes.VSRE_STAFF, password)
+                for i in range(scale.owners * scale.staff_per_owner)
+            ],
+            batch_size=1000,
+        )
+        staff_owner = {member.pk: owners[i // scale.staff_per_owner] for i, member in enumerate(staff)}
+        UserHierarchy.objects.bulk_create(
+            [
+                UserHierarchy(user=member, parent=staff_owner[member.pk], owner=staff_owner[member.pk], level=1)
+                for member in staff
+            ],
+            batch_size=1000,
+        )
+        log(f"{len(owners)} owners, {len(staff)} staff")
+
+        # ── Catalog: one venue, service and DAILY package per owner ──
+        locations = Location.objects.bulk_create(
+            [
+                Location(
+                    location_type=BookingType.IN_HOUSE, building_name=f"Bench {i}",
+                    address_line1="Bench road", locality=f"Locality {i}", city="Bench City",
+                    state="Bench State", postal_code="100001",
+                )
+                for i in range(scale.owners)
+            ],
+            batch_size=1000,
+        )
+        venues = Venue.objects.bulk_create(
+            [Venue(owner=owner, name=f"Venue {i}", location=location)
+             for i, (owner, location) in enumerate(zip(owners, locations))],
+            batch_size=1000,
+        )
+        services = Service.objects.bulk_create(
+            [Service(owner=owner, name=f"Service {i}", address="Bench road", city="Bench City")
+             for i, owner in enumerate(owners)],
+            batch_size=1000,
+        )
+        venue_type = ContentType.objects.get_for_model(Venue)
+        packages = Package.objects.bulk_create(
+            [
+                Package(
+                    owner=owner, name=f"Daily {i}", price=Decimal("1500.00"),
+                    period=PeriodChoices.DAILY, package_type=BookingType.IN_HOUSE,
+                    content_type=venue_type, object_id=venue.pk,
+                )
+                for i, (owner, venue) in enumerate(zip(owners, venues))
+            ],
+            batch_size=1000,
+        )
+
+        # ── Patients, spread over the owners ──
+        patients = []
+        for i in range(scale.patients):
+            patient = Patient(
+                registered_by=owners[i % scale.owners],
+                patient_id=f"{i + 1:05}",
+                first_name=f"Bench{i}", last_name=f"Patient{i % 97}",
+                phone=f"9{i:09d}", email=f"patient-{i}@{BENCH_DOMAIN}", address="Bench road",
+                emergency_contact="Bench", emergency_phone="9999999999",
+                gender="male", id_proof="aadhar", id_proof_number=str(i),
+                patient_documents="patient_documents/bench.pdf",
+            )
+            patient.refresh_search_fields()
+            patients.append(patient)
+        patients = Patient.objects.bulk_create(patients, batch_size=2000)
+        log(f"{len(patients)} patients")
+
+    # ── Bookings: multi-year DAILY stays, half in the past ──
+    # Through the model API, so periods, totals and invoices are real
+    span = timedelta(days=365 * scale.years)
+    start = timezone.make_aware(datetime.combine(today, dt_time.min)) - span / 2
+    orders = 0
+    for i, owner in enumerate(owners):
+        own_patients = patients[i::scale.owners]
+        with transaction.atomic():
+            for n in range(scale.bookings_per_owner):
+                order = PrimaryOrder.objects.create(
+                    user=owner, patient=own_patients[n % len(own_patients)],
+                    booking_entity=BookingEntity.VENUE,
+                    venue=venues[i], service=services[i], package=packages[i],
+                    start_datetime=start + timedelta(days=n), end_datetime=start + timedelta(days=n) + span,
+                )
+                order.generate_secondary_full_range_dates()
+                orders += 1
+        if stdout is not None and (i + 1) % 100 == 0:
+            log(f"  bookings of {i + 1}/{len(owners)} owners")
+    log(f"{orders} bookings")
+
+    with transaction.atomic():
+        # ── Payments: settle every other invoice in full ──
+        invoices = TotalInvoice.objects.filter(secondary_order__isnull=False).order_by("id")
+        payments = [
+            Payment(
+                invoice_id=invoice["id"], patient_id=invoice["patient_id"], amount=invoice["total_amount"],
+                method=PaymentMethod.CASH, is_verified=n % 4 == 0,
+            )
+            for n, invoice in enumerate(invoices.values("id", "patient_id", "total_amount").iterator())
+            if n % 2 == 0 and invoice["total_amount"] > 0
+        ]
+        for batch in range(0, len(payments), 5000):
+            Payment.bulk_record(payments[batch:batch + 5000])
+        log(f"{len(payments)} payments")
+
+        # ── Attendance and reports ──
+        present, _ = AttendanceStatus.objects.get_or_create(
+            code="PRESENT", defaults={"owner": admin, "label": "Present"},
+        )
+        absent, _ = AttendanceStatus.objects.get_or_create(
+            code="ABSENT", defaults={"owner": admin, "label": "Absent"},
+        )
+        days = [today - timedelta(days=n) for n in range(scale.attendance_days)]
+        Attendance.objects.bulk_create(
+            (
+                Attendance(user=member, date=day, status=absent if (member.pk + day.toordinal()) % 7 == 0 else present)
+                for member in staff for day in days
+            ),
+            batch_size=5000,
+            ignore_conflicts=True,
+        )
+
+        months = sorted({day.replace(day=1) for day in days})
+        AttendanceReport.objects.bulk_create(
+            (
+                AttendanceReport(
+                    user=member, start_date=first, end_date=_month_end(first), period_type="MONTHLY",
+                    present_days=Decimal("24"), absent_days=Decimal("4"), total_payable_days=Decimal("26"),
+                )
+                for member in staff for first in months
+            ),
+            batch_size=5000,
+        )
+
+        # ── Payroll ──
+        SalaryStructure.objects.bulk_create(
+            (
+                SalaryStructure(
+                    user=member, amount=Decimal("30000.00"), final_salary=Decimal("30000.00"),
+                    effective_from=months[0],
+                )
+                for member in staff
+            ),
+            batch_size=5000,
+        )
+        SalaryReport.objects.bulk_create(
+            (
+                SalaryReport(
+                    user=member, start_date=first, end_date=_month_end(first),
+                    daily_rate=Decimal("1000.00"), total_payable_amount=Decimal("26000.00"),
+                    final_salary=Decimal("30000.00"), remaining_payment=Decimal("26000.00"),
+                )
+                for member in staff for first in months
+            ),
+            batch_size=5000,
+        )
+        log(f"{len(staff) * len(days)} attendance rows, {len(staff) * len(months)} monthly reports")
+
+    return Dataset.load()
+
+
+# ── Running ────────────────────────────────────────────────────────────────────
+def _client(dataset, role):
+    client = APIClient()
+    if role != "anonymous":
+        client.force_authenticate({"admin": dataset.admin, "owner": dataset.owner}[role])
+    # Load the middleware now: WhiteNoise indexes every static file when it is
+    # built, which would otherwise be timed as the first request's "cold" run.
+    client.handler.load_middleware()
+    return client
+
+
+def measure(dataset, scenario, repeat=5, client=None):
+    """Request one scenario `repeat` times; the first (cold cache) run sets the query count."""
+    client = client or _client(dataset, scenario.role)
+    path = scenario.path.format(**dataset.ids)
+
+    cache.clear()
+    timings = []
+    queries = None
+    status_code = None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(path)
+            timings.append((time.perf_counter() - started) * 1000)
+        if queries is None:
+            queries = len(captured.captured_queries)
+        status_code = response.status_code
+
+    return {
+        "path": path,
+        "role": scenario.role,
+        "status": status_code,
+        "queries": queries,
+        "budget": scenario.budget,
+        "over_budget": scenario.budget is not None and queries > scenario.budget,
+        "ms": {
+            "cold": round(timings[0], 2),
+            "median": round(statistics.median(timings[1:] or timings), 2),
+            "min": round(min(timings), 2),
+            "max": round(max(timings), 2),
+        },
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(dataset, scale=None, repeat=5, only=None):
+    """Measure every scenario (or those whose name starts with one of `only`); returns the report."""
+    results = {}
+    clients = {}
+    for scenario in SCENARIOS:
+        if only and not scenario.name.startswith(tuple(only)):
+            continue
+        if scenario.role not in clients:
+            clients[scenario.role] = _client(dataset, scenario.role)
+        results[scenario.name] = measure(
+            dataset, scenario, repeat=repeat, client=clients[scenario.role],
+        )
+
+    return {
+        "version": REPORT_VERSION,
+        "commit": _commit(),
+        "created_at": timezone.now().isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "database_version": getattr(connection, "pg_version", None),
+        },
+        "scale": scale._asdict() if scale else None,
+        "repeat": repeat,
+        "scenarios": results,
+    }
+
+
+# ── Comparing ──────────────────────────────────────────────────────────────────
+def compare(report, baseline, time_tolerance=1.5):
+    """
+    Regressions of `report` against `baseline`: any scenario that runs more
+    queries, changed status, or whose median got slower than
+    `time_tolerance` × the baseline median.
+    """
+    regressions = []
+    for name, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        if result["status"] != before["status"]:
+            regressions.append(f"{name}: status {before['status']} → {result['status']}")
+        if result["queries"] > before["queries"]:
+            regressions.append(f"{name}: queries {before['queries']} → {result['queries']}")
+        if result["ms"]["median"] > before["ms"]["median"] * time_tolerance:
+            regressions.append(
+                f"{name}: median {before['ms']['median']} ms → {result['ms']['median']} ms"
+            )
+    return regressions
@@ -68,6 +68,20 @@ MANUAL_STATUS_TRANSITIONS = {
     ]
 }
 
+# A manual status cascades from the changed order to its descendants that
+# could make the same transition themselves; these statuses are forced onto
+# every descendant instead (cancelling an order cancels all of it)
+FORCED_CASCADE_STATUSES = {
+    BookingStatus.CANCELLED,
+}
+
+# Order statuses that (re)generate a TotalInvoice
+INVOICE_TRIGGER_STATUSES = {
+    BookingStatus.UNFULFILLED,
+    BookingStatus.PARTIALLY_FULFILLED,
+    BookingStatus.FULFILLED,
+}
+
 class InvoiceStatus(models.TextChoices):
     UNPAID = 'UNPAID', 'Unpaid'
     PARTIALLY_PAID = 'PARTIALLY_PAID', 'Partially Paid'
@@ -0,0 +1,99 @@
+"""
+Cached, versioned dropdown lists with strong ETags.
+
+Keys:
+    booking:dropdown:<name>:<scope>:v                          version counter
+    booking:dropdown:<name>:<scope>:<SCHEMA>:<v>:<params>      serialized list
+
+<scope> is whose list it is ("public", a user id, an entity, ...) and
+<params> a hash of the query string (search/filter parameters).
+
+The ETag is derived from the same key, not from the payload, so answering
+`If-None-Match` with 304 costs one cache read and no query or serializer.
+A version only ever moves forward (and never reuses a value, even after
+eviction), so one ETag always names one byte-identical list.
+
+Like booking.snapshots, writers never delete lists: the post_save /
+post_delete handlers in booking.signals bump the affected versions once
+their transaction commits (invalidate()).
+DROPDOWN_SCHEMA is bumped whenever a dropdown's output changes.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+DROPDOWN_SCHEMA = 1
+DROPDOWN_TIMEOUT = 60 * 60 * 24       # 1 day
+VERSION_TIMEOUT = 60 * 60 * 24 * 7    # outlives the lists it points to
+
+
+def _version_key(name, scope):
+    return f"booking:dropdown:{name}:{scope}:v"
+
+
+def _fresh_version():
+    return time.time_ns()
+
+
+# ── Invalidation ───────────────────────────────────────────────────────────────
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_version(), VERSION_TIMEOUT)
+
+
+def invalidate(*pairs):
+    """Retire the (name, scope) lists once the current transaction commits."""
+    keys = {_version_key(name, scope) for name, scope in pairs if scope is not None}
+    if keys:
+        transaction.on_commit(lambda: _bump(keys))
+
+
+# ── Reads ──────────────────────────────────────────────────────────────────────
+def _version(name, scope):
+    key = _version_key(name, scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def _params(request):
+    query = sorted(
+        (key, value) for key, values in request.query_params.lists() for value in values
+    )
+    return hashlib.sha1(repr(query).encode()).hexdigest()[:16]
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+
+def cached_response(request, name, scope, build):
+    """
+    Response with the `name` dropdown of `scope`, built by `build()` (a
+    JSON-ready list) only when no current copy is cached; 304 when the
+    client's If-None-Match already names the current version.
+    """
+    key = f"booking:dropdown:{name}:{scope}:{DROPDOWN_SCHEMA}:{_version(name, scope)}:{_params(request)}"
+    etag = f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if _etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    data = cache.get(key)
+    if data is None:
+        data = list(build())
+        cache.set(key, data, DROPDOWN_TIMEOUT)
+    return Response(data, headers=headers)
@@ -0,0 +1,248 @@
+"""
+Streaming ledger exports: invoices, payments and order line items
+(SecondaryOrder periods + TernaryOrder services) as CSV or XLSX.
+
+Rows are read with `.values(...).iterator(chunk_size=CHUNK_SIZE)`, so no
+model instances are built and at most one chunk is held in memory:
+- CSV is generated row by row into a StreamingHttpResponse
+- XLSX uses openpyxl's write-only mode, which spools rows to a temporary
+  file; the finished file is streamed from disk
+
+export_ledger_file() runs the same writers into the "exports" storage for
+jobs too large for a request (booking.tasks.export_ledger).
+"""
+import csv
+import tempfile
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db.models import Q
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .models import PrimaryOrder, SecondaryOrder, TernaryOrder, TotalInvoice, Payment
+
+CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = ("csv", "xlsx")
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+# ── Columns ────────────────────────────────────────────────────────────────────
+# (header, values() path)
+
+INVOICE_COLUMNS = [
+    ("Invoice ID", "id"),
+    ("Invoice Number", "invoice_number"),
+    ("Secondary Order", "secondary_order__order_id"),
+    ("Ternary Order", "ternary_order__order_id"),
+    ("Patient First Name", "patient__first_name"),
+    ("Patient Last Name", "patient__last_name"),
+    ("User", "user__email"),
+    ("Period Start", "period_start"),
+    ("Period End", "period_end"),
+    ("Issued Date", "issued_date"),
+    ("Due Date", "due_date"),
+    ("Status", "status"),
+    ("Subtotal", "subtotal"),
+    ("Discount", "discount_amount"),
+    ("Premium", "premium_amount"),
+    ("Tax", "tax_amount"),
+    ("Total", "total_amount"),
+    ("Paid", "paid_amount"),
+    ("Remaining", "remaining_amount"),
+]
+
+PAYMENT_COLUMNS = [
+    ("Payment ID", "id"),
+    ("Reference", "reference"),
+    ("Invoice Number", "invoice__invoice_number"),
+    ("Patient First Name", "patient__first_name"),
+    ("Patient Last Name", "patient__last_name"),
+    ("Amount", "amount"),
+    ("Method", "method"),
+    ("Paid Date", "paid_date"),
+    ("Verified", "is_verified"),
+    ("Created At", "created_at"),
+]
+
+LINE_ITEM_HEADERS = [
+    "Type", "Order ID", "Primary Order", "Patient First Name", "Patient Last Name",
+    "Venue", "Service", "Package", "Start", "End", "Status", "Subtotal",
+]
+
+# Line items: "Type" is the source's constant, the rest are these paths
+SECONDARY_LINE_PATHS = [
+    "order_id", "primary_order__order_id",
+    "primary_order__patient__first_name", "primary_order__patient__last_name",
+    "primary_order__venue__name", "primary_order__service__name", "primary_order__package__name",
+    "start_datetime", "end_datetime", "status", "subtotal",
+]
+
+TERNARY_LINE_PATHS = [
+    "order_id", "secondary_order__primary_order__order_id",
+    "secondary_order__primary_order__patient__first_name",
+    "secondary_order__primary_order__patient__last_name",
+    "venue__name", "service__name", "package__name",
+    "start_datetime", "end_datetime", "status", "subtotal",
+]
+
+
+# ── Sources ────────────────────────────────────────────────────────────────────
+# A source is (values queryset, [path, ...], constant first cell or None)
+
+def invoice_sources(invoices):
+    paths = [path for _, path in INVOICE_COLUMNS]
+    return [h for h, _ in INVOICE_COLUMNS], [(invoices.order_by("id").values(*paths), paths, None)]
+
+
+def payment_sources(payments):
+    paths = [path for _, path in PAYMENT_COLUMNS]
+    return [h for h, _ in PAYMENT_COLUMNS], [(payments.order_by("id").values(*paths), paths, None)]
+
+
+def line_item_sources(orders):
+    """Line items of the PrimaryOrders in `orders`: every period, then every service."""
+    order_ids = orders.order_by().values("id")
+    return LINE_ITEM_HEADERS, [
+        (
+            SecondaryOrder.objects.filter(primary_order__in=order_ids)
+            .order_by("primary_order_id", "start_datetime", "id")
+            .values(*SECONDARY_LINE_PATHS),
+            SECONDARY_LINE_PATHS,
+            "SECONDARY",
+        ),
+        (
+            TernaryOrder.objects.filter(secondary_order__primary_order__in=order_ids)
+            .order_by("secondary_order__primary_order_id", "start_datetime", "id")
+            .values(*TERNARY_LINE_PATHS),
+            TERNARY_LINE_PATHS,
+            "TERNARY",
+        ),
+    ]
+
+
+EXPORTS = {
+    "invoices": (TotalInvoice, invoice_sources),
+    "payments": (Payment, payment_sources),
+    "line_items": (PrimaryOrder, line_item_sources),
+}
+
+
+def visible_to(kind, user):
+    """Base queryset of an export kind, limited the way the API limits customers."""
+    model, _ = EXPORTS[kind]
+    queryset = model.objects.all()
+    if user is not None and user.is_customer:
+        owner = "invoice__user" if model is Payment else "user"
+        queryset = queryset.filter(Q(patient__registered_by=user) | Q(**{owner: user}))
+    return queryset
+
+
+# ── Rows ───────────────────────────────────────────────────────────────────────
+# Text starting with these is run as a formula by spreadsheet apps
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _cell(value):
+    # Spreadsheets can't hold tz-aware datetimes; export local wall-clock time
+    if isinstance(value, datetime):
+        return timezone.localtime(value).replace(tzinfo=None) if timezone.is_aware(value) else value
+    # User-entered text (names, references, ...) is shown, never evaluated
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def iter_rows(headers, sources):
+    yield headers
+    for queryset, paths, kind in sources:
+        for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+            cells = [_cell(row[path]) for path in paths]
+            yield [kind, *cells] if kind else cells
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (date, Decimal)):
+        return str(value)
+    return value
+
+
+def csv_chunks(headers, sources):
+    writer = csv.writer(_Echo())
+    for row in iter_rows(headers, sources):
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def write_xlsx(headers, sources, fileobj, title="Export"):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    for row in iter_rows(headers, sources):
+        # Excel rounds to milliseconds: 23:59:59.999999 would become the next day
+        sheet.append([
+            value.replace(microsecond=0) if isinstance(value, datetime) else value
+            for value in row
+        ])
+    workbook.save(fileobj)
+
+
+# ── Responses / files ──────────────────────────────────────────────────────────
+def _filename(kind, file_format):
+    return f"{kind}-{timezone.localtime():%Y%m%d-%H%M%S}.{file_format}"
+
+
+def export_response(kind, queryset, file_format="csv"):
+    """Stream `queryset` (of the kind's base model) as a download."""
+    _, build = EXPORTS[kind]
+    headers, sources = build(queryset)
+    filename = _filename(kind, file_format)
+
+    if file_format == "xlsx":
+        spool = tempfile.TemporaryFile()
+        write_xlsx(headers, sources, spool, title=kind)
+        spool.seek(0)
+        return FileResponse(
+            spool, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE
+        )
+
+    response = StreamingHttpResponse(csv_chunks(headers, sources), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_ledger_file(kind, file_format="csv", user=None, queryset=None):
+    """
+    Write a whole export (`queryset`, default: everything `user` can see)
+    into the "exports" storage. Returns (name, url).
+    """
+    _, build = EXPORTS[kind]
+    headers, sources = build(queryset if queryset is not None else visible_to(kind, user))
+
+    with tempfile.TemporaryFile() as spool:
+        if file_format == "xlsx":
+            write_xlsx(headers, sources, spool, title=kind)
+        else:
+            for chunk in csv_chunks(headers, sources):
+                spool.write(chunk.encode())
+        spool.seek(0)
+
+        storage = storages["exports"]
+        name = storage.save(
+            f"exports/{kind}/{uuid.uuid4().hex[:8]}-{_filename(kind, file_format)}",
+            File(spool),
+        )
+    return name, storage.url(name)
@@ -0,0 +1,95 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from booking import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a benchmark dataset into a throwaway test database, time the main "
+        "booking/invoice/attendance/payroll endpoints against their query budgets "
+        "and write a JSON report (optionally compared with a baseline report)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", choices=sorted(benchmarks.SCALES), default="smoke")
+        for field in benchmarks.Scale._fields:
+            parser.add_argument(
+                f"--{field.replace('_', '-')}", dest=field, type=int, help=f"Override the scale's {field}",
+            )
+        parser.add_argument("--repeat", type=int, default=5, help="Requests per scenario")
+        parser.add_argument("--only", nargs="*", help="Scenario name prefixes, e.g. bookings invoices.list")
+        parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+        parser.add_argument("--baseline", help="JSON report of another commit to compare against")
+        parser.add_argument("--time-tolerance", type=float, default=1.5,
+                            help="Allowed median slowdown factor against the baseline")
+        parser.add_argument("--keepdb", action="store_true",
+                            help="Keep (and reuse) the seeded test database between runs")
+
+    def handle(self, *args, **options):
+        scale = benchmarks.SCALES[options["scale"]]._replace(**{
+            field: options[field] for field in benchmarks.Scale._fields if options[field] is not None
+        })
+
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as fh:
+                baseline = json.load(fh)
+
+        # Same isolation as `manage.py test`: never touches the configured database
+        settings.DEBUG = False
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options["keepdb"])
+        try:
+            dataset = benchmarks.Dataset.load()
+            if dataset is None:
+                self.stdout.write(f"Seeding {options['scale']} dataset: {dict(scale._asdict())}")
+                dataset = benchmarks.seed(scale, stdout=self.stdout)
+            else:
+                self.stdout.write("Reusing the seeded test database")
+
+            report = benchmarks.run(dataset, scale=scale, repeat=options["repeat"], only=options["only"])
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options["keepdb"])
+
+        self._print_table(report)
+
+        content = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(content)
+            self.stdout.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(content)
+
+        failures = [
+            f"{name}: {result['queries']} queries > budget {result['budget']}"
+            for name, result in report["scenarios"].items() if result["over_budget"]
+        ]
+        failures += [
+            f"{name}: HTTP {result['status']}"
+            for name, result in report["scenarios"].items() if result["status"] >= 400
+        ]
+        if baseline is not None:
+            failures += benchmarks.compare(report, baseline, time_tolerance=options["time_tolerance"])
+
+        if failures:
+            for failure in failures:
+                self.stdout.write(self.style.ERROR(f"❌ {failure}"))
+            raise CommandError(f"{len(failures)} benchmark regression(s)")
+
+        self.stdout.write(self.style.SUCCESS("✅ All scenarios within budget"))
+
+    def _print_table(self, report):
+        self.stdout.write(
+            f"\n{'scenario':<24} {'status':>6} {'queries':>8} {'budget':>7} {'cold ms':>9} {'median ms':>10}"
+        )
+        for name, result in report["scenarios"].items():
+            budget = "-" if result["budget"] is None else result["budget"]
+            self.stdout.write(
+                f"{name:<24} {result['status']:>6} {result['queries']:>8} {budget:>7} "
+                f"{result['ms']['cold']:>9.1f} {result['ms']['median']:>10.1f}"
+            )
+        self.stdout.write("")
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from timeit import timeit
+
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from booking.constants import PeriodChoices
+from booking.periods import split_periods
+
+
+# ----------------------------------------------------------
+# REFERENCE: the loop-based PrimaryOrder helpers booking.periods replaced
+# ----------------------------------------------------------
+def legacy_monthly_periods(start, end):
+    periods = []
+    current = start
+
+    while current < end:
+        next_period_start = current + relativedelta(months=1)
+        period_end = min(next_period_start - timedelta(days=1), end)
+        periods.append((current, period_end))
+        current = next_period_start
+
+    return periods
+
+
+def legacy_split_into_days(start, end, chunk_days=None):
+    if start >= end:
+        return []
+
+    periods = []
+    current = start
+
+    while current < end:
+        chunk_end = min(current + timedelta(days=chunk_days), end) if chunk_days else end
+
+        day_cursor = current
+        while day_cursor < chunk_end:
+            day_end = min(
+                day_cursor.replace(hour=23, minute=59, second=59, microsecond=999999),
+                end,
+            )
+            periods.append((day_cursor, day_end))
+            day_cursor += timedelta(days=1)
+
+        current = chunk_end
+
+    return periods
+
+
+LEGACY_SPLITTERS = {
+    PeriodChoices.MONTHLY: legacy_monthly_periods,
+    PeriodChoices.WEEKLY: lambda s, e: legacy_split_into_days(s, e, chunk_days=7),
+    PeriodChoices.DAILY: legacy_split_into_days,
+    PeriodChoices.HOURLY: legacy_split_into_days,
+}
+
+RANGES = [
+    ("1 day", timedelta(days=1)),
+    ("1 week", timedelta(weeks=1)),
+    ("1 month", timedelta(days=31)),
+    ("1 year", timedelta(days=365)),
+    ("5 years", timedelta(days=5 * 365 + 1)),
+]
+
+# Month-end / leap-day anchors exercise relativedelta's day clamping
+ANCHORS = [
+    datetime(2025, 1, 31, 10, 30),
+    datetime(2024, 2, 29, 0, 0),
+    datetime(2025, 3, 15, 23, 59, 59),
+]
+
+
+class Command(BaseCommand):
+    help = "Verify booking.periods against the legacy loop helpers and time both"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--number", type=int, default=50, help="Timing iterations per case")
+
+    def handle(self, *args, **options):
+        number = options["number"]
+        tz = timezone.get_current_timezone()
+        mismatches = 0
+
+        self.stdout.write(f"Timezone: {tz}  |  iterations: {number}\n")
+        self.stdout.write(
+            f"{'period':<8} {'range':<8} {'rows':>6} {'legacy ms':>10} {'new ms':>8} {'speedup':>8}"
+        )
+
+        for period in PeriodChoices.values:
+            legacy = LEGACY_SPLITTERS[period]
+
+            for label, span in RANGES:
+                # Correctness: every anchor, both in local time and in UTC
+                for anchor in ANCHORS:
+                    local_start = timezone.make_aware(anchor, tz)
+                    for start in (local_start, local_start.astimezone(dt_timezone.utc)):
+                        end = start + span
+                        if split_periods(period, start, end) != legacy(start, end):
+                            mismatches += 1
+                            self.stdout.write(self.style.ERROR(f"❌ Mismatch: {period} {start} → {end}"))
+
+                start = timezone.make_aware(ANCHORS[0], tz)
+                end = start + span
+                rows = len(legacy(start, end))
+
+                legacy_ms = timeit(lambda: legacy(start, end), number=number) * 1000 / number
+                new_ms = timeit(lambda: split_periods(period, start, end), number=number) * 1000 / number
+
+                self.stdout.write(
+                    f"{period:<8} {label:<8} {rows:>6} {legacy_ms:>10.3f} {new_ms:>8.3f} {legacy_ms / new_ms:>7.1f}x"
+                )
+
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"\n❌ {mismatches} case(s) differ from the legacy helpers."))
+        else:
+            self.stdout.write(self.style.SUCCESS("\n✅ All cases identical to the legacy helpers."))
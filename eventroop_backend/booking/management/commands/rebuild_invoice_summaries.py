@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from booking.models import InvoiceDailySummary
+
+
+class Command(BaseCommand):
+    help = "Recompute the InvoiceDailySummary rollup from every TotalInvoice"
+
+    def handle(self, *args, **options):
+        buckets = InvoiceDailySummary.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt {buckets} invoice summary bucket(s)"))
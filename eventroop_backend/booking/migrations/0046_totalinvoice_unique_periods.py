@@ -0,0 +1,78 @@
+# Generated by Django 5.2.7 on 2026-10-16 18:26
+
+from django.conf import settings
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_invoices(apps, schema_editor):
+    # Racing create_or_update calls may have invoiced a period twice: keep the
+    # invoice with payments (else the oldest) and fold the others into it
+    TotalInvoice = apps.get_model('booking', 'TotalInvoice')
+    Payment = apps.get_model('booking', 'Payment')
+
+    for field in ('secondary_order', 'ternary_order'):
+        groups = (
+            TotalInvoice.objects
+            .filter(**{f'{field}__isnull': False})
+            .order_by()
+            .values(field, 'period_start', 'period_end')
+            .annotate(copies=Count('id'))
+            .filter(copies__gt=1)
+        )
+        for group in list(groups):
+            del group['copies']
+            keep, *extra = (
+                TotalInvoice.objects
+                .filter(**group)
+                .annotate(payment_count=Count('payments'))
+                .order_by('-payment_count', 'id')
+            )
+            extra_ids = [invoice.pk for invoice in extra]
+
+            Payment.objects.filter(invoice_id__in=extra_ids).update(invoice=keep)
+            TotalInvoice.objects.filter(parent_invoice_id__in=extra_ids).update(parent_invoice=keep)
+            TotalInvoice.objects.filter(pk__in=extra_ids).delete()
+
+            # Same rules as TotalInvoice.recalculate_payments
+            keep.paid_amount = (
+                Payment.objects.filter(invoice=keep).aggregate(total=Sum('amount'))['total']
+                or Decimal('0.00')
+            )
+            if keep.status == 'CANCELLED':
+                keep.remaining_amount = Decimal('0.00')
+            else:
+                keep.remaining_amount = max(keep.total_amount - keep.paid_amount, Decimal('0.00'))
+                if keep.paid_amount <= 0:
+                    keep.status = 'UNPAID'
+                elif keep.paid_amount >= keep.total_amount:
+                    keep.status = 'PAID'
+                else:
+                    keep.status = 'PARTIALLY_PAID'
+            keep.save(update_fields=['paid_amount', 'remaining_amount', 'status'])
+
+    # Check the deferred FKs now, or Postgres refuses the ALTER TABLE below
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0045_alter_totalinvoice_issued_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_invoices, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='totalinvoice',
+            constraint=models.UniqueConstraint(fields=('secondary_order', 'period_start', 'period_end'), name='unique_secondary_invoice_period'),
+        ),
+        migrations.AddConstraint(
+            model_name='totalinvoice',
+            constraint=models.UniqueConstraint(fields=('ternary_order', 'period_start', 'period_end'), name='unique_ternary_invoice_period'),
+        ),
+    ]
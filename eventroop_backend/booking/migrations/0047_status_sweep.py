@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-16 18:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0046_totalinvoice_unique_periods'),
+        ('venue_manager', '0014_remove_service_venue_service_venue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SweepCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('swept_until', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='primaryorder',
+            index=models.Index(fields=['status', 'start_datetime'], name='booking_pri_status_7353d0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='primaryorder',
+            index=models.Index(fields=['status', 'end_datetime'], name='booking_pri_status_a6b9e3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='secondaryorder',
+            index=models.Index(fields=['status', 'start_datetime'], name='booking_sec_status_fa947e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='secondaryorder',
+            index=models.Index(fields=['status', 'end_datetime'], name='booking_sec_status_07df51_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ternaryorder',
+            index=models.Index(fields=['status', 'start_datetime'], name='booking_ter_status_aec86a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ternaryorder',
+            index=models.Index(fields=['status', 'end_datetime'], name='booking_ter_status_16fff3_idx'),
+        ),
+    ]
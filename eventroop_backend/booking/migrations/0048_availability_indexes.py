@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-16 18:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0047_status_sweep'),
+        ('venue_manager', '0014_remove_service_venue_service_venue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='primaryorder',
+            index=models.Index(fields=['venue', 'end_datetime', 'start_datetime'], name='booking_pri_venue_i_0fab8c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='primaryorder',
+            index=models.Index(fields=['service', 'end_datetime', 'start_datetime'], name='booking_pri_service_2cfc51_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ternaryorder',
+            index=models.Index(fields=['venue', 'end_datetime', 'start_datetime'], name='booking_ter_venue_i_48a2eb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ternaryorder',
+            index=models.Index(fields=['service', 'end_datetime', 'start_datetime'], name='booking_ter_service_8e34a3_idx'),
+        ),
+    ]
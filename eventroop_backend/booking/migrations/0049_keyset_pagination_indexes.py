@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-16 18:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0048_availability_indexes'),
+        ('venue_manager', '0014_remove_service_venue_service_venue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['is_verified', '-created_at', '-id'], name='booking_pay_is_veri_979d32_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='primaryorder',
+            index=models.Index(fields=['booking_entity', '-start_datetime', '-id'], name='booking_pri_booking_6eca72_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='totalinvoice',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='booking_tot_status_6c065e_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-16 18:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0049_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='totalinvoice',
+            index=models.Index(fields=['user', 'patient'], name='booking_tot_user_id_9acde5_idx'),
+        ),
+    ]
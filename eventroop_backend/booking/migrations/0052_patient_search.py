@@ -0,0 +1,74 @@
+# Generated by Django 5.2.7 on 2026-10-16 18:49
+
+import re
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+# Frozen copies of booking.search.normalize_name / reverse_phone as of this
+# migration, so later edits to the app code cannot change the backfill
+_SPACES = re.compile(r'\s+')
+_NON_DIGITS = re.compile(r'\D')
+
+
+def normalize_name(*parts):
+    return _SPACES.sub(' ', ' '.join(part or '' for part in parts)).strip().lower()
+
+
+def reverse_phone(phone):
+    return _NON_DIGITS.sub('', phone or '')[::-1]
+
+
+def fill_search_fields(apps, schema_editor):
+    Patient = apps.get_model('booking', 'Patient')
+    batch = []
+    for patient in Patient.objects.only('first_name', 'last_name', 'phone').iterator(chunk_size=2000):
+        patient.search_name = normalize_name(patient.first_name, patient.last_name)
+        patient.phone_reversed = reverse_phone(patient.phone)
+        batch.append(patient)
+        if len(batch) == 2000:
+            Patient.objects.bulk_update(batch, ['search_name', 'phone_reversed'])
+            batch = []
+    Patient.objects.bulk_update(batch, ['search_name', 'phone_reversed'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0051_invoice_daily_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='patient',
+            name='phone_reversed',
+            field=models.CharField(blank=True, db_collation='C', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='search_name',
+            field=models.CharField(blank=True, db_collation='C', editable=False, max_length=201),
+        ),
+        migrations.RunPython(fill_search_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['search_name'], name='patient_search_name_prefix'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_name'], name='patient_search_name_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['phone_reversed'], name='patient_phone_suffix'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Lower('email'), name='text_pattern_ops'), name='patient_email_prefix'),
+        ),
+    ]
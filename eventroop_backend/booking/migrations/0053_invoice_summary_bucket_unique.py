@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-16 19:26
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def rebuild_summaries(apps, schema_editor):
+    # Concurrent refreshes may have duplicated buckets: recompute them all
+    InvoiceDailySummary = apps.get_model('booking', 'InvoiceDailySummary')
+    TotalInvoice = apps.get_model('booking', 'TotalInvoice')
+    InvoiceDailySummary.objects.all().delete()
+    rows = (
+        TotalInvoice.objects
+        .annotate(day=TruncDate('period_start'))
+        .order_by()
+        .values('day', 'user_id', 'patient__registered_by_id', 'status')
+        .annotate(
+            invoice_count=Count('id'),
+            sum_total=Sum('total_amount'),
+            sum_paid=Sum('paid_amount'),
+            sum_remaining=Sum('remaining_amount'),
+        )
+    )
+    InvoiceDailySummary.objects.bulk_create(
+        [
+            InvoiceDailySummary(
+                day=row['day'],
+                user_id=row['user_id'],
+                registered_by_id=row['patient__registered_by_id'],
+                status=row['status'],
+                invoice_count=row['invoice_count'],
+                total_amount=row['sum_total'],
+                paid_amount=row['sum_paid'],
+                remaining_amount=row['sum_remaining'],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0052_patient_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_summaries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='invoicedailysummary',
+            constraint=models.UniqueConstraint(fields=('day', 'user', 'registered_by', 'status'), name='invoice_summary_bucket', nulls_distinct=False),
+        ),
+    ]
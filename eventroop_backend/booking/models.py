@@ -1,6 +1,7 @@
-from django.db import models,transaction
-from django.db.models import Sum
-from django.db.models.functions import Coalesce
+from django.db import connection, models, transaction
+from django.db.models import Sum, F, Q, Case, When, Value, OuterRef, Subquery, Exists
+from django.db.models.functions import Coalesce, Greatest, Lower, TruncDate
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -9,9 +10,19 @@ from django.contrib.contenttypes import fields, models as ct_models
 from decimal import Decimal
 import uuid
 from .constants import *
-from .utils import auto_update_status,generate_order_id,calculate_amount
-from datetime import timedelta,datetime, time
-from dateutil.relativedelta import relativedelta
+from .periods import split_periods
+from .pricing import PricingEngine
+from .search import normalize_name, reverse_phone
+from . import snapshots
+from .utils import (
+    auto_update_status,
+    generate_order_id,
+    auto_status_expression,
+    secondary_order_id_expression,
+    invoice_number_expression,
+)
+from datetime import datetime, time
+from bisect import bisect_right
         
 class Location(models.Model):
         
@@ -232,7 +243,11 @@ class Patient(models.Model):
     registration_date = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    
+    # Lookup columns (see booking.search), kept in sync by save()
+    # "C" collation: one B-tree serves both `LIKE 'term%'` and ORDER BY
+    search_name = models.CharField(max_length=201, blank=True, editable=False, db_collation='C')
+    phone_reversed = models.CharField(max_length=10, blank=True, editable=False, db_collation='C')
+
     class Meta:
         verbose_name = "Patient"
         verbose_name_plural = 'Patients'
@@ -243,6 +258,18 @@ class Patient(models.Model):
             models.Index(fields=['-registration_date']),
             models.Index(fields=['registered_by']),
             models.Index(fields=['first_name', 'last_name']),
+            # Typeahead: prefix, substring/fuzzy, phone suffix, email prefix
+            models.Index(fields=['search_name'], name='patient_search_name_prefix'),
+            GinIndex(
+                fields=['search_name'],
+                opclasses=['gin_trgm_ops'],
+                name='patient_search_name_trgm',
+            ),
+            models.Index(fields=['phone_reversed'], name='patient_phone_suffix'),
+            models.Index(
+                OpClass(Lower('email'), name='text_pattern_ops'),
+                name='patient_email_prefix',
+            ),
         ]
     
     def __str__(self):
@@ -260,9 +287,25 @@ class Patient(models.Model):
             total += self.advance_payment
         return total
 
+    def refresh_search_fields(self):
+        """Recompute the lookup columns; returns the names that changed."""
+        values = {
+            "search_name": normalize_name(self.first_name, self.last_name),
+            "phone_reversed": reverse_phone(self.phone),
+        }
+        changed = [name for name, value in values.items() if getattr(self, name) != value]
+        for name in changed:
+            setattr(self, name, values[name])
+        return changed
+
     def save(self, *args, **kwargs):
         is_new = self.pk is None
 
+        changed = self.refresh_search_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and changed:
+            kwargs["update_fields"] = {*update_fields, *changed}
+
         super().save(*args, **kwargs)
 
         # After first save, ID exists
@@ -326,6 +369,16 @@ class PrimaryOrder(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Status sweeper: rows still waiting for a time boundary
+            models.Index(fields=["status", "start_datetime"]),
+            models.Index(fields=["status", "end_datetime"]),
+            # Availability: overlap scans per venue / service
+            models.Index(fields=["venue", "end_datetime", "start_datetime"]),
+            models.Index(fields=["service", "end_datetime", "start_datetime"]),
+            # Keyset pages of by_venue / by_service
+            models.Index(fields=["booking_entity", "-start_datetime", "-id"]),
+        ]
 
     def __str__(self):
         return f"{self.order_id}"
@@ -333,6 +386,7 @@ class PrimaryOrder(models.Model):
     # ── Lifecycle ──────────────────────────────────────────────────────────────
     def save(self, *args, **kwargs):
         skip_auto_status = kwargs.pop("skip_auto_status", False)
+        skip_total_recalc = kwargs.pop("skip_total_recalc", False)
         update_fields = kwargs.get("update_fields")
         is_targeted_save = update_fields is not None
 
@@ -342,13 +396,17 @@ class PrimaryOrder(models.Model):
 
             self.booking_type = self.package.package_type
 
+        is_new = self.pk is None
         super().save(*args, **kwargs)
 
         if not self.order_id:
             self.order_id = generate_order_id(self)
             # Use super() to avoid re-triggering this save() hook
             super().save(update_fields=["order_id"])
-        self.recalculate_total()
+
+        # A brand-new order has no periods yet; generation writes total_bill itself
+        if not is_new and not skip_total_recalc:
+            self.recalculate_total()
         
     # ── Sub-order generation ───────────────────────────────────────────────────
     def generate_secondary_from_random_dates(self, dates):
@@ -357,197 +415,273 @@ class PrimaryOrder(models.Model):
         - list[date] → DAILY
         - dict[date] = [time, time] → HOURLY
         """
-        if not dates:
-            return
+        objects = self._build_secondaries_from_random_dates(dates)
 
-        period_type = self.package.period
+        # Nothing to create
+        if not objects:
+            return
 
         with transaction.atomic():
-            objects = []
-
-            # DAILY
-            if period_type == PeriodChoices.DAILY and isinstance(dates, list):
-                for d in dates:
-                    start_dt = timezone.make_aware(datetime.combine(d, time.min))
-                    end_dt = timezone.make_aware(datetime.combine(d, time.max))
-
-                    objects.append(
-                        SecondaryOrder(
-                            primary_order=self,
-                            start_datetime=start_dt,
-                            end_datetime=end_dt,
-                            subtotal= (
-                                (
-                                    calculate_amount(start_dt, end_dt, self.package)
-                                    + self.premium_amount
-                                ) - self.discount_amount
-                                ),
-                        )
-                    )
+            self._upsert_secondaries(objects)
 
-            # HOURLY
-            elif period_type == PeriodChoices.HOURLY and isinstance(dates, dict):
-                for date, slots in dates.items():
-                    if not slots:
-                        continue
-
-                    start_dt = timezone.make_aware(datetime.combine(date, min(slots)))
-                    end_dt = timezone.make_aware(datetime.combine(date, max(slots)))
-
-                    objects.append(
-                        SecondaryOrder(
-                            primary_order=self,
-                            start_datetime=start_dt,
-                            end_datetime=end_dt,
-                            subtotal=(
-                                (
-                                    calculate_amount(start_dt, end_dt, self.package)
-                                    + self.premium_amount
-                                ) - self.discount_amount
-                                ),
-                        )
-                    )
+    def generate_secondary_full_range_dates(self):
+        """Create SecondaryOrders by splitting the full booking range into periods."""
+        objects = self._build_secondaries_full_range()
+        if not objects:
+            return
 
-            # Nothing to create
-            if not objects:
-                return
+        with transaction.atomic():
+            self._upsert_secondaries(objects)
 
-            # Bulk create/update
-            SecondaryOrder.objects.bulk_create(
-                objects,
-                update_conflicts=True,
-                unique_fields=["primary_order", "start_datetime", "end_datetime"],
-                update_fields=["subtotal"],
-            )
+    def _build_secondaries_from_random_dates(self, dates):
+        """Unsaved SecondaryOrders for specific DAILY dates / HOURLY slots."""
+        if not dates:
+            return []
 
-            # Only fetch affected records (not all)
-            updated_secondaries = list(
-                SecondaryOrder.objects.filter(
-                    primary_order=self,
-                    start_datetime__in=[obj.start_datetime for obj in objects],
-                )
-            )
+        period_type = self.package.period
+        intervals = []
+
+        # DAILY
+        if period_type == PeriodChoices.DAILY and isinstance(dates, list):
+            for d in dates:
+                intervals.append((
+                    timezone.make_aware(datetime.combine(d, time.min)),
+                    timezone.make_aware(datetime.combine(d, time.max)),
+                ))
+
+        # HOURLY
+        elif period_type == PeriodChoices.HOURLY and isinstance(dates, dict):
+            for date, slots in dates.items():
+                if not slots:
+                    continue
+
+                intervals.append((
+                    timezone.make_aware(datetime.combine(date, min(slots))),
+                    timezone.make_aware(datetime.combine(date, max(slots))),
+                ))
+
+        if not intervals:
+            return []
 
-            for obj in updated_secondaries:
-                if not obj.order_id:
-                    obj.status = auto_update_status(obj.start_datetime, obj.end_datetime)
-                    obj.order_id = generate_order_id(obj)
+        # One batched pricing call for the whole schedule
+        amounts = PricingEngine().price_many(self.package, intervals)
 
-            SecondaryOrder.objects.bulk_update(
-                updated_secondaries,
-                ["status", "order_id"],
+        return [
+            SecondaryOrder(
+                primary_order=self,
+                start_datetime=start_dt,
+                end_datetime=end_dt,
+                subtotal=(amount + self.premium_amount) - self.discount_amount,
             )
+            for (start_dt, end_dt), amount in zip(intervals, amounts)
+        ]
 
-            # Recalculate total once
-            self.recalculate_total()
-
-    def generate_secondary_full_range_dates(self):
-        """Create SecondaryOrders by splitting the full booking range into periods."""
+    def _build_secondaries_full_range(self):
+        """Unsaved SecondaryOrders for every period of the full booking range."""
         period_type = self.package.period
         pkg_price = self.package.price
         discount_amount = self.discount_amount
         premium_amount = self.premium_amount
         final_price = ((pkg_price + premium_amount)- discount_amount)
 
-        period_generators = {
-            PeriodChoices.MONTHLY: self._get_monthly_periods,
-            PeriodChoices.WEEKLY: self._get_weekly_periods,
-            PeriodChoices.DAILY: self._get_daily_periods,
-            PeriodChoices.HOURLY: self._get_daily_periods,
-        }
+        # Day boundaries are local; values loaded from the DB come back in UTC
+        periods = split_periods(
+            period_type,
+            timezone.localtime(self.start_datetime),
+            timezone.localtime(self.end_datetime),
+        )
 
-        generator = period_generators.get(period_type)
-        if not generator:
-            return
+        return [
+            SecondaryOrder(
+                primary_order=self,
+                start_datetime=slot_start,
+                end_datetime=slot_end,
+                subtotal=final_price ,
+            )
+            for slot_start, slot_end in periods
+        ]
 
-        periods = generator()
-        if not periods:
-            return
+    def _upsert_secondaries(self, objects):
+        """
+        Persist a freshly generated schedule in a constant number of queries:
+        1. upsert every period (INSERT ... ON CONFLICT)
+        2. derive order_id + status for the new rows with one UPDATE
+        3. invoice the periods that are already fulfilled, in bulk
+        4. write total_bill from the in-memory subtotals
+
+        Callers always hand over the complete schedule (create / update delete
+        the old periods first), so the in-memory sum is the order total.
+        """
+        SecondaryOrder.objects.bulk_create(
+            objects,
+            update_conflicts=True,
+            unique_fields=["primary_order", "start_datetime", "end_datetime"],
+            update_fields=["subtotal"],
+        )
 
-        with transaction.atomic():
-            objects = [
-                SecondaryOrder(
-                    primary_order=self,
-                    start_datetime=slot_start,
-                    end_datetime=slot_end,
-                    subtotal=final_price ,
-                )
-                for slot_start, slot_end in periods
-            ]
+        SecondaryOrder.objects.filter(primary_order=self, order_id="").update(
+            order_id=secondary_order_id_expression(),
+            status=auto_status_expression(),
+        )
 
-            created = SecondaryOrder.objects.bulk_create(
-                objects,
-                update_conflicts=True,
-                unique_fields=["primary_order", "start_datetime", "end_datetime"],
-                update_fields=["subtotal"],
-            )
+        # Periods already in the past are born FULFILLED and need their invoice
+        TotalInvoice.bulk_create_or_update(
+            secondaries=self.secondary_orders.filter(status__in=INVOICE_TRIGGER_STATUSES)
+        )
 
-            for obj in created:
-                obj.status = auto_update_status(obj.start_datetime, obj.end_datetime)
-                obj.order_id = generate_order_id(obj)
+        self.total_bill = sum((obj.subtotal for obj in objects), Decimal("0.00"))
+        PrimaryOrder.objects.filter(pk=self.pk).update(total_bill=self.total_bill)
+        snapshots.invalidate([self.pk])
 
-            SecondaryOrder.objects.bulk_update(created, ["status", "order_id"])
+    def sync_secondaries(self, objects):
+        """
+        Bring the stored schedule in line with `objects` (the complete new
+        schedule as unsaved SecondaryOrders), matching periods by start:
 
-            self.recalculate_total()
+        - new starts       → inserted
+        - common starts    → updated in place, only if end or price differ
+        - vanished starts  → deleted; cancelled instead when they already carry
+                             TernaryOrders or invoices, so those survive (their
+                             invoices are cancelled too and stop billing)
 
-    # ── Period helpers ─────────────────────────────────────────────────────────
-    def _get_monthly_periods(self):
+        Untouched rows keep their order_id, status and invoices.
+        Returns {"inserted": n, "updated": n, "deleted": n, "cancelled": n}.
         """
-        Split range into calendar-month periods anchored to the start date.
-        Example: Feb 4 → Mar 3  =  one period (Feb 4, Mar 3)
-                Feb 4 → Apr 9  =  (Feb 4, Mar 3), (Mar 4, Apr 3), (Apr 4, Apr 9)
-        """
-        periods = []
-        current = self.start_datetime
-
-        while current < self.end_datetime:
-            next_period_start = current + relativedelta(months=1)
-            # Period ends the day BEFORE next cycle starts
-            period_end = min(
-                next_period_start - timedelta(days=1),
-                self.end_datetime
-            )
-            periods.append((current, period_end))
-            current = next_period_start
+        from . import rollups
 
-        return periods
+        desired = {obj.start_datetime: obj for obj in objects}
 
-    def _get_weekly_periods(self):
-        return self._split_into_days(chunk_days=7)
-
-    def _get_daily_periods(self):
-        return self._split_into_days()
+        ternary_total = (
+            TernaryOrder.objects
+            .filter(secondary_order=OuterRef("pk"))
+            .values("secondary_order")
+            .annotate(total=Sum("subtotal"))
+            .values("total")
+        )
+        has_children = (
+            Exists(TernaryOrder.objects.filter(secondary_order=OuterRef("pk")))
+            | Exists(TotalInvoice.objects.filter(secondary_order=OuterRef("pk")))
+        )
+        existing = {
+            row.start_datetime: row
+            for row in (
+                self.secondary_orders
+                .annotate(
+                    ternary_total=Coalesce(Subquery(ternary_total), Decimal("0.00")),
+                    has_children=has_children,
+                )
+                .only("id", "start_datetime", "end_datetime", "subtotal", "status")
+            )
+        }
 
-    def _split_into_days(self, chunk_days=None):
-        """Shared logic: split range into day-level periods, optionally in N-day chunks."""
-        if self.start_datetime >= self.end_datetime:
-            return []
+        to_insert = [obj for start, obj in desired.items() if start not in existing]
+        removed = [row for start, row in existing.items() if start not in desired]
+        to_cancel = [row.pk for row in removed if row.has_children]
+        to_delete = [row.pk for row in removed if not row.has_children]
+
+        to_update = []
+        reinstated = []
+        for start, row in existing.items():
+            obj = desired.get(start)
+            if obj is None:
+                continue
+
+            subtotal = obj.subtotal + row.ternary_total
+            reinstate = row.status == BookingStatus.CANCELLED
+            if row.end_datetime == obj.end_datetime and row.subtotal == subtotal and not reinstate:
+                continue
+
+            row.end_datetime = obj.end_datetime
+            row.subtotal = subtotal
+            if reinstate:
+                row.status = auto_update_status(row.start_datetime, row.end_datetime)
+                reinstated.append(row.pk)
+            to_update.append(row)
+
+        cancelled_invoices = TotalInvoice.objects.filter(
+            Q(secondary_order_id__in=to_cancel) | Q(ternary_order__secondary_order_id__in=to_cancel)
+        )
+        summary_keys = set()
 
-        periods = []
-        current = self.start_datetime
+        # Everything below is rolled up explicitly, once
+        with transaction.atomic(), rollups.suspended():
+            if to_delete:
+                SecondaryOrder.objects.filter(id__in=to_delete).delete()
 
-        while current < self.end_datetime:
-            chunk_end = (
-                min(current + timedelta(days=chunk_days), self.end_datetime)
-                if chunk_days
-                else self.end_datetime
-            )
+            if to_cancel:
+                SecondaryOrder.objects.filter(id__in=to_cancel).update(
+                    status=BookingStatus.CANCELLED, subtotal=Decimal("0.00")
+                )
+                TernaryOrder.objects.filter(secondary_order_id__in=to_cancel).update(
+                    status=BookingStatus.CANCELLED
+                )
+                # The dropped periods are no longer billed
+                summary_keys.update(
+                    InvoiceDailySummary.key_of(invoice)
+                    for invoice in cancelled_invoices.only("period_start", "user_id")
+                )
+                cancelled_invoices.update(
+                    status=InvoiceStatus.CANCELLED, remaining_amount=Decimal("0.00")
+                )
 
-            day_cursor = current
-            while day_cursor < chunk_end:
-                day_end = min(
-                    day_cursor.replace(hour=23, minute=59, second=59, microsecond=999999),
-                    self.end_datetime,
+            if to_update:
+                SecondaryOrder.objects.bulk_update(
+                    to_update, ["end_datetime", "subtotal", "status"]
+                )
+                # Keep the invoices of moved periods on the same row
+                TotalInvoice.objects.filter(
+                    secondary_order_id__in=[row.pk for row in to_update]
+                ).update(
+                    period_end=Subquery(
+                        SecondaryOrder.objects
+                        .filter(pk=OuterRef("secondary_order_id"))
+                        .values("end_datetime")[:1]
+                    )
+                )
+                # Billed again: status is re-derived from the payments below
+                TotalInvoice.objects.filter(
+                    secondary_order_id__in=reinstated, status=InvoiceStatus.CANCELLED
+                ).update(status=InvoiceStatus.UNPAID)
+
+            if to_insert:
+                SecondaryOrder.objects.bulk_create(to_insert)
+                SecondaryOrder.objects.filter(primary_order=self, order_id="").update(
+                    order_id=secondary_order_id_expression(),
+                    status=auto_status_expression(),
+                )
+                TotalInvoice.bulk_create_or_update(
+                    secondaries=self.secondary_orders.filter(
+                        start_datetime__in=[obj.start_datetime for obj in to_insert],
+                        status__in=INVOICE_TRIGGER_STATUSES,
+                    )
                 )
-                periods.append((day_cursor, day_end))
-                day_cursor += timedelta(days=1)
 
-            current = chunk_end
+            PrimaryOrder.bulk_recalculate_total([self.pk])
 
-        return periods
+        self.refresh_from_db(fields=["total_bill"])
+        if to_update or summary_keys:
+            rollups.mark_dirty(
+                secondary_invoice_ids=[row.pk for row in to_update],
+                invoice_ids=TotalInvoice.objects.filter(
+                    secondary_order_id__in=reinstated
+                ).values_list("id", flat=True),
+                summary_keys=summary_keys,
+            )
+
+        return {
+            "inserted": len(to_insert),
+            "updated": len(to_update),
+            "deleted": len(to_delete),
+            "cancelled": len(to_cancel),
+        }
 
     # ── Actions ────────────────────────────────────────────────────────────────
-    def reschedule(self, new_start, new_end, new_package_id=None, discount_amount=None, premium_amount=None):
+    def reschedule(self, new_start, new_end, new_package_id=None, discount_amount=None, premium_amount=None, dates=None):
+        """
+        Move the booking to a new range (or to specific DAILY dates / HOURLY
+        slots via `dates`) and apply only the difference to its SecondaryOrders.
+        Returns the sync_secondaries() counts.
+        """
         now = timezone.now()
 
         if new_start >= new_end:
@@ -570,16 +704,100 @@ class PrimaryOrder(models.Model):
             if premium_amount is not None:
                 self.premium_amount = premium_amount
 
-            self.save(skip_auto_status=True)
-            self._generate_secondary_and_ternary_orders()
+            # sync_secondaries() recomputes the total once the schedule is in place
+            self.save(skip_auto_status=True, skip_total_recalc=True)
+            if dates:
+                objects = self._build_secondaries_from_random_dates(dates)
+            else:
+                objects = self._build_secondaries_full_range()
+
+            return self.sync_secondaries(objects)
+
+    def containing_periods(self, intervals):
+        """
+        The SecondaryOrder containing each (start, end) of `intervals`, or None
+        where no single active period does.
+
+        Periods never overlap, so one range scan of the (primary_order,
+        start_datetime, end_datetime) index fetches every candidate and each
+        interval is matched by bisecting the period starts.
+        """
+        if not intervals:
+            return []
+
+        periods = list(
+            self.secondary_orders
+            .filter(
+                start_datetime__lte=max(start for start, _ in intervals),
+                end_datetime__gte=min(end for _, end in intervals),
+            )
+            .exclude(status=BookingStatus.CANCELLED)
+            .order_by("start_datetime")
+        )
+        starts = [period.start_datetime for period in periods]
+
+        matches = []
+        for start, end in intervals:
+            k = bisect_right(starts, start) - 1
+            matches.append(periods[k] if k >= 0 and periods[k].end_datetime >= end else None)
+        return matches
+
+    def add_services(self, items):
+        """
+        Create TernaryOrders from validated TernaryOrderCreateSerializer data,
+        each carrying its `secondary_order`, with one bulk insert:
+        every line is priced once here, and the Secondary/Primary totals and
+        invoices are rolled up once when the transaction commits.
+        """
+        from . import rollups
+
+        engine = PricingEngine()
+        ternaries = []
+        for item in items:
+            ternary = TernaryOrder(**item)
+            package = engine.package(ternary.package)
+            ternary.status = auto_update_status(ternary.start_datetime, ternary.end_datetime)
+            ternary.booking_type = package.package_type
+            ternary.subtotal = (
+                engine.price(package, ternary.start_datetime, ternary.end_datetime)
+                + (ternary.premium_amount or Decimal("0.00"))
+                - (ternary.discount_amount or Decimal("0.00"))
+            )
+            ternaries.append(ternary)
+
+        # bulk_create sends no signals: queue the rollups the save() handlers would
+        with transaction.atomic():
+            created = TernaryOrder.objects.bulk_create(ternaries)
+            for ternary in created:
+                ternary.order_id = generate_order_id(ternary)
+            TernaryOrder.objects.bulk_update(created, ["order_id"])
+
+            rollups.mark_dirty(
+                secondary_ids={ternary.secondary_order_id for ternary in created},
+                ternary_invoice_ids=[ternary.pk for ternary in created],
+            )
+        snapshots.invalidate([self.pk])
+        return created
 
     def recalculate_total(self):
-        total = self.secondary_orders.aggregate(
-            total=Coalesce(Sum("subtotal"), Decimal("0.00"))
-        )["total"]
+        PrimaryOrder.bulk_recalculate_total([self.pk])
+        self.refresh_from_db(fields=["total_bill"])
 
-        self.total_bill = total
-        super().save(update_fields=["total_bill"])
+    @classmethod
+    def bulk_recalculate_total(cls, ids):
+        """total_bill = Sum(SecondaryOrder.subtotal) for every order in `ids`, in one UPDATE."""
+        secondary_total = (
+            SecondaryOrder.objects
+            .filter(primary_order=OuterRef("pk"))
+            .values("primary_order")
+            .annotate(total=Sum("subtotal"))
+            .values("total")
+        )
+        ids = list(ids)
+        snapshots.invalidate(ids)
+        return cls.objects.filter(id__in=ids).update(
+            total_bill=Coalesce(Subquery(secondary_total), Decimal("0.00"))
+        )
 
 class SecondaryOrder(models.Model):
     """One record per period (month/week/day) within a PrimaryOrder span."""
@@ -612,6 +830,10 @@ class SecondaryOrder(models.Model):
     class Meta:
         unique_together = ("primary_order", "start_datetime", "end_datetime")
         ordering = ["start_datetime", "end_datetime"]
+        indexes = [
+            models.Index(fields=["status", "start_datetime"]),
+            models.Index(fields=["status", "end_datetime"]),
+        ]
 
     def __str__(self):
         return (
@@ -619,6 +841,13 @@ class SecondaryOrder(models.Model):
             f" → {self.order_id}"
         )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Persisted value, used by incremental rollups to compute deltas
+        instance._loaded_subtotal = instance.__dict__.get("subtotal")
+        return instance
+
     # ── Lifecycle ──────────────────────────────────────────────────────────────
 
     def save(self, *args, **kwargs):
@@ -643,17 +872,39 @@ class SecondaryOrder(models.Model):
         Recompute subtotal as: base_price + Sum(TernaryOrder.subtotal)
         Then cascade up to PrimaryOrder and sideways to TotalInvoice.
         """
-        base_price = self.primary_order.package.price
-        ternary_total = self.ternary_orders.aggregate(
-            total=Coalesce(Sum("subtotal"), Decimal("0.00"))
-        )["total"]
-
-        self.subtotal = base_price + ternary_total
-        super().save(update_fields=["subtotal"])
+        SecondaryOrder.bulk_recalculate_subtotal([self.pk])
+        self.refresh_from_db(fields=["subtotal", "status"])
+        self._loaded_subtotal = self.subtotal
 
         if self.primary_order_id:
             self.primary_order.recalculate_total()
 
+        if self.status in INVOICE_TRIGGER_STATUSES:
+            TotalInvoice.create_or_update_for_secondary(self)
+
+    @classmethod
+    def bulk_recalculate_subtotal(cls, ids):
+        """Same formula as recalculate_subtotal for every order in `ids`, in one UPDATE."""
+        base_price = (
+            Package.objects
+            .filter(primary_orders=OuterRef("primary_order_id"))
+            .values("price")[:1]
+        )
+        ternary_total = (
+            TernaryOrder.objects
+            .filter(secondary_order=OuterRef("pk"))
+            .values("secondary_order")
+            .annotate(total=Sum("subtotal"))
+            .values("total")
+        )
+        # Cancelled periods (e.g. dropped by a reschedule) are no longer billed
+        return cls.objects.filter(id__in=ids).exclude(status=BookingStatus.CANCELLED).update(
+            subtotal=(
+                Coalesce(Subquery(base_price), Decimal("0.00"))
+                + Coalesce(Subquery(ternary_total), Decimal("0.00"))
+            )
+        )
+
 class TernaryOrder(models.Model):
     """One record per service/booking line item within a SecondaryOrder."""
     
@@ -714,6 +965,12 @@ class TernaryOrder(models.Model):
 
     class Meta:
         ordering = ["start_datetime"]
+        indexes = [
+            models.Index(fields=["status", "start_datetime"]),
+            models.Index(fields=["status", "end_datetime"]),
+            models.Index(fields=["venue", "end_datetime", "start_datetime"]),
+            models.Index(fields=["service", "end_datetime", "start_datetime"]),
+        ]
 
     def __str__(self):
         return (
@@ -722,6 +979,13 @@ class TernaryOrder(models.Model):
             f" → {self.order_id}"
         )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Persisted value, used by incremental rollups to compute deltas
+        instance._loaded_subtotal = instance.__dict__.get("subtotal")
+        return instance
+
     # ── Lifecycle ──────────────────────────────────────────────────────────────
     def save(self, *args, **kwargs):
         skip_auto_status = kwargs.pop("skip_auto_status", False)
@@ -733,7 +997,7 @@ class TernaryOrder(models.Model):
                 self.status = auto_update_status(self.start_datetime, self.end_datetime)
             self.booking_type = self.package.package_type
         
-        base_amount = calculate_amount(self.start_datetime,self.end_datetime,self.package)
+        base_amount = PricingEngine().price(self.package, self.start_datetime, self.end_datetime)
 
         discount = self.discount_amount or Decimal("0.00")
         premium = self.premium_amount or Decimal("0.00")
@@ -801,11 +1065,24 @@ class TotalInvoice(models.Model):
                 ),
                 name="invoice_must_link_to_exactly_one_order",
             ),
+            # Conflict targets for bulk_create_or_update()
+            models.UniqueConstraint(
+                fields=["secondary_order", "period_start", "period_end"],
+                name="unique_secondary_invoice_period",
+            ),
+            models.UniqueConstraint(
+                fields=["ternary_order", "period_start", "period_end"],
+                name="unique_ternary_invoice_period",
+            ),
         ]
         indexes = [
             models.Index(fields=["secondary_order", "period_start"]),
             models.Index(fields=["ternary_order",   "period_start"]),
             models.Index(fields=["user", "status"]),
+            # Grouped invoice list: (user, patient) groups in index order
+            models.Index(fields=["user", "patient"]),
+            # Keyset pages of overdue
+            models.Index(fields=["status", "-created_at", "-id"]),
         ]
 
     def __str__(self):
@@ -914,6 +1191,112 @@ class TotalInvoice(models.Model):
 
         return invoice
 
+    @classmethod
+    def bulk_create_or_update(cls, secondaries=None, ternaries=None):
+        """
+        Set-based create_or_update_for_secondary / _for_ternary for whole
+        querysets, in a constant number of queries:
+        1. read every order (ternaries resolve their parent invoice in the same query)
+        2. upsert all invoices (INSERT ... ON CONFLICT DO UPDATE subtotal)
+        3. number the new rows with one UPDATE
+        4. recompute total_amount / remaining_amount with one UPDATE
+        5. refresh the InvoiceDailySummary buckets the invoices fall in
+
+        Secondaries go first so their ternaries link to the fresh parents.
+        Returns the number of invoices written.
+        """
+        written = 0
+        summary_keys = set()
+
+        with transaction.atomic():
+            if secondaries is not None:
+                rows = secondaries.values(
+                    "id", "start_datetime", "end_datetime", "subtotal",
+                    "primary_order__patient_id", "primary_order__user_id",
+                )
+                invoices = [
+                    cls(
+                        secondary_order_id=row["id"],
+                        period_start=row["start_datetime"],
+                        period_end=row["end_datetime"],
+                        patient_id=row["primary_order__patient_id"],
+                        user_id=row["primary_order__user_id"],
+                        subtotal=row["subtotal"],
+                        status=InvoiceStatus.UNPAID,
+                        invoice_number=f"~{uuid.uuid4().hex}",
+                    )
+                    for row in rows
+                ]
+                written += cls._bulk_upsert(
+                    invoices,
+                    order_field="secondary_order",
+                    update_fields=["subtotal"],
+                )
+                summary_keys.update(InvoiceDailySummary.key_of(invoice) for invoice in invoices)
+
+            if ternaries is not None:
+                parent_invoice = (
+                    cls.objects
+                    .filter(secondary_order=OuterRef("secondary_order_id"))
+                    .values("id")[:1]
+                )
+                rows = ternaries.annotate(parent_invoice_id=Subquery(parent_invoice)).values(
+                    "id", "start_datetime", "end_datetime", "subtotal", "parent_invoice_id",
+                    "secondary_order__primary_order__patient_id",
+                    "secondary_order__primary_order__user_id",
+                )
+                invoices = [
+                    cls(
+                        ternary_order_id=row["id"],
+                        parent_invoice_id=row["parent_invoice_id"],
+                        period_start=row["start_datetime"],
+                        period_end=row["end_datetime"],
+                        patient_id=row["secondary_order__primary_order__patient_id"],
+                        user_id=row["secondary_order__primary_order__user_id"],
+                        subtotal=row["subtotal"],
+                        status=InvoiceStatus.UNPAID,
+                        invoice_number=f"~{uuid.uuid4().hex}",
+                    )
+                    for row in rows
+                ]
+                written += cls._bulk_upsert(
+                    invoices,
+                    order_field="ternary_order",
+                    update_fields=["subtotal", "parent_invoice"],
+                )
+                summary_keys.update(InvoiceDailySummary.key_of(invoice) for invoice in invoices)
+
+            InvoiceDailySummary.refresh(summary_keys)
+
+        return written
+
+    @classmethod
+    def _bulk_upsert(cls, invoices, order_field, update_fields):
+        if not invoices:
+            return 0
+
+        cls.objects.bulk_create(
+            invoices,
+            update_conflicts=True,
+            unique_fields=[order_field, "period_start", "period_end"],
+            update_fields=update_fields,
+        )
+
+        order_ids = [getattr(invoice, f"{order_field}_id") for invoice in invoices]
+        affected = cls.objects.filter(**{f"{order_field}_id__in": order_ids})
+
+        # New rows carry a unique "~..." placeholder until their id is known
+        affected.filter(invoice_number__startswith="~").update(
+            invoice_number=invoice_number_expression()
+        )
+
+        total_amount = F("subtotal") + F("premium_amount") + F("tax_amount") - F("discount_amount")
+        affected.update(
+            total_amount=total_amount,
+            remaining_amount=Greatest(total_amount - F("paid_amount"), Decimal("0.00")),
+        )
+        return len(invoices)
+
     # ── Payments ───────────────────────────────────────────────────────────────
     def recalculate_payments(self):
         """Recompute paid_amount, remaining_amount and status from all payments."""
@@ -926,7 +1309,10 @@ class TotalInvoice(models.Model):
             self.total_amount - self.paid_amount, Decimal("0.00")
         )
 
-        if self.paid_amount <= 0:
+        # A cancelled invoice (its period was dropped) is not billed any more
+        if self.status == InvoiceStatus.CANCELLED:
+            self.remaining_amount = Decimal("0.00")
+        elif self.paid_amount <= 0:
             self.status = InvoiceStatus.UNPAID
         elif self.paid_amount >= self.total_amount:
             self.status = InvoiceStatus.PAID
@@ -935,6 +1321,35 @@ class TotalInvoice(models.Model):
 
         super().save(update_fields=["paid_amount", "remaining_amount", "status"])
 
+    @classmethod
+    def bulk_recalculate_payments(cls, ids):
+        """Same rules as recalculate_payments for every invoice in `ids`, in two UPDATEs."""
+        paid_total = (
+            Payment.objects
+            .filter(invoice=OuterRef("pk"))
+            .values("invoice")
+            .annotate(total=Sum("amount"))
+            .values("total")
+        )
+        invoices = cls.objects.filter(id__in=ids)
+        invoices.update(paid_amount=Coalesce(Subquery(paid_total), Decimal("0.00")))
+
+        # Second pass so the derived columns see the new paid_amount
+        updated = invoices.update(
+            remaining_amount=Case(
+                When(status=InvoiceStatus.CANCELLED, then=Value(Decimal("0.00"))),
+                default=Greatest(F("total_amount") - F("paid_amount"), Decimal("0.00")),
+            ),
+            status=Case(
+                When(status=InvoiceStatus.CANCELLED, then=Value(InvoiceStatus.CANCELLED)),
+                When(paid_amount__lte=0, then=Value(InvoiceStatus.UNPAID)),
+                When(paid_amount__gte=F("total_amount"), then=Value(InvoiceStatus.PAID)),
+                default=Value(InvoiceStatus.PARTIALLY_PAID),
+            ),
+        )
+        InvoiceDailySummary.refresh_for_invoices(ids)
+        return updated
+
 class Payment(models.Model):
     invoice = models.ForeignKey(
         TotalInvoice, related_name="payments", on_delete=models.CASCADE
@@ -955,6 +1370,8 @@ class Payment(models.Model):
         indexes = [
             models.Index(fields=["invoice", "created_at"]),
             models.Index(fields=["is_verified"]),
+            # Keyset pages of pending_verification / verified
+            models.Index(fields=["is_verified", "-created_at", "-id"]),
         ]
 
     def __str__(self):
@@ -962,9 +1379,30 @@ class Payment(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.reference:
-            self.reference = f"PAY-{uuid.uuid4().hex[:10].upper()}"
+            self.reference = self.generate_reference()
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def generate_reference():
+        return f"PAY-{uuid.uuid4().hex[:10].upper()}"
+
+    @classmethod
+    def bulk_record(cls, payments):
+        """
+        Insert unsaved Payments with one bulk_create, then reconcile every
+        touched invoice with TotalInvoice.bulk_recalculate_payments instead of
+        a per-payment signal round trip. Returns the created payments.
+        """
+        for payment in payments:
+            if not payment.reference:
+                payment.reference = cls.generate_reference()
+
+        with transaction.atomic():
+            created = cls.objects.bulk_create(payments, batch_size=500)
+            TotalInvoice.bulk_recalculate_payments({payment.invoice_id for payment in created})
+
+        return created
+
     def _set_verified(self, state: bool) -> bool:
         if self.is_verified == state:
             return False
@@ -978,3 +1416,145 @@ class Payment(models.Model):
 
     def unverify(self) -> bool:
         return self._set_verified(False)
+
+
+class SweepCheckpoint(models.Model):
+    """A periodic sweep's lock row (select_for_update) and the time of its last run."""
+
+    name = models.CharField(max_length=50, unique=True)
+    swept_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} → {self.swept_until}"
+
+
+class InvoiceDailySummary(models.Model):
+    """
+    TotalInvoice counts and amounts per (day of period_start, user,
+    patient's registered_by, status), so the invoice summary sums a handful
+    of rows per day instead of every invoice.
+
+    Buckets are recomputed from their invoices whenever one of them is written
+    (refresh()); `manage.py rebuild_invoice_summaries` recomputes everything.
+    Refreshes of the same user are serialized with a transaction-scoped
+    advisory lock, and each bucket is one row (upserted).
+    """
+
+    # First key of the (namespace, user_id) advisory locks taken by refresh()
+    LOCK_NAMESPACE = 0x1DA5
+
+    day = models.DateField()
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="+")
+    registered_by = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+    status = models.CharField(max_length=20, choices=InvoiceStatus.choices)
+
+    invoice_count    = models.PositiveIntegerField(default=0)
+    total_amount     = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    paid_amount      = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+    remaining_amount = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["day", "user"]),
+            models.Index(fields=["user", "day"]),
+            models.Index(fields=["registered_by", "day"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "user", "registered_by", "status"],
+                nulls_distinct=False,
+                name="invoice_summary_bucket",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} | {self.user_id} | {self.status} × {self.invoice_count}"
+
+    @staticmethod
+    def key_of(invoice):
+        """(day, user_id) bucket of an invoice, the unit refresh() recomputes."""
+        return timezone.localtime(invoice.period_start).date(), invoice.user_id
+
+    @classmethod
+    def refresh(cls, keys):
+        """Recompute every bucket of the (day, user_id) pairs in `keys`."""
+        keys = set(keys)
+        if not keys:
+            return
+
+        days = {day for day, _ in keys}
+        user_ids = sorted({user_id for _, user_id in keys})
+
+        # Index range scans on period_start, one local day each
+        in_days = Q()
+        for day in days:
+            in_days |= Q(period_start__range=(
+                timezone.make_aware(datetime.combine(day, time.min)),
+                timezone.make_aware(datetime.combine(day, time.max)),
+            ))
+
+        with transaction.atomic():
+            # A concurrent refresh of these users waits here until we commit,
+            # then recomputes from what we wrote
+            with connection.cursor() as cursor:
+                for user_id in user_ids:
+                    cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [cls.LOCK_NAMESPACE, user_id])
+
+            # days × users covers `keys`; the extra buckets are recomputed as well
+            kept = cls._insert(TotalInvoice.objects.filter(in_days, user_id__in=user_ids))
+            cls.objects.filter(day__in=days, user_id__in=user_ids).exclude(id__in=kept).delete()
+
+    @classmethod
+    def refresh_for_invoices(cls, invoice_ids):
+        cls.refresh(
+            TotalInvoice.objects
+            .filter(id__in=invoice_ids)
+            .annotate(day=TruncDate("period_start"))
+            .values_list("day", "user_id")
+            .distinct()
+        )
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute the whole table. Returns the number of buckets."""
+        with transaction.atomic():
+            cls.objects.all().delete()
+            return len(cls._insert(TotalInvoice.objects.all()))
+
+    @classmethod
+    def _insert(cls, invoices):
+        """Upsert the buckets of `invoices`. Returns their ids."""
+        rows = (
+            invoices
+            .annotate(day=TruncDate("period_start"))
+            .order_by()
+            .values("day", "user_id", "patient__registered_by_id", "status")
+            .annotate(
+                invoice_count=models.Count("id"),
+                sum_total=Sum("total_amount"),
+                sum_paid=Sum("paid_amount"),
+                sum_remaining=Sum("remaining_amount"),
+            )
+        )
+        return [bucket.id for bucket in cls.objects.bulk_create(
+            [
+                cls(
+                    day=row["day"],
+                    user_id=row["user_id"],
+                    registered_by_id=row["patient__registered_by_id"],
+                    status=row["status"],
+                    invoice_count=row["invoice_count"],
+                    total_amount=row["sum_total"],
+                    paid_amount=row["sum_paid"],
+                    remaining_amount=row["sum_remaining"],
+                )
+                for row in rows
+            ],
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["day", "user", "registered_by", "status"],
+            update_fields=["invoice_count", "total_amount", "paid_amount", "remaining_amount"],
+        )]
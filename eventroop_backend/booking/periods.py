@@ -0,0 +1,113 @@
+"""
+Period boundaries for booking ranges.
+
+Every period of a range is derived from its index in closed form instead of
+walking the range day by day / month by month, so building a multi-year
+schedule is a single list comprehension.
+
+All arithmetic is wall-clock arithmetic in the tzinfo the datetimes carry
+(exactly what `aware_dt + timedelta(...)` and `relativedelta` do), so for a
+local zone a "day" ends at local 23:59:59.999999 even across DST shifts.
+Asia/Kolkata has no DST, but nothing here assumes that.
+"""
+import calendar
+import math
+from datetime import timedelta
+from itertools import accumulate
+
+from .constants import PeriodChoices
+
+ONE_DAY = timedelta(days=1)
+
+
+def _count_steps(start, end, step):
+    """Number of k >= 0 with start + k*step < end (same comparison as a while loop)."""
+    n = max(math.ceil((end - start) / step), 0)
+    # The estimate can be off by one when start/end carry different tzinfos
+    while n > 0 and not start + (n - 1) * step < end:
+        n -= 1
+    while start + n * step < end:
+        n += 1
+    return n
+
+
+def daily_periods(start, end):
+    """
+    One period per calendar day, each starting at start's time-of-day:
+        (start, day end), (start + 1d, day end), ... , (.., end)
+    """
+    if start >= end:
+        return []
+
+    # Every period shares start's time-of-day, so both edges are plain offsets
+    first_end = start.replace(hour=23, minute=59, second=59, microsecond=999999)
+    steps = [k * ONE_DAY for k in range(_count_steps(start, end, ONE_DAY))]
+    periods = [(start + step, first_end + step) for step in steps]
+
+    # Only the trailing period(s) can run past end
+    k = len(periods) - 1
+    while k >= 0 and not periods[k][1] < end:
+        periods[k] = (periods[k][0], min(periods[k][1], end))
+        k -= 1
+    return periods
+
+
+def weekly_periods(start, end):
+    """
+    Weekly packages are billed per day inside 7-day chunks; the chunks are
+    anchored at start, so the day boundaries are the same as daily_periods.
+    """
+    return daily_periods(start, end)
+
+
+def _month_starts(start, count):
+    """
+    start advanced by 0..count-1 months the way repeated
+    `+ relativedelta(months=1)` does it: once the day is clamped to a short
+    month (Jan 31 → Feb 28) it stays clamped (→ Mar 28).
+    """
+    months = [divmod(start.month - 1 + k, 12) for k in range(count)]
+    months = [(start.year + dy, m + 1) for dy, m in months]
+    days = accumulate(
+        (calendar.monthrange(y, m)[1] for y, m in months),
+        min,
+        initial=start.day,
+    )
+    next(days)  # the seed itself
+    return [start.replace(year=y, month=m, day=d) for (y, m), d in zip(months, days)]
+
+
+def monthly_periods(start, end):
+    """
+    Calendar-month periods anchored to the start date.
+    Example: Feb 4 → Mar 3  =  one period (Feb 4, Mar 3)
+             Feb 4 → Apr 9  =  (Feb 4, Mar 3), (Mar 4, Apr 3), (Apr 4, Apr 9)
+    """
+    if start >= end:
+        return []
+
+    # Upper bound on the number of periods; trimmed by the comparison below
+    estimate = (end.year - start.year) * 12 + (end.month - start.month) + 2
+    starts = _month_starts(start, estimate + 1)
+    count = sum(1 for s in starts if s < end)
+
+    return [
+        (starts[k], min(starts[k + 1] - ONE_DAY, end))
+        for k in range(count)
+    ]
+
+
+PERIOD_SPLITTERS = {
+    PeriodChoices.MONTHLY: monthly_periods,
+    PeriodChoices.WEEKLY: weekly_periods,
+    PeriodChoices.DAILY: daily_periods,
+    PeriodChoices.HOURLY: daily_periods,
+}
+
+
+def split_periods(period_type, start, end):
+    """(start, end) boundaries of every billing period of a booking range."""
+    splitter = PERIOD_SPLITTERS.get(period_type)
+    if not splitter:
+        return []
+    return splitter(start, end)
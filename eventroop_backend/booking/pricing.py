@@ -0,0 +1,150 @@
+"""
+Package pricing for booking intervals.
+
+PricingEngine replaces the per-row `calculate_amount()` work:
+- each Package is loaded once per engine (one engine per request / batch)
+- a package's rate is memoized in an LRU keyed on (package_id, updated_at),
+  so editing a package retires its cached rate automatically
+- DAILY and HOURLY charges are plain integer arithmetic on epoch
+  microseconds, no relativedelta objects
+- price_many() prices a whole list of intervals for one package at once
+
+DAILY counts the local calendar days an interval touches (inclusive);
+HOURLY counts started hours of the whole-second duration (minimum 1).
+"""
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .constants import PeriodChoices
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+US_PER_SECOND = 1_000_000
+SECONDS_PER_HOUR = 60 * 60
+SECONDS_PER_DAY = 24 * SECONDS_PER_HOUR
+
+PRICED_PERIODS = (PeriodChoices.DAILY, PeriodChoices.HOURLY)
+
+Rate = namedtuple("Rate", ["period", "price"])
+
+
+# ── Rate cache ─────────────────────────────────────────────────────────────────
+class RateCache:
+    """Thread-safe LRU of package rates keyed on (package_id, updated_at)."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._rates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, package):
+        if package.pk is None:
+            return _build_rate(package)
+
+        key = (package.pk, package.updated_at)
+        with self._lock:
+            rate = self._rates.get(key)
+            if rate is not None:
+                self._rates.move_to_end(key)
+                return rate
+
+        rate = _build_rate(package)
+        with self._lock:
+            self._rates[key] = rate
+            self._rates.move_to_end(key)
+            while len(self._rates) > self.maxsize:
+                self._rates.popitem(last=False)
+        return rate
+
+    def clear(self):
+        with self._lock:
+            self._rates.clear()
+
+
+def _build_rate(package):
+    if package.period not in PRICED_PERIODS:
+        raise ValueError(f"Unsupported package type:{package.period}")
+    return Rate(package.period, Decimal(package.price))
+
+
+rate_cache = RateCache()
+
+
+# ── Integer time arithmetic ────────────────────────────────────────────────────
+def _as_aware(value):
+    return value if timezone.is_aware(value) else timezone.make_aware(value)
+
+
+def epoch_us(value):
+    """Microseconds since the Unix epoch of an aware datetime."""
+    return (value - EPOCH) // MICROSECOND
+
+
+def local_day(value):
+    """Days since the epoch of `value`'s local calendar date."""
+    offset = timezone.localtime(value).utcoffset()
+    return (epoch_us(value) // US_PER_SECOND + offset.days * SECONDS_PER_DAY + offset.seconds) // SECONDS_PER_DAY
+
+
+def billable_units(period, start, end):
+    """Days (DAILY) or started hours (HOURLY) billed for [start, end]."""
+    if period == PeriodChoices.DAILY:
+        return local_day(end) - local_day(start) + 1
+
+    seconds = (epoch_us(end) - epoch_us(start)) // US_PER_SECOND
+    hours = -(-seconds // SECONDS_PER_HOUR)
+    return hours or 1
+
+
+# ── Engine ─────────────────────────────────────────────────────────────────────
+class PricingEngine:
+    """Prices booking intervals; keeps every Package it has seen for its lifetime."""
+
+    def __init__(self, cache=None):
+        self.cache = cache or rate_cache
+        self._packages = {}
+
+    def load(self, package_ids):
+        """Fetch every not yet known package of `package_ids` with one query."""
+        from .models import Package
+
+        missing = {pk for pk in package_ids if pk not in self._packages}
+        if missing:
+            for package in Package.objects.filter(pk__in=missing):
+                self._packages[package.pk] = package
+        return [self._packages[pk] for pk in package_ids if pk in self._packages]
+
+    def package(self, package):
+        """A Package instance (remembered) or id (loaded once)."""
+        if hasattr(package, "pk"):
+            if package.pk is not None:
+                self._packages.setdefault(package.pk, package)
+            return package
+        loaded = self.load([package])
+        if not loaded:
+            raise ValueError(f"Package {package} does not exist")
+        return loaded[0]
+
+    def rate(self, package):
+        return self.cache.get(self.package(package))
+
+    def price(self, package, start, end):
+        """Base charge of `package` for [start, end] (what calculate_amount returns)."""
+        return self.price_many(package, [(start, end)])[0]
+
+    def price_many(self, package, intervals):
+        """Base charge of `package` for every (start, end) of `intervals`, in order."""
+        rate = self.rate(package)
+        amounts = []
+        for start, end in intervals:
+            if not start or not end:
+                raise ValueError("Start date and end date are required")
+            start, end = _as_aware(start), _as_aware(end)
+            if end < start:
+                raise ValueError("End date must be >= start date")
+            amounts.append(Decimal(billable_units(rate.period, start, end)) * rate.price)
+        return amounts
@@ -0,0 +1,183 @@
+"""
+Transaction-scoped rollups for booking totals and invoices.
+
+Signal handlers only record *what* became dirty. Everything queued inside a
+transaction is recomputed once at commit with grouped UPDATEs, instead of one
+aggregate cascade per saved row:
+
+    TernaryOrder  → SecondaryOrder.subtotal → PrimaryOrder.total_bill
+    Secondary/Ternary in INVOICE_TRIGGER_STATUSES → TotalInvoice
+    Payment → TotalInvoice.paid_amount / remaining_amount / status
+    TotalInvoice → InvoiceDailySummary buckets
+
+Bulk code paths can silence the handlers with `suspended()` and mark what they
+touched themselves.
+
+With settings.BOOKING_TOTALS_MODE = "incremental" subtotal changes are instead
+pushed into the parent rows as F() deltas inside the saving transaction
+(see apply_subtotal_delta); booking.tasks.reconcile_booking_totals audits the
+result against a full aggregate.
+"""
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .constants import INVOICE_TRIGGER_STATUSES
+
+_state = threading.local()
+
+
+class RollupBatch:
+    """IDs collected during one transaction; flushed by its on_commit hook."""
+
+    def __init__(self):
+        self.primary_ids = set()            # total_bill
+        self.secondary_ids = set()          # subtotal (+ its primary and invoice)
+        self.secondary_invoice_ids = set()  # secondary orders to invoice
+        self.ternary_invoice_ids = set()    # ternary orders to invoice
+        self.invoice_ids = set()            # invoices whose payments changed
+        self.summary_keys = set()           # (day, user_id) summary buckets
+
+    def add(self, primary_ids=(), secondary_ids=(), secondary_invoice_ids=(),
+            ternary_invoice_ids=(), invoice_ids=(), summary_keys=()):
+        self.primary_ids.update(i for i in primary_ids if i)
+        self.secondary_ids.update(i for i in secondary_ids if i)
+        self.secondary_invoice_ids.update(i for i in secondary_invoice_ids if i)
+        self.ternary_invoice_ids.update(i for i in ternary_invoice_ids if i)
+        self.invoice_ids.update(i for i in invoice_ids if i)
+        self.summary_keys.update(summary_keys)
+
+    def __call__(self):
+        if getattr(_state, "batch", None) is self:
+            _state.batch = None
+        flush(self)
+
+
+def _pending_batch():
+    """The batch already registered on the current transaction, if any."""
+    batch = getattr(_state, "batch", None)
+    if batch is None or not connection.in_atomic_block:
+        return None
+    # A rolled back savepoint/transaction drops its on_commit hooks; the ids
+    # collected there are gone with it.
+    if any(func is batch for _, func, _ in connection.run_on_commit):
+        return batch
+    return None
+
+
+def mark_dirty(**ids):
+    """
+    Queue rollups for the current transaction (or run them immediately when
+    called outside one). Accepts the keyword sets of RollupBatch.add().
+    """
+    if getattr(_state, "suspended", 0):
+        return
+
+    batch = _pending_batch()
+    if batch is not None:
+        batch.add(**ids)
+        return
+
+    batch = RollupBatch()
+    batch.add(**ids)
+    if connection.in_atomic_block:
+        _state.batch = batch
+    transaction.on_commit(batch)
+
+
+@contextmanager
+def suspended():
+    """
+    Opt a bulk operation out of signal-driven rollups. The caller is then
+    responsible for calling mark_dirty()/flush() for the rows it touched.
+    """
+    _state.suspended = getattr(_state, "suspended", 0) + 1
+    try:
+        yield
+    finally:
+        _state.suspended -= 1
+
+
+def flush(batch):
+    """Recompute everything in `batch`, each row exactly once."""
+    from .models import PrimaryOrder, SecondaryOrder, TernaryOrder, TotalInvoice, InvoiceDailySummary
+
+    with transaction.atomic():
+        if batch.secondary_ids:
+            SecondaryOrder.bulk_recalculate_subtotal(batch.secondary_ids)
+            batch.primary_ids.update(
+                SecondaryOrder.objects
+                .filter(id__in=batch.secondary_ids, primary_order__isnull=False)
+                .values_list("primary_order_id", flat=True)
+            )
+            batch.secondary_invoice_ids.update(batch.secondary_ids)
+
+        if batch.primary_ids:
+            PrimaryOrder.bulk_recalculate_total(batch.primary_ids)
+
+        if batch.secondary_invoice_ids or batch.ternary_invoice_ids:
+            TotalInvoice.bulk_create_or_update(
+                secondaries=SecondaryOrder.objects.filter(
+                    id__in=batch.secondary_invoice_ids,
+                    status__in=INVOICE_TRIGGER_STATUSES,
+                ),
+                ternaries=TernaryOrder.objects.filter(
+                    id__in=batch.ternary_invoice_ids,
+                    status__in=INVOICE_TRIGGER_STATUSES,
+                ),
+            )
+
+        if batch.invoice_ids:
+            TotalInvoice.bulk_recalculate_payments(batch.invoice_ids)
+
+        if batch.summary_keys:
+            InvoiceDailySummary.refresh(batch.summary_keys)
+
+
+# ── Incremental mode ───────────────────────────────────────────────────────────
+def incremental_enabled():
+    return getattr(settings, "BOOKING_TOTALS_MODE", "aggregate") == "incremental"
+
+
+def apply_subtotal_delta(instance, created=False, deleted=False):
+    """
+    Push (new subtotal - old subtotal) of a Secondary/TernaryOrder into its
+    parents with F() expressions, O(1) regardless of how many siblings exist.
+
+    Returns False when the caller must fall back to a full recompute:
+    aggregate mode, or the previously stored subtotal is unknown.
+    """
+    from .models import PrimaryOrder, SecondaryOrder, TernaryOrder
+
+    if not incremental_enabled():
+        return False
+    if getattr(_state, "suspended", 0):
+        return True
+
+    old = Decimal("0.00") if created else getattr(instance, "_loaded_subtotal", None)
+    if old is None:
+        return False
+
+    new = Decimal("0.00") if deleted else instance.subtotal
+    delta = new - old
+    instance._loaded_subtotal = new
+
+    if not delta:
+        return True
+
+    if isinstance(instance, TernaryOrder):
+        SecondaryOrder.objects.filter(pk=instance.secondary_order_id).update(
+            subtotal=F("subtotal") + delta
+        )
+        PrimaryOrder.objects.filter(secondary_orders=instance.secondary_order_id).update(
+            total_bill=F("total_bill") + delta
+        )
+    elif instance.primary_order_id:
+        PrimaryOrder.objects.filter(pk=instance.primary_order_id).update(
+            total_bill=F("total_bill") + delta
+        )
+    return True
@@ -0,0 +1,95 @@
+"""
+Typeahead lookup of patients.
+
+Patient keeps two normalized columns, maintained in Patient.save():
+- search_name:    "first last", lower-cased, single-spaced
+- phone_reversed: phone digits reversed, so a phone *suffix* is a prefix
+
+both in the "C" collation, and these indexes (Postgres, migration 0052):
+- search_name    B-tree               → `LIKE 'term%' ORDER BY search_name`
+- search_name    gin_trgm_ops GIN     → `LIKE '%term%'` and `%` similarity
+- phone_reversed B-tree               → phone suffix
+- LOWER(email)   text_pattern_ops     → email prefix
+
+patient_lookup() runs the stages below in order, each one LIMITed and
+walking a single index, and stops as soon as the page is full, so
+prefix matches always come first:
+    1. name prefix        "ram"  → "ramesh kumar"
+    2. word prefix        "kum"  → "ramesh kumar"
+    3. substring / fuzzy  "mesh" → "ramesh kumar", "rmesh" → "ramesh kumar"
+Digits search phone suffixes, a term with "@" searches email prefixes.
+"""
+import re
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+LOOKUP_LIMIT = 20
+MAX_LOOKUP_LIMIT = 50
+
+# Trigram indexes need at least one full trigram to be selective
+MIN_TRIGRAM_LENGTH = 3
+MIN_PHONE_DIGITS = 3
+
+_SPACES = re.compile(r"\s+")
+_NON_DIGITS = re.compile(r"\D")
+
+
+# ── Normalization ──────────────────────────────────────────────────────────────
+def normalize_name(*parts):
+    """ "  Ramesh ", "KUMAR" → "ramesh kumar" """
+    return _SPACES.sub(" ", " ".join(part or "" for part in parts)).strip().lower()
+
+
+def reverse_phone(phone):
+    return _NON_DIGITS.sub("", phone or "")[::-1]
+
+
+# ── Lookup ─────────────────────────────────────────────────────────────────────
+def _take(queryset, found, limit, *ordering):
+    remaining = limit - len(found)
+    if remaining <= 0:
+        return
+    if found:
+        queryset = queryset.exclude(pk__in=[patient.pk for patient in found])
+    found.extend(queryset.order_by(*ordering)[:remaining])
+
+
+def patient_lookup(queryset, term, limit=LOOKUP_LIMIT):
+    """Up to `limit` patients of `queryset` matching `term`, best matches first."""
+    term = normalize_name(term)
+    if not term:
+        return []
+
+    found = []
+    digits = _NON_DIGITS.sub("", term)
+
+    if "@" in term:
+        _take(
+            queryset.alias(email_lower=Lower("email")).filter(email_lower__startswith=term),
+            found, limit, "email_lower", "pk",
+        )
+        return found
+
+    if digits and len(digits) == len(term.replace(" ", "")):
+        if len(digits) >= MIN_PHONE_DIGITS:
+            _take(
+                queryset.filter(phone_reversed__startswith=digits[::-1]),
+                found, limit, "phone_reversed", "pk",
+            )
+        return found
+
+    _take(queryset.filter(search_name__startswith=term), found, limit, "search_name", "pk")
+
+    if len(term) < MIN_TRIGRAM_LENGTH:
+        return found
+
+    _take(queryset.filter(search_name__contains=f" {term}"), found, limit, "search_name", "pk")
+    _take(
+        queryset
+        .filter(Q(search_name__contains=term) | Q(search_name__trigram_similar=term))
+        .annotate(similarity=TrigramSimilarity("search_name", term)),
+        found, limit, "-similarity", "search_name", "pk",
+    )
+    return found
@@ -135,13 +135,52 @@ class PackageSerializer(serializers.ModelSerializer):
             "belongs_to_type",
         ]
 
+def validate_service_window(primary_order, start_datetime, end_datetime):
+    """A service interval must be non-empty and inside its primary order's range."""
+    if start_datetime >= end_datetime:
+        raise serializers.ValidationError(
+            {"start_datetime": "Start datetime must be before end datetime."}
+        )
+
+    if (
+        start_datetime < primary_order.start_datetime
+        or end_datetime > primary_order.end_datetime
+    ):
+        raise serializers.ValidationError(
+            {
+                "start_datetime": (
+                    "Service dates must fall within the primary order range "
+                    f"({primary_order.start_datetime} - {primary_order.end_datetime})."
+                )
+            }
+        )
+
+
+class ServiceSlotSerializer(serializers.Serializer):
+    """One (start, end) slot of a multi-slot add_service request."""
+
+    start_datetime = serializers.DateTimeField()
+    end_datetime = serializers.DateTimeField()
+
+    def validate(self, attrs):
+        primary_order = self.context.get('primary_order')
+        if primary_order:
+            validate_service_window(primary_order, attrs['start_datetime'], attrs['end_datetime'])
+        return attrs
+
+
 class TernaryOrderCreateSerializer(serializers.ModelSerializer):
     """
     Create a TernaryOrder (service) under a SecondaryOrder.
     `secondary_order` is injected by the ViewSet via save().
     `primary_order` context is passed for date-range validation.
+
+    Either start_datetime/end_datetime or `slots` (a list of them sharing
+    venue/service/package/discount/premium) is required.
     """
 
+    slots = ServiceSlotSerializer(many=True, required=False, write_only=True)
+
     class Meta:
         model = TernaryOrder
         fields = [
@@ -152,11 +191,14 @@ class TernaryOrderCreateSerializer(serializers.ModelSerializer):
             'end_datetime',
             'discount_amount',
             'premium_amount',
+            'slots',
         ]
         extra_kwargs = {
             'venue': {'required': True},
             'service': {'required': True},
             'package': {'required': True},
+            'start_datetime': {'required': False},
+            'end_datetime': {'required': False},
         }
 
     def validate(self, attrs):
@@ -167,30 +209,37 @@ class TernaryOrderCreateSerializer(serializers.ModelSerializer):
                 {"primary_order": "Primary order context is missing."}
             )
 
+        if 'slots' in attrs:
+            slots = sorted(
+                (slot['start_datetime'], slot['end_datetime']) for slot in attrs['slots']
+            )
+            if not slots:
+                raise serializers.ValidationError({"slots": "At least one slot is required."})
+            # Availability is checked against stored bookings; the slots must not clash with each other
+            for (_, previous_end), (start, _) in zip(slots, slots[1:]):
+                if start < previous_end:
+                    raise serializers.ValidationError({"slots": "Slots must not overlap."})
+            return attrs
+
         start_datetime = attrs.get('start_datetime')
         end_datetime   = attrs.get('end_datetime')
 
-        if start_datetime and end_datetime:
-            if start_datetime >= end_datetime:
-                raise serializers.ValidationError(
-                    {"start_datetime": "Start datetime must be before end datetime."}
-                )
-
-            if (
-                start_datetime < primary_order.start_datetime
-                or end_datetime > primary_order.end_datetime
-            ):
-                raise serializers.ValidationError(
-                    {
-                        "start_datetime": (
-                            "Service dates must fall within the primary order range "
-                            f"({primary_order.start_datetime} - {primary_order.end_datetime})."
-                        )
-                    }
-                )
+        if not start_datetime or not end_datetime:
+            raise serializers.ValidationError(
+                {"start_datetime": "start_datetime and end_datetime (or slots) are required."}
+            )
 
+        validate_service_window(primary_order, start_datetime, end_datetime)
         return attrs
 
+    def line_items(self):
+        """One TernaryOrder payload per slot (a single one without `slots`)."""
+        data = dict(self.validated_data)
+        slots = data.pop('slots', None)
+        if slots is None:
+            return [data]
+        return [{**data, **slot} for slot in slots]
+
 class TernaryOrderSerializer(serializers.ModelSerializer):
     """Read serializer for a single TernaryOrder (service line item)."""
 
@@ -483,6 +532,20 @@ class PaymentCreateSerializer(serializers.ModelSerializer):
             )
         return value
 
+class PaymentBulkRowSerializer(PaymentCreateSerializer):
+    """One row of a bulk payment upload: a payment plus the invoice it settles."""
+
+    invoice_id = serializers.IntegerField(required=False)
+    invoice_number = serializers.CharField(required=False)
+
+    class Meta(PaymentCreateSerializer.Meta):
+        fields = PaymentCreateSerializer.Meta.fields + ['invoice_id', 'invoice_number']
+
+    def validate(self, data):
+        if not data.get('invoice_id') and not data.get('invoice_number'):
+            raise serializers.ValidationError("Provide invoice_id or invoice_number.")
+        return data
+
 class TotalInvoiceSerializer(serializers.ModelSerializer):
     """
     Unified serializer for TotalInvoice list and detail views.
@@ -1,80 +1,159 @@
-from django.db.models.signals import post_save, post_delete
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from django.db import transaction
-from .models import SecondaryOrder,TernaryOrder, TotalInvoice, BookingStatus, Payment
+from accounts.models import CustomUser
+from venue_manager.models import Venue, Service, Resource
+from .models import (
+    Location, Package, Patient, PrimaryOrder, SecondaryOrder, TernaryOrder,
+    TotalInvoice, InvoiceDailySummary, Payment,
+)
+from . import dropdowns, rollups, snapshots
 
+# Handlers only queue work; booking.rollups recomputes each dirty row once
+# when the surrounding transaction commits.
 
 @receiver(post_save, sender=Payment)
 def update_invoice_on_payment_save(sender, instance, **kwargs):
     """Recalculate invoice when payment is created or updated"""
-    
-    def _recalculate():
-        instance.invoice.recalculate_payments()
-
-    transaction.on_commit(_recalculate)
+    rollups.mark_dirty(invoice_ids=[instance.invoice_id])
 
 
 @receiver(post_delete, sender=Payment)
 def update_invoice_on_payment_delete(sender, instance, **kwargs):
     """Recalculate invoice when payment is deleted"""
-    
-    def _recalculate():
-        instance.invoice.recalculate_payments()
+    rollups.mark_dirty(invoice_ids=[instance.invoice_id])
 
-    transaction.on_commit(_recalculate)
 
+@receiver([post_save, post_delete], sender=TotalInvoice)
+def invoice_summary_stale(sender, instance, **kwargs):
+    """Per-row invoice writes; the bulk paths refresh their buckets themselves."""
+    rollups.mark_dirty(summary_keys=[InvoiceDailySummary.key_of(instance)])
 
-INVOICE_TRIGGER_STATUSES = {
-    BookingStatus.UNFULFILLED,
-    BookingStatus.PARTIALLY_FULFILLED,
-    BookingStatus.FULFILLED,
-}
 
 @receiver(post_save, sender=SecondaryOrder)
 def secondary_saved(sender, instance, created, **kwargs):
+    # Primary total + invoice generation
+    if rollups.apply_subtotal_delta(instance, created=created):
+        rollups.mark_dirty(secondary_invoice_ids=[instance.pk])
+    else:
+        rollups.mark_dirty(
+            primary_ids=[instance.primary_order_id],
+            secondary_invoice_ids=[instance.pk],
+        )
 
-    def _update():
-        #  Update Primary total
-        if instance.primary_order_id:
-            instance.primary_order.recalculate_total()
 
-        #  Invoice generation
-        if instance.status in INVOICE_TRIGGER_STATUSES:
-            TotalInvoice.create_or_update_for_secondary(instance)
+@receiver(post_delete, sender=SecondaryOrder)
+def secondary_deleted(sender, instance, **kwargs):
+    # Always a full recompute: the cascaded TernaryOrder deletes have already
+    # pushed their own deltas, so the in-memory subtotal would double count.
+    rollups.mark_dirty(primary_ids=[instance.primary_order_id])
 
-    transaction.on_commit(_update)
 
+@receiver(post_save, sender=TernaryOrder)
+def ternary_saved(sender, instance, created, **kwargs):
+    # Secondary subtotal (cascades to primary) + invoice generation
+    if rollups.apply_subtotal_delta(instance, created=created):
+        rollups.mark_dirty(
+            secondary_invoice_ids=[instance.secondary_order_id],
+            ternary_invoice_ids=[instance.pk],
+        )
+    else:
+        rollups.mark_dirty(
+            secondary_ids=[instance.secondary_order_id],
+            ternary_invoice_ids=[instance.pk],
+        )
 
-@receiver(post_delete, sender=SecondaryOrder)
-def secondary_deleted(sender, instance, **kwargs):
 
-    def _update():
-        if instance.primary_order_id:
-            instance.primary_order.recalculate_total()
+@receiver(post_delete, sender=TernaryOrder)
+def ternary_deleted(sender, instance, **kwargs):
+    if rollups.apply_subtotal_delta(instance, deleted=True):
+        rollups.mark_dirty(secondary_invoice_ids=[instance.secondary_order_id])
+    else:
+        rollups.mark_dirty(secondary_ids=[instance.secondary_order_id])
 
-    transaction.on_commit(_update)
 
+# ── Order tree snapshots ───────────────────────────────────────────────────────
+# Not routed through rollups: snapshots must be retired even while a bulk
+# path has the rollups suspended.
 
-@receiver(post_save, sender=TernaryOrder)
-def ternary_saved(sender, instance, created, **kwargs):
+@receiver([post_save, post_delete], sender=PrimaryOrder)
+def primary_snapshot_stale(sender, instance, **kwargs):
+    snapshots.invalidate([instance.pk])
 
-    def _update():
-        # Update Secondary subtotal
-        if instance.secondary_order_id:
-            instance.secondary_order.recalculate_subtotal()
 
-        # Invoice generation
-        if instance.status in INVOICE_TRIGGER_STATUSES:
-            TotalInvoice.create_or_update_for_ternary(instance)
+@receiver([post_save, post_delete], sender=SecondaryOrder)
+def secondary_snapshot_stale(sender, instance, **kwargs):
+    snapshots.invalidate([instance.primary_order_id])
 
-    transaction.on_commit(_update)
 
+@receiver([post_save, post_delete], sender=TernaryOrder)
+def ternary_snapshot_stale(sender, instance, **kwargs):
+    snapshots.invalidate_secondaries([instance.secondary_order_id])
 
-@receiver(post_delete, sender=TernaryOrder)
-def ternary_deleted(sender, instance, **kwargs):
 
-    def _update():
-        if instance.secondary_order_id:
-            instance.secondary_order.recalculate_subtotal()
+@receiver(post_save, sender=Patient)
+def patient_snapshot_stale(sender, instance, created, **kwargs):
+    if not created:
+        snapshots.invalidate(instance.primaryorder_set.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=CustomUser)
+def user_snapshot_stale(sender, instance, created, update_fields=None, **kwargs):
+    # Trees show the booking user's email
+    if created or (update_fields and not {"email", "first_name", "last_name"} & set(update_fields)):
+        return
+    snapshots.invalidate(PrimaryOrder.objects.filter(user=instance).values_list("id", flat=True))
+
+
+@receiver([post_save, post_delete], sender=Venue)
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=Package)
+@receiver([post_save, post_delete], sender=Location)
+def catalog_snapshot_stale(sender, instance, created=False, **kwargs):
+    # A delete nulls the references with a plain UPDATE, which sends no signals
+    if not created:
+        snapshots.invalidate_catalog()
+
+
+# ── Dropdown caches ────────────────────────────────────────────────────────────
+# Public venue/service dropdowns, each user's patient dropdown, and
+# PackageViewSet.by_belongs_to (an owner's entities / an entity's packages).
+
+@receiver([post_save, post_delete], sender=Venue)
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=Resource)
+def entity_dropdown_stale(sender, instance, **kwargs):
+    entity = sender._meta.model_name
+    pairs = [
+        ("entities", f"{entity}:{instance.owner_id}"),
+        ("packages", f"{entity}:{instance.pk}"),
+    ]
+    if sender is not Resource:
+        # Services list their venues
+        pairs += [("venues", "public"), ("services", "public")]
+    dropdowns.invalidate(*pairs)
+
+
+@receiver(m2m_changed, sender=Service.venue.through)
+def service_venues_stale(sender, **kwargs):
+    if kwargs["action"] in ("post_add", "post_remove", "post_clear"):
+        dropdowns.invalidate(("services", "public"))
+
+
+@receiver(post_save, sender=Location)
+def venue_location_stale(sender, instance, created, **kwargs):
+    # Venue dropdowns show the locality
+    if not created:
+        dropdowns.invalidate(("venues", "public"), ("services", "public"))
+
+
+@receiver([post_save, post_delete], sender=Patient)
+def patient_dropdown_stale(sender, instance, **kwargs):
+    dropdowns.invalidate(("patients", "all"), ("patients", instance.registered_by_id))
+
 
-    transaction.on_commit(_update)
\ No newline at end of file
+@receiver([post_save, post_delete], sender=Package)
+def package_dropdown_stale(sender, instance, **kwargs):
+    if instance.content_type_id and instance.object_id:
+        entity = ContentType.objects.get_for_id(instance.content_type_id).model
+        dropdowns.invalidate(("packages", f"{entity}:{instance.object_id}"))
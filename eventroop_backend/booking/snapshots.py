@@ -0,0 +1,192 @@
+"""
+Cached, versioned JSON snapshots of PrimaryOrder trees
+(PrimaryOrder → SecondaryOrders → TernaryOrders, as PrimaryOrderSerializer renders them).
+
+Keys:
+    booking:order:<id>:v                            per-order version counter
+    booking:order-catalog:v                         venue/service/package/location names
+    booking:order:<id>:<SCHEMA>:<catalog>:<v>       the serialized tree at those versions
+
+Writers never delete snapshots, they bump the order's version once their
+transaction commits (invalidate()). A reader that serialized stale rows can
+only store them under the old version, which nobody reads any more.
+Renaming a venue/service/package/location bumps the shared catalog version
+instead of every order that shows the name (invalidate_catalog()).
+SNAPSHOT_SCHEMA is bumped whenever the serializers' output changes.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Prefetch
+
+SNAPSHOT_SCHEMA = 1
+SNAPSHOT_TIMEOUT = 60 * 60 * 24       # 1 day
+VERSION_TIMEOUT = 60 * 60 * 24 * 7    # outlives the snapshots it points to
+CATALOG_KEY = "booking:order-catalog:v"
+
+_state = threading.local()
+
+
+def _version_key(order_id):
+    return f"booking:order:{order_id}:v"
+
+
+def _snapshot_key(order_id, catalog, version):
+    return f"booking:order:{order_id}:{SNAPSHOT_SCHEMA}:{catalog}:{version}"
+
+
+def _fresh_version():
+    # Never reuses a value, even after the counter was evicted
+    return time.time_ns()
+
+
+# ── Invalidation ───────────────────────────────────────────────────────────────
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_version(), VERSION_TIMEOUT)
+
+
+def invalidate(order_ids):
+    """Retire the snapshots of these PrimaryOrders once the current transaction commits."""
+    keys = {_version_key(order_id) for order_id in order_ids if order_id}
+    if keys:
+        transaction.on_commit(lambda: _bump(keys))
+
+
+class _SecondaryBatch:
+    """SecondaryOrder ids whose orders go stale with the current transaction."""
+
+    def __init__(self):
+        self.ids = set()
+
+    def __call__(self):
+        from .models import SecondaryOrder
+
+        if getattr(_state, "secondaries", None) is self:
+            _state.secondaries = None
+        order_ids = (
+            SecondaryOrder.objects
+            .filter(pk__in=self.ids)
+            .values_list("primary_order_id", flat=True)
+        )
+        _bump({_version_key(order_id) for order_id in order_ids if order_id})
+
+
+def invalidate_secondaries(secondary_ids):
+    """
+    invalidate() for the PrimaryOrders of these SecondaryOrders. Their ids are
+    resolved with one query when the transaction commits, however many rows
+    it touched.
+    """
+    ids = {pk for pk in secondary_ids if pk}
+    if not ids:
+        return
+
+    batch = getattr(_state, "secondaries", None)
+    # A rolled back transaction drops its hook along with the ids in it
+    if batch is None or not any(func is batch for _, func, _ in connection.run_on_commit):
+        batch = _SecondaryBatch()
+        if connection.in_atomic_block:
+            _state.secondaries = batch
+        transaction.on_commit(batch)
+    batch.ids.update(ids)
+
+
+def invalidate_catalog():
+    """Retire every snapshot (a name shown in many trees changed)."""
+    transaction.on_commit(lambda: _bump([CATALOG_KEY]))
+
+
+# ── Reads ──────────────────────────────────────────────────────────────────────
+def tree_queryset():
+    """Everything PrimaryOrderSerializer touches, in a fixed number of queries."""
+    from .models import PrimaryOrder, SecondaryOrder, TernaryOrder
+
+    return PrimaryOrder.objects.select_related(
+        "patient", "user", "venue__location", "service", "package",
+    ).prefetch_related(
+        Prefetch(
+            "secondary_orders",
+            queryset=SecondaryOrder.objects.prefetch_related(
+                Prefetch(
+                    "ternary_orders",
+                    queryset=TernaryOrder.objects.select_related(
+                        "venue__location", "service", "package",
+                    ),
+                )
+            ),
+        )
+    )
+
+
+def order_trees(order_ids):
+    """
+    Serialized trees for `order_ids`, in that order. Cache hits skip the ORM
+    and DRF entirely; misses are serialized in one batch and stored.
+
+    Inside a transaction nothing is stored: the rows may still roll back.
+    """
+    from .serializers import PrimaryOrderSerializer
+
+    order_ids = list(order_ids)
+    if not order_ids:
+        return []
+
+    store = not connection.in_atomic_block
+
+    version_keys = {order_id: _version_key(order_id) for order_id in order_ids}
+    current = cache.get_many([CATALOG_KEY, *version_keys.values()])
+
+    missing = {
+        key: _fresh_version()
+        for key in [CATALOG_KEY, *version_keys.values()]
+        if key not in current
+    }
+    if missing and store:
+        for key, version in missing.items():
+            # add(): keep a version another worker set in the meantime
+            cache.add(key, version, VERSION_TIMEOUT)
+        current.update(cache.get_many(list(missing)))
+
+    catalog = current.get(CATALOG_KEY)
+    snapshot_keys = {
+        order_id: _snapshot_key(order_id, catalog, current[key])
+        for order_id, key in version_keys.items()
+        if catalog is not None and key in current
+    }
+    hits = cache.get_many(list(snapshot_keys.values())) if store else {}
+    trees = {
+        order_id: hits[key]
+        for order_id, key in snapshot_keys.items()
+        if key in hits
+    }
+
+    misses = [order_id for order_id in order_ids if order_id not in trees]
+    if misses:
+        built = {
+            order.pk: PrimaryOrderSerializer(order).data
+            for order in tree_queryset().filter(id__in=misses)
+        }
+        trees.update(built)
+
+        if store:
+            cache.set_many(
+                {
+                    snapshot_keys[order_id]: data
+                    for order_id, data in built.items()
+                    if order_id in snapshot_keys
+                },
+                SNAPSHOT_TIMEOUT,
+            )
+
+    return [trees[order_id] for order_id in order_ids if order_id in trees]
+
+
+def order_tree(order_id):
+    trees = order_trees([order_id])
+    return trees[0] if trees else None
@@ -0,0 +1,190 @@
+# booking/tasks.py
+from decimal import Decimal
+
+from celery import shared_task
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from booking.constants import BookingStatus
+from booking import snapshots
+from booking.exports import EXPORTS, EXPORT_FORMATS, export_ledger_file
+from booking.models import PrimaryOrder, SecondaryOrder, TernaryOrder, TotalInvoice, SweepCheckpoint
+
+# Statuses auto_update_status() assigns that a time boundary can still change
+TIME_DRIVEN_STATUSES = [BookingStatus.YET_TO_START, BookingStatus.IN_PROGRESS]
+
+
+@shared_task
+def reconcile_booking_totals(fix=False, limit=500):
+    """
+    Compare every PrimaryOrder.total_bill with a full SUM() of its
+    SecondaryOrder subtotals and report (optionally repair) any drift.
+
+    Guards BOOKING_TOTALS_MODE = "incremental", where totals are maintained
+    with F() deltas instead of being recomputed.
+    """
+    expected = Coalesce(
+        Subquery(
+            SecondaryOrder.objects
+            .filter(primary_order=OuterRef("pk"))
+            .values("primary_order")
+            .annotate(total=Sum("subtotal"))
+            .values("total")[:1],
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        Decimal("0.00"),
+    )
+
+    try:
+        drifted = list(
+            PrimaryOrder.objects
+            .annotate(expected_total=expected)
+            .exclude(total_bill=expected)
+            .values("id", "order_id", "total_bill", "expected_total")[:limit]
+        )
+    except Exception as e:
+        return {
+            'status': 'error',
+            'message': f"Error checking booking totals: {str(e)}"
+        }
+
+    if not drifted:
+        return {
+            'status': 'success',
+            'message': "All booking totals are consistent.",
+            'drift': [],
+        }
+
+    if fix:
+        PrimaryOrder.bulk_recalculate_total([row["id"] for row in drifted])
+
+    return {
+        'status': 'success',
+        'message': (
+            f"{len(drifted)} booking total(s) drifted"
+            f"{' and were repaired' if fix else ''}."
+        ),
+        'drift': [
+            {
+                'id': row["id"],
+                'order_id': row["order_id"],
+                'total_bill': str(row["total_bill"]),
+                'expected': str(row["expected_total"]),
+            }
+            for row in drifted
+        ],
+    }
+
+
+@shared_task
+def sweep_booking_statuses():
+    """
+    Move orders whose start/end boundary has passed:
+        YET_TO_START → IN_PROGRESS   (start_datetime <= now <= end_datetime)
+        YET_TO_START/IN_PROGRESS → FULFILLED   (end_datetime < now)
+    and invoice the newly fulfilled Secondary/Ternary orders in bulk.
+
+    The (status, start/end) indexes limit every query to the rows still in a
+    time-driven status past their boundary, i.e. the ones to move. Bounding
+    them by the previous run would lose rows committed late (a backdated
+    create, a slow reschedule) with a boundary already behind that run.
+    SweepCheckpoint serializes runs and records the last one.
+    Manually set statuses (HOLD, CANCELLED, ...) are never touched.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        checkpoint, _ = (
+            SweepCheckpoint.objects
+            .select_for_update()
+            .get_or_create(name="booking_status")
+        )
+
+        started_ids = {}
+        fulfilled_ids = {}
+
+        for model in (PrimaryOrder, SecondaryOrder, TernaryOrder):
+            ended = model.objects.filter(status__in=TIME_DRIVEN_STATUSES, end_datetime__lt=now)
+            started = model.objects.filter(
+                status=BookingStatus.YET_TO_START,
+                start_datetime__lte=now,
+                end_datetime__gte=now,
+            )
+
+            ids = list(ended.values_list("id", flat=True))
+            if ids:
+                model.objects.filter(id__in=ids).update(status=BookingStatus.FULFILLED)
+            fulfilled_ids[model] = ids
+
+            ids = list(started.values_list("id", flat=True))
+            if ids:
+                model.objects.filter(id__in=ids).update(status=BookingStatus.IN_PROGRESS)
+            started_ids[model] = ids
+
+        TotalInvoice.bulk_create_or_update(
+            secondaries=SecondaryOrder.objects.filter(id__in=fulfilled_ids[SecondaryOrder]),
+            ternaries=TernaryOrder.objects.filter(id__in=fulfilled_ids[TernaryOrder]),
+        )
+
+        # Every order tree with a changed status
+        touched = {model: fulfilled_ids[model] + started_ids[model] for model in fulfilled_ids}
+        snapshots.invalidate(touched[PrimaryOrder])
+        if touched[SecondaryOrder]:
+            snapshots.invalidate(
+                SecondaryOrder.objects.filter(id__in=touched[SecondaryOrder])
+                .values_list("primary_order_id", flat=True).distinct()
+            )
+        if touched[TernaryOrder]:
+            snapshots.invalidate(
+                TernaryOrder.objects.filter(id__in=touched[TernaryOrder])
+                .values_list("secondary_order__primary_order_id", flat=True).distinct()
+            )
+
+        checkpoint.swept_until = now
+        checkpoint.save(update_fields=["swept_until", "updated_at"])
+
+    return {
+        'status': 'success',
+        'message': f"Booking statuses swept up to {now.isoformat()}.",
+        'in_progress': {model.__name__: len(ids) for model, ids in started_ids.items()},
+        'fulfilled': {model.__name__: len(ids) for model, ids in fulfilled_ids.items()},
+    }
+
+
+@shared_task
+def export_ledger(kind, file_format="csv", user_id=None, query_string=""):
+    """
+    Write a ledger export (see booking.exports) to the "exports" storage.
+    user_id limits it to what that user can see through the API, and
+    query_string re-applies the export request's filters and ordering.
+    """
+    from accounts.models import CustomUser
+
+    if kind not in EXPORTS or file_format not in EXPORT_FORMATS:
+        return {
+            'status': 'error',
+            'message': f"Unknown export {kind!r} / {file_format!r}",
+        }
+
+    user = CustomUser.objects.filter(pk=user_id).first() if user_id else None
+
+    try:
+        queryset = None
+        if user is not None:
+            from booking.views import LedgerExportMixin
+            queryset = LedgerExportMixin.for_kind(kind).export_queryset(user, query_string)
+        name, url = export_ledger_file(kind, file_format, user=user, queryset=queryset)
+    except Exception as e:
+        return {
+            'status': 'error',
+            'message': f"Error exporting {kind}: {str(e)}"
+        }
+
+    return {
+        'status': 'success',
+        'message': f"{kind} exported to {name}.",
+        'file': name,
+        'url': url,
+    }
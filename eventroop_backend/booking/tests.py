@@ -0,0 +1,349 @@
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser
+from venue_manager.models import Service, Venue
+
+from . import benchmarks
+from .availability import BookingConflict, booked_intervals, ensure_available
+from .constants import BookingEntity, BookingStatus, BookingType, PeriodChoices
+from .models import Location, Package, Patient, PrimaryOrder
+from .pricing import PricingEngine, RateCache
+from .transitions import change_status
+
+
+# ----------------------------------------------------------
+# REFERENCE: booking.utils.calculate_amount before booking.pricing
+# ----------------------------------------------------------
+def legacy_calculate_amount(startdate, enddate, package):
+    if not startdate or not enddate:
+        raise ValueError("Start date and end date are required")
+
+    if enddate < startdate:
+        raise ValueError("End date must be >= start date")
+
+    # DAILY PACKAGE
+    if package.period == "DAILY":
+        delta = relativedelta(enddate.date(), startdate.date())
+        total_days = delta.days + 1   # include end date
+        return Decimal(total_days) * package.price
+
+    # HOURLY PACKAGE
+    elif package.period == "HOURLY":
+        delta = relativedelta(enddate, startdate)
+
+        total_hours = (
+            delta.days * 24
+            + delta.hours
+            + (1 if delta.minutes > 0 or delta.seconds > 0 else 0)
+        )
+
+        # If start == end (same time), count as 1 hour
+        if total_hours == 0:
+            total_hours = 1
+
+        return Decimal(total_hours) * package.price
+
+    else:
+        raise ValueError(f"Unsupported package type:{package.period}")
+
+
+def make_package(pk, period, price, updated_at=None):
+    return Package(
+        pk=pk,
+        period=period,
+        price=Decimal(price),
+        updated_at=updated_at or datetime(2025, 1, 1, tzinfo=dt_timezone.utc),
+    )
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class PricingEngineEquivalenceTests(SimpleTestCase):
+    """PricingEngine must bill exactly what calculate_amount billed."""
+
+    def setUp(self):
+        self.engine = PricingEngine(cache=RateCache())
+        self.daily = make_package(1, PeriodChoices.DAILY, "1250.00")
+        self.hourly = make_package(2, PeriodChoices.HOURLY, "99.50")
+
+    def random_intervals(self, seed, count=500, max_span=timedelta(days=27)):
+        # Legacy relativedelta arithmetic drops whole months, so equivalence
+        # is only defined below a month (see test_spans_over_a_month)
+        rng = random.Random(seed)
+        base = local(2025, 1, 1)
+        intervals = []
+        for _ in range(count):
+            start = base + timedelta(
+                days=rng.randrange(730),
+                seconds=rng.randrange(86400),
+                microseconds=rng.choice([0, 0, 999999, rng.randrange(1000000)]),
+            )
+            span = timedelta(microseconds=rng.randrange(int(max_span / timedelta(microseconds=1))))
+            intervals.append((start, start + span))
+        return intervals
+
+    def assert_equivalent(self, package, intervals):
+        batched = self.engine.price_many(package, intervals)
+        for (start, end), amount in zip(intervals, batched):
+            expected = legacy_calculate_amount(start, end, package)
+            self.assertEqual(amount, expected, f"{package.period} {start} → {end}")
+            self.assertEqual(self.engine.price(package, start, end), expected)
+
+    def test_daily_random_intervals(self):
+        self.assert_equivalent(self.daily, self.random_intervals(seed=1))
+
+    def test_hourly_random_intervals(self):
+        self.assert_equivalent(self.hourly, self.random_intervals(seed=2, max_span=timedelta(days=3)))
+        self.assert_equivalent(self.hourly, self.random_intervals(seed=3))
+
+    def test_period_boundaries(self):
+        day = local(2025, 3, 10)
+        end_of_day = day.replace(hour=23, minute=59, second=59, microsecond=999999)
+        intervals = [
+            (day, day),
+            (day, end_of_day),
+            (day, day + timedelta(days=1)),
+            (end_of_day, end_of_day + timedelta(microseconds=1)),
+            (day, day + timedelta(hours=1)),
+            (day, day + timedelta(hours=1, microseconds=1)),
+            (day, day + timedelta(hours=1, seconds=1)),
+            (day + timedelta(microseconds=500000), day + timedelta(hours=1, seconds=1, microseconds=200000)),
+            (local(2024, 2, 28, 22), local(2024, 3, 1, 2)),   # leap day
+            (local(2025, 12, 31, 23), local(2026, 1, 1, 1)),  # year end
+        ]
+        self.assert_equivalent(self.daily, intervals)
+        self.assert_equivalent(self.hourly, intervals)
+
+    def test_naive_datetimes_are_local(self):
+        start, end = datetime(2025, 5, 1, 9), datetime(2025, 5, 3, 10, 30)
+        self.assertEqual(
+            self.engine.price(self.daily, start, end),
+            legacy_calculate_amount(start, end, self.daily),
+        )
+        self.assertEqual(
+            self.engine.price(self.hourly, start, end),
+            legacy_calculate_amount(start, end, self.hourly),
+        )
+
+    def test_errors(self):
+        day = local(2025, 3, 10)
+        with self.assertRaisesMessage(ValueError, "End date must be >= start date"):
+            self.engine.price(self.daily, day, day - timedelta(seconds=1))
+        with self.assertRaisesMessage(ValueError, "Start date and end date are required"):
+            self.engine.price(self.daily, None, day)
+        monthly = make_package(3, PeriodChoices.MONTHLY, "10.00")
+        with self.assertRaisesMessage(ValueError, "Unsupported package type:MONTHLY"):
+            self.engine.price(monthly, day, day)
+
+
+class PricingEngineTests(SimpleTestCase):
+
+    def setUp(self):
+        self.engine = PricingEngine(cache=RateCache(maxsize=2))
+
+    def test_days_are_local_whatever_the_tzinfo(self):
+        # DB values come back in UTC; 2025-03-10 00:30 IST is 2025-03-09 19:00 UTC
+        package = make_package(1, PeriodChoices.DAILY, "100.00")
+        start, end = local(2025, 3, 10, 0, 30), local(2025, 3, 10, 23, 0)
+        utc = dt_timezone.utc
+        self.assertEqual(self.engine.price(package, start, end), Decimal("100.00"))
+        self.assertEqual(
+            self.engine.price(package, start.astimezone(utc), end.astimezone(utc)),
+            Decimal("100.00"),
+        )
+
+    def test_spans_over_a_month(self):
+        # relativedelta().days/.hours ignored whole months; every day/hour is billed now
+        daily = make_package(1, PeriodChoices.DAILY, "10.00")
+        hourly = make_package(2, PeriodChoices.HOURLY, "1.00")
+        start, end = local(2025, 1, 1), local(2025, 3, 5, 12)
+        self.assertEqual(self.engine.price(daily, start, end), Decimal("640.00"))
+        self.assertEqual(self.engine.price(hourly, start, end), Decimal(63 * 24 + 12))
+
+    def test_rate_cache_follows_updated_at(self):
+        stamp = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+        day = local(2025, 3, 10)
+        package = make_package(1, PeriodChoices.DAILY, "100.00", updated_at=stamp)
+        self.assertEqual(self.engine.price(package, day, day), Decimal("100.00"))
+
+        # Same version: the memoized rate is used
+        same_version = make_package(1, PeriodChoices.DAILY, "999.00", updated_at=stamp)
+        self.assertEqual(PricingEngine(cache=self.engine.cache).price(same_version, day, day), Decimal("100.00"))
+
+        # Saving the package bumps updated_at and retires the cached rate
+        edited = make_package(1, PeriodChoices.DAILY, "120.00", updated_at=stamp + timedelta(seconds=1))
+        self.assertEqual(PricingEngine(cache=self.engine.cache).price(edited, day, day), Decimal("120.00"))
+
+    def test_rate_cache_is_bounded(self):
+        cache = self.engine.cache
+        for pk in range(1, 6):
+            cache.get(make_package(pk, PeriodChoices.HOURLY, "1.00"))
+        self.assertEqual(len(cache._rates), 2)
+
+    def test_package_instances_are_kept(self):
+        package = make_package(7, PeriodChoices.DAILY, "1.00")
+        self.assertIs(self.engine.package(package), package)
+        self.assertIs(self.engine.package(7), package)
+
+
+# ----------------------------------------------------------
+# QUERY BUDGETS (see booking.benchmarks / manage.py benchmark_api)
+# ----------------------------------------------------------
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.dataset = benchmarks.seed(benchmarks.SCALES["smoke"])
+
+    def test_scenarios_within_budget(self):
+        for scenario in benchmarks.SCENARIOS:
+            with self.subTest(scenario=scenario.name):
+                result = benchmarks.measure(self.dataset, scenario, repeat=1)
+                self.assertLess(result["status"], 400)
+                if scenario.budget is not None:
+                    self.assertLessEqual(result["queries"], scenario.budget)
+
+
+# ----------------------------------------------------------
+# AVAILABILITY
+# ----------------------------------------------------------
+class AvailabilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = owner = CustomUser.objects.create_user(
+            "owner@availability.test", "7100000000", "pw", first_name="O", last_name="A",
+            gender="M", user_type=CustomUser.UserTypes.VSRE_OWNER, address="-", city="-",
+        )
+        location = Location.objects.create(
+            location_type=BookingType.IN_HOUSE, building_name="B", address_line1="A",
+            locality="L", city="C", state="S", postal_code="100001",
+        )
+        cls.venue = Venue.objects.create(owner=owner, name="V", location=location, capacity=1)
+        cls.service = Service.objects.create(owner=owner, name="S", address="A", city="C")
+        cls.package = Package.objects.create(
+            owner=owner, name="Daily", price=Decimal("100.00"), period=PeriodChoices.DAILY,
+            package_type=BookingType.IN_HOUSE, belongs_to=cls.venue,
+        )
+        cls.patient = patient = Patient.objects.create(
+            registered_by=owner, first_name="P", last_name="A", phone="9000000000",
+            email="p@availability.test", address="A", emergency_contact="E",
+            emergency_phone="9999999999", gender="male", id_proof="aadhar", id_proof_number="1",
+        )
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.order = PrimaryOrder.objects.create(
+                user=owner, patient=patient, booking_entity=BookingEntity.VENUE,
+                venue=cls.venue, service=cls.service, package=cls.package,
+                start_datetime=local(2031, 3, 1), end_datetime=local(2031, 3, 3, 23, 59),
+            )
+            cls.order.generate_secondary_full_range_dates()
+            slot = (local(2031, 3, 2, 10), local(2031, 3, 2, 12))
+            cls.order.add_services([{
+                "secondary_order": cls.order.containing_periods([slot])[0],
+                "venue": cls.venue, "service": cls.service, "package": cls.package,
+                "start_datetime": slot[0], "end_datetime": slot[1],
+            }])
+
+    def test_service_inside_venue_booking_counts_once(self):
+        intervals = booked_intervals(
+            BookingEntity.VENUE, self.venue.pk, local(2031, 3, 2, 11), local(2031, 3, 2, 13)
+        )
+        self.assertEqual(len(intervals), 1)
+
+    def test_booking_does_not_conflict_with_its_own_services(self):
+        ensure_available(
+            [(local(2031, 3, 2, 11), local(2031, 3, 2, 13))],
+            venue_id=self.venue.pk,
+            service_id=self.service.pk,
+            exclude_primary_id=self.order.pk,
+        )
+
+        with self.assertRaises(BookingConflict):
+            ensure_available([(local(2031, 3, 2, 11), local(2031, 3, 2, 13))], venue_id=self.venue.pk)
+
+    def reschedule(self, order, start, end):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        return client.post(
+            reverse("booking:bookings-reschedule-order", args=[order.pk]),
+            {"start_datetime": start.isoformat(), "end_datetime": end.isoformat()},
+            format="json",
+        )
+
+    def test_reschedule_onto_a_booked_period_conflicts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = PrimaryOrder.objects.create(
+                user=self.owner, patient=self.patient, booking_entity=BookingEntity.VENUE,
+                venue=self.venue, package=self.package,
+                start_datetime=local(2031, 3, 10), end_datetime=local(2031, 3, 11, 23, 59),
+            )
+            other.generate_secondary_full_range_dates()
+
+        response = self.reschedule(other, local(2031, 3, 3), local(2031, 3, 4, 23, 59))
+
+        self.assertEqual(response.status_code, 409)
+        other.refresh_from_db()
+        self.assertEqual(other.start_datetime, local(2031, 3, 10))
+        self.assertEqual(other.secondary_orders.count(), 2)
+
+    def test_reschedule_within_its_own_periods(self):
+        response = self.reschedule(self.order, local(2031, 3, 2), local(2031, 3, 4, 23, 59))
+
+        self.assertEqual(response.status_code, 200)
+
+
+# ----------------------------------------------------------
+# STATUS TRANSITIONS
+# ----------------------------------------------------------
+class StatusTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = CustomUser.objects.create_user(
+            "owner@transitions.test", "7200000000", "pw", first_name="O", last_name="T",
+            gender="M", user_type=CustomUser.UserTypes.VSRE_OWNER, address="-", city="-",
+        )
+        location = Location.objects.create(
+            location_type=BookingType.IN_HOUSE, building_name="B", address_line1="A",
+            locality="L", city="C", state="S", postal_code="100001",
+        )
+        venue = Venue.objects.create(owner=owner, name="V", location=location, capacity=1)
+        package = Package.objects.create(
+            owner=owner, name="Hourly", price=Decimal("40.00"), period=PeriodChoices.HOURLY,
+            package_type=BookingType.IN_HOUSE, belongs_to=venue,
+        )
+        patient = Patient.objects.create(
+            registered_by=owner, first_name="P", last_name="T", phone="9000000001",
+            email="p@transitions.test", address="A", emergency_contact="E",
+            emergency_phone="9999999999", gender="male", id_proof="aadhar", id_proof_number="1",
+        )
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.order = PrimaryOrder.objects.create(
+                user=owner, patient=patient, booking_entity=BookingEntity.VENUE,
+                venue=venue, package=package,
+                premium_amount=Decimal("15.00"), discount_amount=Decimal("5.00"),
+                start_datetime=local(2031, 4, 1, 9), end_datetime=local(2031, 4, 1, 12),
+            )
+            cls.order.generate_secondary_full_range_dates()
+
+    def test_status_change_keeps_subtotals(self):
+        subtotals = dict(self.order.secondary_orders.values_list("id", "subtotal"))
+        self.order.refresh_from_db()
+        total_bill = self.order.total_bill
+        self.assertEqual(set(subtotals.values()), {Decimal("50.00")})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            change_status(self.order, BookingStatus.HOLD)
+
+        self.assertEqual(dict(self.order.secondary_orders.values_list("id", "subtotal")), subtotals)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, BookingStatus.HOLD)
+        self.assertEqual(self.order.total_bill, total_bill)
@@ -0,0 +1,192 @@
+"""
+Manual status changes of an order subtree
+(PrimaryOrder → SecondaryOrders → TernaryOrders).
+
+change_status() validates the move against MANUAL_STATUS_TRANSITIONS and
+writes the target and every descendant it cascades to with one statement
+of chained data-modifying CTEs:
+
+    WITH target AS (UPDATE <target> ... WHERE id = %s AND status = <read status> RETURNING ...),
+         secondaries AS (UPDATE booking_secondaryorder ... FROM target ... RETURNING ...),
+         ternaries AS (UPDATE booking_ternaryorder ... FROM target ... RETURNING ...)
+    SELECT ... FROM target UNION ALL ... secondaries UNION ALL ... ternaries
+
+The `status = <read status>` guard makes a concurrent change fail instead of
+being overwritten. Descendants follow only if they could make the same
+transition themselves (FORCED_CASCADE_STATUSES are applied to all of them).
+
+Being a raw UPDATE, the statement fires no signals; the returned ids are
+handed to booking.rollups, which invoices the rows that reached an
+INVOICE_TRIGGER_STATUSES status and re-totals the order at commit. Stored
+subtotals are left alone: a status change never re-prices a period.
+"""
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .constants import BookingStatus, FORCED_CASCADE_STATUSES, MANUAL_STATUS_TRANSITIONS
+from . import rollups, snapshots
+
+
+# ── Transition table ───────────────────────────────────────────────────────────
+def can_transition(current, new):
+    return new in MANUAL_STATUS_TRANSITIONS.get(current, ())
+
+
+def cascade_sources(new_status):
+    """Descendant statuses that take `new_status` along with their ancestor."""
+    if new_status in FORCED_CASCADE_STATUSES:
+        return [value for value in BookingStatus.values if value != new_status]
+    return [
+        current for current, targets in MANUAL_STATUS_TRANSITIONS.items()
+        if new_status in targets
+    ]
+
+
+# ── Statement ──────────────────────────────────────────────────────────────────
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _column(model, name):
+    return connection.ops.quote_name(model._meta.get_field(name).column)
+
+
+def _subtree_sql(target_model):
+    """SQL updating a `target_model` row and its descendants, and the model of each CTE level."""
+    from .models import PrimaryOrder, SecondaryOrder, TernaryOrder
+
+    def update(model, alias, joins, condition):
+        status, updated_at, pk = (_column(model, name) for name in ("status", "updated_at", "id"))
+        parent = {
+            PrimaryOrder: "NULL::integer",
+            SecondaryOrder: f"{alias}.{_column(SecondaryOrder, 'primary_order')}",
+            TernaryOrder: f"{alias}.{_column(TernaryOrder, 'secondary_order')}",
+        }[model]
+        return (
+            f"UPDATE {_table(model)} {alias} "
+            f"SET {status} = %(status)s, {updated_at} = %(now)s "
+            f"{joins} WHERE {condition} "
+            f"RETURNING {alias}.{pk} AS id, {parent} AS parent_id"
+        )
+
+    def pk(model, alias):
+        return f"{alias}.{_column(model, 'id')}"
+
+    def status_is(model, alias, param):
+        return f"{alias}.{_column(model, 'status')} = {param}"
+
+    ctes = [(
+        "target",
+        target_model,
+        update(
+            target_model, "o", "",
+            f"{pk(target_model, 'o')} = %(id)s AND {status_is(target_model, 'o', '%(current)s')}",
+        ),
+    )]
+
+    cascade = "ANY(%(sources)s)"
+    if target_model is PrimaryOrder:
+        ctes.append((
+            "secondaries",
+            SecondaryOrder,
+            update(
+                SecondaryOrder, "s", "FROM target",
+                f"s.{_column(SecondaryOrder, 'primary_order')} = target.id "
+                f"AND {status_is(SecondaryOrder, 's', cascade)}",
+            ),
+        ))
+        ctes.append((
+            "ternaries",
+            TernaryOrder,
+            update(
+                TernaryOrder, "t", f"FROM {_table(SecondaryOrder)} p, target",
+                f"t.{_column(TernaryOrder, 'secondary_order')} = {pk(SecondaryOrder, 'p')} "
+                f"AND p.{_column(SecondaryOrder, 'primary_order')} = target.id "
+                f"AND {status_is(TernaryOrder, 't', cascade)}",
+            ),
+        ))
+    elif target_model is SecondaryOrder:
+        ctes.append((
+            "ternaries",
+            TernaryOrder,
+            update(
+                TernaryOrder, "t", "FROM target",
+                f"t.{_column(TernaryOrder, 'secondary_order')} = target.id "
+                f"AND {status_is(TernaryOrder, 't', cascade)}",
+            ),
+        ))
+
+    sql = (
+        "WITH "
+        + ", ".join(f"{name} AS ({statement})" for name, _, statement in ctes)
+        + " "
+        + " UNION ALL ".join(
+            f"SELECT {index} AS level, id, parent_id FROM {name}"
+            for index, (name, _, _) in enumerate(ctes)
+        )
+    )
+    return sql, [model for _, model, _ in ctes]
+
+
+def _apply(target, new_status):
+    """Run the statement; returns {model: [(id, parent_id), ...]} of the updated rows."""
+    sql, models = _subtree_sql(type(target))
+    params = {
+        "status": new_status,
+        "now": timezone.now(),
+        "id": target.pk,
+        "current": target.status,
+        "sources": cascade_sources(new_status),
+    }
+    updated = {model: [] for model in models}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for level, pk, parent_id in cursor.fetchall():
+            updated[models[level]].append((pk, parent_id))
+    return updated
+
+
+# ── Service ────────────────────────────────────────────────────────────────────
+def change_status(target, new_status):
+    """
+    Move `target` (a Primary/Secondary/TernaryOrder) to `new_status` and
+    cascade it down its subtree. Returns {model: [ids]} of every changed row.
+
+    Raises ValidationError if the transition is not allowed or the order's
+    status changed since it was read.
+    """
+    from .models import PrimaryOrder, SecondaryOrder, TernaryOrder
+
+    if new_status not in BookingStatus.values:
+        raise ValidationError(f"Invalid status '{new_status}'.")
+
+    if not can_transition(target.status, new_status):
+        raise ValidationError(f"Cannot transition from '{target.status}' to '{new_status}'.")
+
+    with transaction.atomic():
+        updated = _apply(target, new_status)
+
+        if not updated[type(target)]:
+            raise ValidationError(
+                f"{type(target).__name__} {target.pk} changed status concurrently; reload and retry."
+            )
+        target.status = new_status
+
+        if isinstance(target, PrimaryOrder):
+            primary_id = target.pk
+        elif isinstance(target, SecondaryOrder):
+            primary_id = target.primary_order_id
+        else:
+            primary_id = target.secondary_order.primary_order_id
+
+        # Status never changes a price: re-total the touched order and invoice
+        # the rows now billable, without re-pricing any subtotal
+        rollups.mark_dirty(
+            primary_ids=[pk for pk, _ in updated.get(PrimaryOrder, [])] + [primary_id],
+            secondary_invoice_ids=[pk for pk, _ in updated.get(SecondaryOrder, [])],
+            ternary_invoice_ids=[pk for pk, _ in updated.get(TernaryOrder, [])],
+        )
+        snapshots.invalidate([primary_id])
+
+    return {model: [pk for pk, _ in rows] for model, rows in updated.items()}
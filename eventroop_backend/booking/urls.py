@@ -16,5 +16,6 @@ router.register(r'packages', PackageViewSet, basename='package')
 router.register(r"bookings", OrderViewSet, basename="bookings")
 router.register(r"invoices", TotalInvoiceViewSet, basename="invoices")
 router.register(r"payments", PaymentViewSet, basename="payments")
+router.register(r"availability", AvailabilityViewSet, basename="availability")
 
 urlpatterns = router.urls
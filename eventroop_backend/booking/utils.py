@@ -1,42 +1,13 @@
-from decimal import Decimal
 from django.utils import timezone
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
+from django.db.models import Case, CharField, Value, When
+from django.db.models.functions import Cast, Concat, LPad
 from .constants import BookingStatus
-from decimal import Decimal
-from dateutil.relativedelta import relativedelta
 
 def calculate_amount(startdate, enddate, package):
-    if not startdate or not enddate:
-        raise ValueError("Start date and end date are required")
+    """Base charge of `package` for [startdate, enddate]; see booking.pricing."""
+    from .pricing import PricingEngine
 
-    if enddate < startdate:
-        raise ValueError("End date must be >= start date")
-
-    # DAILY PACKAGE
-    if package.period == "DAILY":
-        delta = relativedelta(enddate.date(), startdate.date())
-        total_days = delta.days + 1   # include end date
-        return Decimal(total_days) * package.price
-
-    # HOURLY PACKAGE
-    elif package.period == "HOURLY":
-        delta = relativedelta(enddate, startdate)
-
-        total_hours = (
-            delta.days * 24
-            + delta.hours
-            + (1 if delta.minutes > 0 or delta.seconds > 0 else 0)
-        )
-
-        # If start == end (same time), count as 1 hour
-        if total_hours == 0:
-            total_hours = 1
-
-        return Decimal(total_hours) * package.price
-
-    else:
-        raise ValueError(f"Unsupported package type:{package.period}")
+    return PricingEngine().price(package, startdate, enddate)
     
 def auto_update_status(start_datetime,end_datetime):
     now = timezone.now()
@@ -65,4 +36,47 @@ def generate_order_id(instance):
         return f"#{primary.id:03}{instance.id:03}000"
 
     # PrimaryOrder
-    return f"#{instance.id:03}000000"
\ No newline at end of file
+    return f"#{instance.id:03}000000"
+
+# ── Set-based counterparts ─────────────────────────────────────────────────────
+# Same values as auto_update_status / generate_order_id, expressed in SQL so a
+# whole batch of rows can be finalised with one UPDATE.
+
+def zero_padded(field_name, width=3):
+    """SQL equivalent of f"{value:0{width}}" — pads, never truncates."""
+    as_text = Cast(field_name, output_field=CharField())
+    return Case(
+        When(**{f"{field_name}__lt": 10 ** width}, then=LPad(as_text, width, Value("0"))),
+        default=as_text,
+        output_field=CharField(),
+    )
+
+def auto_status_expression(now=None):
+    now = now or timezone.now()
+    return Case(
+        When(start_datetime__gt=now, then=Value(BookingStatus.YET_TO_START)),
+        When(end_datetime__lt=now, then=Value(BookingStatus.FULFILLED)),
+        default=Value(BookingStatus.IN_PROGRESS),
+        output_field=CharField(),
+    )
+
+def secondary_order_id_expression():
+    return Concat(
+        Value("#"),
+        zero_padded("primary_order_id"),
+        zero_padded("id"),
+        Value("000"),
+        output_field=CharField(),
+    )
+
+def invoice_number_expression():
+    """SQL equivalent of TotalInvoice.save()'s f"{prefix}{id:08}"."""
+    return Concat(
+        Case(
+            When(secondary_order__isnull=False, then=Value("SINV")),
+            default=Value("TINV"),
+            output_field=CharField(),
+        ),
+        zero_padded("id", 8),
+        output_field=CharField(),
+    )
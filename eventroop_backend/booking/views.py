@@ -4,12 +4,22 @@ from rest_framework import viewsets, permissions, status
 from .serializers import *
 from .models import *
 from .filters import EntityFilter
+from . import dropdowns, rollups, snapshots, transitions
+from .availability import BookingConflict, ensure_available, free_busy
+from .exports import EXPORT_FORMATS, export_response
+from .search import LOOKUP_LIMIT, MAX_LOOKUP_LIMIT, patient_lookup
+from .tasks import export_ledger
+from eventroop_backend.pagination import KeysetPagination
 from rest_framework.decorators import action
+from rest_framework.request import Request
+from django.http import HttpRequest, QueryDict
 from rest_framework.response import Response
 from django.utils.dateparse import parse_datetime
 from datetime import datetime, time, date
-from itertools import groupby
-from django.db.models import Sum,Count,Q
+from dateutil.relativedelta import relativedelta
+import csv
+import io
+from django.db.models import Sum,Count,Q,F
 
 class PublicVenueViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -46,8 +56,12 @@ class PublicVenueViewSet(viewsets.ReadOnlyModelViewSet):
     ]
     @action(detail=False, methods=["get"])
     def venue_dropdown(self,request):
-        queryset = self.filter_queryset(self.get_queryset())
-        return Response(VenueDropdownSerializer(queryset,many=True).data)
+        return dropdowns.cached_response(
+            request, "venues", "public",
+            lambda: VenueDropdownSerializer(
+                self.filter_queryset(self.get_queryset()).select_related("location"), many=True
+            ).data,
+        )
 
 class PublicServiceViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -80,8 +94,12 @@ class PublicServiceViewSet(viewsets.ReadOnlyModelViewSet):
     ]
     @action(detail=False, methods=["get"])
     def service_dropdown(self,request):
-        queryset = self.filter_queryset(self.get_queryset())
-        return Response(ServiceDropdownSerializer(queryset,many=True).data)
+        return dropdowns.cached_response(
+            request, "services", "public",
+            lambda: ServiceDropdownSerializer(
+                self.filter_queryset(self.get_queryset()).prefetch_related("venue__location"), many=True
+            ).data,
+        )
 
 
 class PatientViewSet(viewsets.ModelViewSet):
@@ -119,11 +137,12 @@ class PatientViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        queryset = Patient.objects.select_related("registered_by")
         if user.is_superuser or user.is_owner:
-            return Patient.objects.all()
-        
+            return queryset
+
         # Manager/Staff/customer → only their own patients
-        return Patient.objects.filter(registered_by=user)
+        return queryset.filter(registered_by=user)
     
     def perform_create(self, serializer):
         """
@@ -133,21 +152,48 @@ class PatientViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=["get"])
     def patient_dropdown(self, request):
-        queryset = self.filter_queryset(self.get_queryset())
+        def build():
+            queryset = self.filter_queryset(self.get_queryset())
 
-        # Select only required fields (IMPORTANT for performance)
-        queryset = queryset.only("id", "first_name", "last_name")
+            # Select only required fields (IMPORTANT for performance)
+            queryset = queryset.select_related(None).only("id", "first_name", "last_name")
 
-        # Build lightweight response
-        data = [
-            {
-                "id": obj.id,
-                "name": obj.get_full_name()
-            }
-            for obj in queryset
-        ]
+            # Build lightweight response
+            return [
+                {
+                    "id": obj.id,
+                    "name": obj.get_full_name()
+                }
+                for obj in queryset
+            ]
 
-        return Response(data,status=status.HTTP_200_OK)
+        # Same scopes as get_queryset(): everyone's patients or the user's own
+        user = request.user
+        scope = "all" if user.is_superuser or user.is_owner else user.pk
+        return dropdowns.cached_response(request, "patients", scope, build)
+
+    @action(detail=False, methods=["get"])
+    def lookup(self, request):
+        """
+        Typeahead: GET /patients/lookup/?q=<name | phone digits | email>&limit=20
+        Name prefix matches first, then word prefix, then substring/fuzzy
+        (see booking.search). Digits match phone number suffixes.
+        """
+        try:
+            limit = int(request.query_params.get("limit", LOOKUP_LIMIT))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), MAX_LOOKUP_LIMIT)
+
+        patients = patient_lookup(
+            self.get_queryset().select_related(None).only(
+                "id", "patient_id", "first_name", "last_name", "email", "phone",
+                "age", "emergency_contact", "emergency_phone",
+            ),
+            request.query_params.get("q", ""),
+            limit=limit,
+        )
+        return Response(PatientMiniSerializer(patients, many=True).data, status=status.HTTP_200_OK)
     
 class LocationViewSet(viewsets.ModelViewSet):
     serializer_class = LocationSerializer
@@ -279,31 +325,81 @@ class PackageViewSet(viewsets.ModelViewSet):
 
         # CASE 1 → Only content_type → return entities (Service + Venue)
         if not object_id:
-            queryset = Model.objects.filter(owner=request.user, is_active=True)
-
-            data = queryset.values("id", "name")
-
-            return Response(data)
+            return dropdowns.cached_response(
+                request, "entities", f"{content_type_name}:{request.user.pk}",
+                lambda: Model.objects.filter(owner=request.user, is_active=True).values("id", "name"),
+            )
 
         # CASE 2 → content_type + object_id → return packages
-        try:
+        def build():
             obj = Model.objects.get(
                 id=object_id,
                 is_active=True,
             )
+
+            # GenericRelation
+            packages = obj.packages.select_related("owner", "content_type")
+
+            return PackageSerializer(packages, many=True).data
+
+        try:
+            return dropdowns.cached_response(
+                request, "packages", f"{content_type_name}:{object_id}", build
+            )
         except Model.DoesNotExist:
             return Response(
                 {"error": f"{content_type_name.title()} not found"},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # GenericRelation
-        packages = obj.packages.all()
+class LedgerExportMixin:
+    """
+    GET <list>/export/?file_format=csv|xlsx streams the filtered list as a
+    booking.exports ledger; &background=1 queues booking.tasks.export_ledger
+    with the same query string and returns the task id.
+    """
+    export_kind = None
+
+    @classmethod
+    def for_kind(cls, kind):
+        """The ViewSet exporting `kind`."""
+        return next(view for view in cls.__subclasses__() if view.export_kind == kind)
 
-        serializer = PackageSerializer(packages, many=True)
-        return Response(serializer.data)
+    @classmethod
+    def export_queryset(cls, user, query_string=""):
+        """What GET <list>/export/?<query_string> exports for `user`, outside a request."""
+        http_request = HttpRequest()
+        http_request.method = "GET"
+        http_request.GET = QueryDict(query_string)
+        request = Request(http_request)
+        request.user = user
+
+        view = cls(request=request, args=(), kwargs={}, format_kwarg=None, action="export")
+        return view.filter_queryset(view.get_queryset())
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': f"file_format must be one of {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.query_params.get('background'):
+            task = export_ledger.delay(
+                self.export_kind, file_format, request.user.id, request.META.get('QUERY_STRING', '')
+            )
+            return Response(
+                {'task_id': task.id, 'message': 'Export queued.'},
+                status=status.HTTP_202_ACCEPTED
+            )
 
-class OrderViewSet(viewsets.ModelViewSet):
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(self.export_kind, queryset, file_format)
+
+
+class OrderViewSet(LedgerExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing primary orders.
 
@@ -325,13 +421,15 @@ class OrderViewSet(viewsets.ModelViewSet):
     }
     ordering_fields = ['user', 'patient', 'created_at', 'start_datetime', 'end_datetime']
     ordering = ['-created_at']
+    export_kind = 'line_items'
 
     # ── Queryset ───────────────────────────────────────────────────────────────
     def get_queryset(self):
         user = self.request.user
+        # Nested trees are served from booking.snapshots, not prefetched here
         queryset = PrimaryOrder.objects.select_related(
             'patient', 'venue', 'service', 'package', 'user'
-        ).prefetch_related('secondary_orders__ternary_orders')
+        )
         
         if user.is_customer:
             queryset = queryset.filter(Q(patient__registered_by=user)|Q(user=user))
@@ -421,8 +519,22 @@ class OrderViewSet(viewsets.ModelViewSet):
             # Mode 1: full range (start_datetime + end_datetime required by serializer)
             primary_order.generate_secondary_full_range_dates()
 
-        response_serializer = PrimaryOrderSerializer(primary_order)
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+        # Rolls the whole create back (409) if any period is already taken
+        self.ensure_schedule_available(primary_order)
+
+        return Response(snapshots.order_tree(primary_order.pk), status=status.HTTP_201_CREATED)
+
+    @staticmethod
+    def ensure_schedule_available(primary_order):
+        """Raise BookingConflict if another order holds any of its billed periods."""
+        ensure_available(
+            primary_order.secondary_orders
+            .exclude(status=BookingStatus.CANCELLED)
+            .values_list("start_datetime", "end_datetime"),
+            venue_id=primary_order.venue_id,
+            service_id=primary_order.service_id,
+            exclude_primary_id=primary_order.pk,
+        )
     
     # ── update ─────────────────────────────────────────────────────────────────
     @transaction.atomic
@@ -459,19 +571,16 @@ class OrderViewSet(viewsets.ModelViewSet):
         schedule_changed =True
 
         if schedule_changed:
-
-            # Delete old secondary orders
-            primary_order.secondary_orders.all().delete()
-
+            # Apply only the difference; unchanged periods keep ids and invoices
             if raw_dates:
                 parsed = self.parse_dates(primary_order.package.period, raw_dates)
-                primary_order.generate_secondary_from_random_dates(parsed)
+                objects = primary_order._build_secondaries_from_random_dates(parsed)
             else:
-                primary_order.generate_secondary_full_range_dates()
-
-        response_serializer = PrimaryOrderSerializer(primary_order)
+                objects = primary_order._build_secondaries_full_range()
+            primary_order.sync_secondaries(objects)
+            self.ensure_schedule_available(primary_order)
 
-        return Response(response_serializer.data, status=status.HTTP_200_OK)
+        return Response(snapshots.order_tree(primary_order.pk), status=status.HTTP_200_OK)
     
     # ── Add service (TernaryOrder) ──────────────────────────────────────────────
     @action(detail=True, methods=['post'])
@@ -480,7 +589,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         """
         Add a service as a TernaryOrder under the appropriate SecondaryOrder.
 
-        The secondary_order is matched by the service's date range (month/year).
+        Each slot is placed in the SecondaryOrder period containing it.
 
         Payload:
         {
@@ -492,6 +601,14 @@ class OrderViewSet(viewsets.ModelViewSet):
             "discount_amount": "100.00",
             "premium_amount": "50.00"
         }
+
+        Or, to book the service in several periods at once, replace
+        start_datetime/end_datetime with
+            "slots": [
+                {"start_datetime": "2026-02-05T10:00:00Z", "end_datetime": "2026-02-05T11:00:00Z"},
+                {"start_datetime": "2026-02-06T10:00:00Z", "end_datetime": "2026-02-06T11:00:00Z"}
+            ]
+        and a list of TernaryOrders is returned.
         """
         primary_order = self.get_object()
         user = request.user
@@ -516,34 +633,45 @@ class OrderViewSet(viewsets.ModelViewSet):
         )
         serializer.is_valid(raise_exception=True)
 
-        start_dt = serializer.validated_data['start_datetime']
-        end_dt   = serializer.validated_data['end_datetime']
+        items = serializer.line_items()
+        intervals = [(item['start_datetime'], item['end_datetime']) for item in items]
 
-        # Resolve the matching SecondaryOrder of start_dt
-        try:
-           secondary_order = primary_order.secondary_orders.filter(
-                start_datetime__lte=start_dt,
-                end_datetime__gte=end_dt,
-            ).first()
-        except SecondaryOrder.DoesNotExist:
+        # Resolve the SecondaryOrder containing every slot
+        periods = primary_order.containing_periods(intervals)
+        unmatched = [
+            f"{start.isoformat()} - {end.isoformat()}"
+            for (start, end), period in zip(intervals, periods)
+            if period is None
+        ]
+        if unmatched:
             return Response(
                 {
                     "message": (
-                        f"No secondary order found for "
-                        f"{start_dt.year}-{start_dt.month:02d}. "
-                        "Ensure the service date falls within the booking range."
+                        "No secondary order covers "
+                        f"{', '.join(unmatched)}. "
+                        "Ensure each service slot falls within a single booked period."
                     )
                 },
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        ternary_order = serializer.save(secondary_order=secondary_order)
+        ensure_available(
+            intervals,
+            venue_id=getattr(serializer.validated_data.get('venue'), 'pk', None),
+            service_id=getattr(serializer.validated_data.get('service'), 'pk', None),
+            exclude_primary_id=primary_order.pk,
+        )
 
-        # Recalculate subtotals up the chain
-        secondary_order.recalculate_subtotal()
-        primary_order.recalculate_total()
+        # Priced once here; subtotals, totals and invoices roll up at commit
+        ternary_orders = primary_order.add_services([
+            {**item, "secondary_order": period}
+            for item, period in zip(items, periods)
+        ])
 
-        response_serializer = TernaryOrderSerializer(ternary_order)
+        if 'slots' in serializer.validated_data:
+            response_serializer = TernaryOrderSerializer(ternary_orders, many=True)
+        else:
+            response_serializer = TernaryOrderSerializer(ternary_orders[0])
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
     # ── Reschedule ─────────────────────────────────────────────────────────────
@@ -589,22 +717,9 @@ class OrderViewSet(viewsets.ModelViewSet):
                         datetime.combine(max(all_dates), time.max)
                     )
 
-                primary_order.reschedule(
-                    new_start,
-                    new_end,
-                    new_package_id,
-                    discount_amount,
-                    premium_amount,
-                )
-
-                # Delete auto-generated ones
-                primary_order.secondary_orders.all().delete()
-
-                # Generate specific ones
-                primary_order.generate_secondary_from_random_dates(parsed)
-
             # MODE 1 — Full Range
             else:
+                parsed = None
                 new_start_raw = request.data.get("start_datetime")
                 new_end_raw   = request.data.get("end_datetime")
 
@@ -627,15 +742,18 @@ class OrderViewSet(viewsets.ModelViewSet):
                 if timezone.is_naive(new_end):
                     new_end = timezone.make_aware(new_end)
 
-                primary_order.reschedule(
-                    new_start,
-                    new_end,
-                    new_package_id,
-                    discount_amount,
-                    premium_amount,
-                )
+            # Only the periods that differ are inserted / updated / removed
+            changes = primary_order.reschedule(
+                new_start,
+                new_end,
+                new_package_id,
+                discount_amount,
+                premium_amount,
+                dates=parsed,
+            )
+            self.ensure_schedule_available(primary_order)
 
-        except ValidationError:
+        except (ValidationError, BookingConflict):
             raise  # Let DRF handle structured error
 
         except Exception as e:
@@ -644,8 +762,7 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        serializer = PrimaryOrderSerializer(primary_order)
-        return Response(serializer.data)
+        return Response({**snapshots.order_tree(primary_order.pk), "schedule_changes": changes})
 
     @action(detail=True, methods=['post'])
     @transaction.atomic
@@ -713,6 +830,13 @@ class OrderViewSet(viewsets.ModelViewSet):
                 
                 ternary_order.save(skip_auto_status=True)
 
+                ensure_available(
+                    [(ternary_order.start_datetime, ternary_order.end_datetime)],
+                    venue_id=ternary_order.venue_id,
+                    service_id=ternary_order.service_id,
+                    exclude_primary_id=primary_order.pk,
+                )
+
                 ternary_order.secondary_order.recalculate_subtotal()
                 primary_order.recalculate_total()
 
@@ -733,7 +857,7 @@ class OrderViewSet(viewsets.ModelViewSet):
 
         Payload:
         {
-            "status": "CONFIRMED",
+            "status": "HOLD",          # must be allowed by MANUAL_STATUS_TRANSITIONS
             "secondary_order_id": 3,  # optional — targets a specific SecondaryOrder
             "ternary_order_id": 5     # optional — targets a specific TernaryOrder
         }
@@ -770,63 +894,60 @@ class OrderViewSet(viewsets.ModelViewSet):
             except TernaryOrder.DoesNotExist:
                 return Response({"error": "Invalid ternary_order_id."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # available_statuses = MANUAL_STATUS_TRANSITIONS.get(target.status, [])
-        # if new_status not in available_statuses:
-        #     return Response(
-        #         {"error": f"Cannot transition from '{target.status}' to '{new_status}'."},
-        #         status=status.HTTP_400_BAD_REQUEST
-        #     )
-
-        with transaction.atomic():
-            target.status = new_status
-            target.save(update_fields=['status'], skip_auto_status=True)
-
-            # If primary order is canceled, force cascade to ALL secondaries and ternaries
-            if target == primary_order and new_status == BookingStatus.CANCELLED:
-                secondary_ids = primary_order.secondary_orders.values_list('id', flat=True)
-                SecondaryOrder.objects.filter(id__in=secondary_ids).update(status=new_status)
-                TernaryOrder.objects.filter(secondary_order_id__in=secondary_ids).update(status=new_status)
-
-            elif secondary_order_id and not ternary_order_id:
-                # Cascade to this secondary's ternary orders only
-                target.ternary_orders.all().update(status=new_status)
-
-            elif not ternary_order_id and not secondary_order_id:
-                # Primary status change (non-cancel): cascade to all children
-                secondary_ids = primary_order.secondary_orders.values_list('id', flat=True)
-                SecondaryOrder.objects.filter(id__in=secondary_ids).update(status=new_status)
-                TernaryOrder.objects.filter(secondary_order_id__in=secondary_ids).update(status=new_status)
+        try:
+            updated = transitions.change_status(target, new_status)
+        except ValidationError as e:
+            return Response({"error": e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
             "message": "Status updated successfully.",
             "order_id": target.id,
-            "new_status": new_status
+            "new_status": new_status,
+            "updated": {model.__name__: ids for model, ids in updated.items()},
         }, status=status.HTTP_200_OK)
 
-    # ── Info endpoints ─────────────────────────────────────────────────────────
+    # ── Read endpoints ─────────────────────────────────────────────────────────
+    def list(self, request, *args, **kwargs):
+        """Paginate ids only; the order trees come from booking.snapshots."""
+        ids = self.filter_queryset(self.get_queryset()).values_list('id', flat=True)
+
+        page = self.paginate_queryset(ids)
+        if page is not None:
+            return self.get_paginated_response(snapshots.order_trees(page))
+        return Response(snapshots.order_trees(ids))
+
+    def retrieve(self, request, *args, **kwargs):
+        primary_order = self.get_object()
+        return Response(snapshots.order_tree(primary_order.pk))
+
     @action(detail=False, methods=['get'])
     def by_venue(self, request):
-        """List all venue PrimaryOrders with nested secondary/ternary data."""
-        queryset   = self.get_queryset().filter(booking_entity=BookingEntity.VENUE)
-        serializer = PrimaryOrderSerializer(queryset, many=True)
-        return Response(serializer.data)
+        """List venue PrimaryOrders with nested secondary/ternary data, a keyset page at a time."""
+        return self._keyset_trees(self.get_queryset().filter(booking_entity=BookingEntity.VENUE))
 
     @action(detail=False, methods=['get'])
     def by_service(self, request):
-        """List all service PrimaryOrders."""
-        queryset   = self.get_queryset().filter(booking_entity=BookingEntity.SERVICE)
-        serializer = PrimaryOrderSerializer(queryset, many=True)
-        return Response(serializer.data)
+        """List service PrimaryOrders, a keyset page at a time."""
+        return self._keyset_trees(self.get_queryset().filter(booking_entity=BookingEntity.SERVICE))
 
     @action(detail=True, methods=['get'])
     def order_info(self, request, pk=None):
         """Full breakdown of a PrimaryOrder including all secondary and ternary orders."""
         primary_order = self.get_object()
-        serializer    = PrimaryOrderSerializer(primary_order)
-        return Response(serializer.data)
+        return Response(snapshots.order_tree(primary_order.pk))
 
     # ── Helpers ────────────────────────────────────────────────────────────────
 
+    def _keyset_trees(self, queryset):
+        """Page on (start_datetime, id); only the page's trees are loaded."""
+        paginator = KeysetPagination(ordering=('-start_datetime', '-id'))
+        page = paginator.paginate_queryset(
+            queryset.values('id', 'start_datetime'), self.request, view=self
+        )
+        return paginator.get_paginated_response(
+            snapshots.order_trees(row['id'] for row in page)
+        )
+
     @staticmethod
     def parse_dates(period_type, raw_dates):
         """
@@ -866,7 +987,71 @@ class OrderViewSet(viewsets.ModelViewSet):
         else:
             return None
 
-class TotalInvoiceViewSet(viewsets.ModelViewSet):
+class AvailabilityViewSet(viewsets.ViewSet):
+    """
+    Free/busy of a venue or service.
+
+    GET /booking/availability/?venue=2&start=2026-03-01&end=2026-03-31
+    GET /booking/availability/?service=5&start=2026-03-01T09:00:00&end=2026-03-01T18:00:00
+
+    Dates without a time cover whole local days (end date inclusive).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        venue_id   = request.query_params.get("venue")
+        service_id = request.query_params.get("service")
+
+        if bool(venue_id) == bool(service_id):
+            return Response(
+                {"message": "Pass exactly one of 'venue' or 'service'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            entity_id = int(venue_id or service_id)
+        except ValueError:
+            return Response(
+                {"message": "'venue' / 'service' must be an id."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            start = self._parse_bound(request.query_params.get("start"), time.min)
+            end   = self._parse_bound(request.query_params.get("end"), time.max)
+        except (TypeError, ValueError):
+            return Response(
+                {"message": "'start' and 'end' must be ISO dates or datetimes."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if start >= end:
+            return Response(
+                {"message": "'start' must be before 'end'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        entity = BookingEntity.VENUE if venue_id else BookingEntity.SERVICE
+        result = free_busy(entity, entity_id, start, end)
+
+        if result is None:
+            return Response({"message": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(result)
+
+    @staticmethod
+    def _parse_bound(raw, day_time):
+        try:
+            value = datetime.combine(date.fromisoformat(raw), day_time)
+        except ValueError:
+            value = parse_datetime(raw)
+            if value is None:
+                raise
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
+
+class TotalInvoiceViewSet(LedgerExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing invoices.
         
@@ -900,6 +1085,7 @@ class TotalInvoiceViewSet(viewsets.ModelViewSet):
         'issued_date', 'status', 'total_amount'
     ]
     ordering = ['-created_at']
+    export_kind = 'invoices'
     
     
     def get_queryset(self):
@@ -945,46 +1131,65 @@ class TotalInvoiceViewSet(viewsets.ModelViewSet):
         return queryset
     
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset()).order_by('user_id', 'patient_id')
-        
+        """
+        Invoices grouped by (user, patient). The groups and their totals are
+        aggregated and paginated in SQL; invoice rows are fetched only for
+        the groups on the requested page.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+
+        groups = (
+            queryset
+            .prefetch_related(None)
+            .order_by('user_id', 'patient_id')
+            .values('user_id', 'patient_id')
+            .annotate(
+                total_invoice_amount=Sum('total_amount'),
+                total_paid=Sum('paid_amount'),
+            )
+            .annotate(total_balance=F('total_invoice_amount') - F('total_paid'))
+        )
+
+        page = self.paginate_queryset(groups)
+        groups = page if page is not None else list(groups)
+
+        pairs = Q()
+        for group in groups:
+            pairs |= Q(user_id=group['user_id'], patient_id=group['patient_id'])
+
+        invoices_by_group = {}
+        if groups:
+            for invoice in queryset.filter(pairs):
+                invoices_by_group.setdefault((invoice.user_id, invoice.patient_id), []).append(invoice)
+
         grouped_data = []
-        
-        for (user_id, patient_id), invoices_group in groupby(
-            queryset,
-            key=lambda x: (x.user_id, x.patient_id)
-        ):
-            invoices_list = list(invoices_group)
-            
+
+        for group in groups:
+            invoices_list = invoices_by_group.get((group['user_id'], group['patient_id']), [])
             if not invoices_list:
                 continue
-            
+
             first_invoice = invoices_list[0]
             user = first_invoice.user
             patient = first_invoice.patient
-            
-            total_invoice_amount = sum(inv.total_amount for inv in invoices_list)
-            total_paid = sum(inv.paid_amount for inv in invoices_list)
-            total_balance = total_invoice_amount - total_paid
-            
+
             serializer = self.serializer_class(invoices_list, many=True)
             invoices_array = serializer.data
-            
+
             grouped_data.append({
                 "user_id": user.id,
                 "user_name": user.get_full_name(),
                 "patient_id": patient.id,
                 "patient_name": patient.get_full_name(),
-                "total_invoice_amount": str(total_invoice_amount),
-                "total_paid": str(total_paid),
-                "total_balance": str(total_balance),
+                "total_invoice_amount": str(group['total_invoice_amount']),
+                "total_paid": str(group['total_paid']),
+                "total_balance": str(group['total_balance']),
                 "invoices": invoices_array
             })
-        
-        page = self.paginate_queryset(grouped_data)
-        
+
         if page is not None:
-            return self.get_paginated_response(page)
-        
+            return self.get_paginated_response(grouped_data)
+
         return Response(grouped_data)
     
     @action(detail=True, methods=['get'])
@@ -1020,9 +1225,17 @@ class TotalInvoiceViewSet(viewsets.ModelViewSet):
         payment_serializer = PaymentSerializer(payment)
         return Response(payment_serializer.data, status=status.HTTP_201_CREATED)
     
+    # Query params InvoiceDailySummary can answer; any other filter falls back
+    # to aggregating the invoices themselves.
+    SUMMARY_TABLE_PARAMS = {'filter_months', 'ordering'}
+
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """Get invoice summary statistics for the current user."""
+        if set(request.query_params) <= self.SUMMARY_TABLE_PARAMS:
+            serializer = InvoiceSummarySerializer(self._summary_from_table())
+            return Response(serializer.data)
+
         queryset = self.filter_queryset(self.get_queryset())
         total_stats = queryset.aggregate(
             total_invoices=Count('id'),
@@ -1036,6 +1249,33 @@ class TotalInvoiceViewSet(viewsets.ModelViewSet):
         
         serializer = InvoiceSummarySerializer(total_stats)
         return Response(serializer.data)
+
+    def _summary_from_table(self):
+        """summary() from the per-day rollup: a few rows per day, whatever the invoice count."""
+        user = self.request.user
+        rows = InvoiceDailySummary.objects.all()
+
+        if user.is_customer:
+            rows = rows.filter(Q(registered_by=user)|Q(user=user))
+
+        months_param = self.request.query_params.get('filter_months', None)
+        if months_param:
+            try:
+                months = int(months_param)
+                start_date = timezone.localtime().date() - relativedelta(months=months)
+                rows = rows.filter(day__gte=start_date)
+            except (ValueError, TypeError):
+                pass
+
+        return rows.aggregate(
+            total_invoices=Coalesce(Sum('invoice_count'), 0),
+            total_amount=Sum('total_amount'),
+            paid_amount=Sum('paid_amount'),
+            remaining_amount=Sum('remaining_amount'),
+            unpaid_count=Coalesce(Sum('invoice_count', filter=Q(status=InvoiceStatus.UNPAID)), 0),
+            partially_paid_count=Coalesce(Sum('invoice_count', filter=Q(status=InvoiceStatus.PARTIALLY_PAID)), 0),
+            paid_count=Coalesce(Sum('invoice_count', filter=Q(status=InvoiceStatus.PAID)), 0),
+        )
     
     @action(detail=False, methods=['get'])
     def overdue(self, request):
@@ -1046,10 +1286,12 @@ class TotalInvoiceViewSet(viewsets.ModelViewSet):
             status__in=['UNPAID', 'PARTIALLY_PAID']
         )
         
-        serializer = self.serializer_class(overdue_invoices, many=True)
-        return Response(serializer.data)
+        paginator = KeysetPagination(ordering=('-created_at', '-id'))
+        page = paginator.paginate_queryset(overdue_invoices, request, view=self)
+        serializer = self.serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(LedgerExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing payments.
         
@@ -1061,6 +1303,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
     filterset_fields = ['invoice_id', 'is_verified', 'method']  
     ordering_fields = ['created_at', 'amount', 'paid_date']
     ordering = ['-created_at']
+    export_kind = 'payments'
     
     def get_queryset(self):
         """Get payments for invoices belonging to current user"""
@@ -1068,7 +1311,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
         user = self.request.user
         
         if user.is_customer:
-            queryset = queryset.filter(Q(patient__registered_by=user)|Q(user=user))
+            queryset = queryset.filter(Q(patient__registered_by=user)|Q(invoice__user=user))
     
         return queryset
     
@@ -1108,6 +1351,140 @@ class PaymentViewSet(viewsets.ModelViewSet):
         output_serializer = PaymentSerializer(payment)
         return Response(output_serializer.data, status=status.HTTP_201_CREATED)
     
+    # Rows accepted by one bulk upload
+    BULK_PAYMENT_LIMIT = 5000
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Record a batch of payments, e.g. a bank/UPI statement.
+
+        Body: a JSON list of rows (or {"payments": [...]}), or a CSV upload in
+        the multipart field "file" with the same column names. Each row is a
+        PaymentCreateSerializer payload plus invoice_id or invoice_number.
+
+        Invoices are resolved in one query, payments are inserted with one
+        bulk_create and every touched invoice is reconciled once. Valid rows
+        are recorded even if others fail; each row gets its own result.
+        A row whose reference already exists on its invoice (or repeats in the
+        batch) is reported as a duplicate, so re-uploading a statement is
+        harmless: 201 when anything was recorded, 200 when every row was a
+        duplicate, 400 when nothing was recorded and some rows failed.
+        """
+        rows = self._bulk_payment_rows(request)
+        if rows is None:
+            return Response(
+                {'error': 'Send a JSON list of payments or a CSV file in "file".'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > self.BULK_PAYMENT_LIMIT:
+            return Response(
+                {'error': f'At most {self.BULK_PAYMENT_LIMIT} payments per upload.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = []
+        valid = []
+        for index, row in enumerate(rows, start=1):
+            serializer = PaymentBulkRowSerializer(data=row)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results.append({'row': index, 'status': 'error', 'errors': serializer.errors})
+
+        # One query for every referenced invoice the user may pay into
+        invoice_ids = {data['invoice_id'] for _, data in valid if data.get('invoice_id')}
+        invoice_numbers = {data['invoice_number'] for _, data in valid if data.get('invoice_number')}
+        invoices = TotalInvoice.objects.filter(Q(id__in=invoice_ids)|Q(invoice_number__in=invoice_numbers))
+        if request.user.is_customer:
+            invoices = invoices.filter(Q(patient__registered_by=request.user)|Q(user=request.user))
+        by_id = {}
+        by_number = {}
+        for invoice_id, invoice_number, patient_id in invoices.values_list('id', 'invoice_number', 'patient_id'):
+            by_id[invoice_id] = by_number[invoice_number] = (invoice_id, invoice_number, patient_id)
+
+        # A reference is a duplicate on the same invoice only, and only the
+        # invoices resolved above (those the user may pay into) are looked at
+        references = {data['reference'] for _, data in valid if data.get('reference')}
+        seen_references = set(
+            Payment.objects
+            .filter(reference__in=references, invoice_id__in=list(by_id))
+            .values_list('invoice_id', 'reference')
+        )
+
+        pending = []
+        for index, data in valid:
+            data = dict(data)
+            invoice_id = data.pop('invoice_id', None)
+            invoice_number = data.pop('invoice_number', None)
+            invoice = by_id.get(invoice_id) if invoice_id else by_number.get(invoice_number)
+
+            if invoice is None or (invoice_number and invoice[1] != invoice_number):
+                results.append({'row': index, 'status': 'error', 'errors': {'invoice': ['Invoice not found']}})
+                continue
+
+            reference = data.get('reference')
+            if reference and (invoice[0], reference) in seen_references:
+                results.append({'row': index, 'status': 'duplicate', 'reference': reference})
+                continue
+            if reference:
+                seen_references.add((invoice[0], reference))
+
+            pending.append((index, Payment(invoice_id=invoice[0], patient_id=invoice[2], **data)))
+
+        created = Payment.bulk_record([payment for _, payment in pending])
+        for (index, _), payment in zip(pending, created):
+            results.append({
+                'row': index,
+                'status': 'created',
+                'id': payment.id,
+                'invoice_id': payment.invoice_id,
+                'reference': payment.reference,
+            })
+
+        results.sort(key=lambda result: result['row'])
+        duplicates = sum(1 for result in results if result['status'] == 'duplicate')
+        failed = len(results) - len(created) - duplicates
+
+        # Re-uploading an applied file only finds duplicates: that is not an error
+        if created:
+            response_status = status.HTTP_201_CREATED
+        elif failed:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_200_OK
+        return Response(
+            {
+                'created': len(created),
+                'duplicates': duplicates,
+                'failed': failed,
+                'results': results,
+            },
+            status=response_status
+        )
+
+    @staticmethod
+    def _bulk_payment_rows(request):
+        """Rows of a bulk upload as dicts, or None if the body is neither shape."""
+        upload = request.FILES.get('file')
+        if upload:
+            try:
+                text = upload.read().decode('utf-8-sig')
+            except UnicodeDecodeError:
+                return None
+            # Blank CSV cells mean "not given", not an empty value
+            return [
+                {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+                for row in csv.DictReader(io.StringIO(text))
+            ]
+
+        rows = request.data
+        if isinstance(rows, dict):
+            rows = rows.get('payments')
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return None
+        return rows
+
     @action(detail=True, methods=['post'])
     def verify(self, request, pk=None):
         """
@@ -1164,14 +1541,18 @@ class PaymentViewSet(viewsets.ModelViewSet):
     def pending_verification(self, request):
         """Get all payments pending verification."""
         pending_payments = self.get_queryset().filter(is_verified=False)
-        serializer = PaymentSerializer(pending_payments, many=True)
-        return Response(serializer.data)
+        return self._keyset_response(pending_payments)
     
     @action(detail=False, methods=['get'])
     def verified(self, request):
         """Get all verified payments."""
         verified_payments = self.get_queryset().filter(is_verified=True)
-        serializer = PaymentSerializer(verified_payments, many=True)
-        return Response(serializer.data)
+        return self._keyset_response(verified_payments)
+
+    def _keyset_response(self, queryset):
+        paginator = KeysetPagination(ordering=('-created_at', '-id'))
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        serializer = PaymentSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     
\ No newline at end of file
@@ -24,6 +24,21 @@ app.conf.beat_schedule = {
 
 
     },
+    'sweep-booking-statuses': {
+        'task': 'booking.tasks.sweep_booking_statuses',
+        'schedule': crontab(minute='*/5'),  # Every 5 minutes
+    },
+    'reconcile-booking-totals': {
+        'task': 'booking.tasks.reconcile_booking_totals',
+        'schedule': crontab(hour=2, minute=30),  # Every day at 2:30am
+        # Repairs only where totals are F() deltas; "aggregate" mode just reports
+        'kwargs': {'fix': getattr(settings, 'BOOKING_TOTALS_MODE', 'aggregate') == 'incremental'},
+    },
+    # Safety net: drains normally run DEBOUNCE_SECONDS after a queued change
+    'drain-attendance-queue': {
+        'task': 'attendance.tasks.drain_attendance_queue',
+        'schedule': crontab(minute='*/10'),  # Every 10 minutes
+    },
 }
 
 app.conf.timezone = settings.TIME_ZONE
\ No newline at end of file
@@ -1,6 +1,10 @@
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from django.db.models import Q
+import base64
+import json
 import math
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -21,3 +25,140 @@ class StandardResultsSetPagination(PageNumberPagination):
             "previous": self.get_previous_link(),
             "results": data
         })
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a unique ordering such as ('-start_datetime', '-id').
+
+    Each page is `WHERE (key) < (last key seen) ORDER BY key LIMIT n`, so it
+    costs the same at page 1 and page 1000, and rows inserted while a client
+    is paging never shift or repeat the rows it has not seen yet.
+
+    The response has the same shape as StandardResultsSetPagination; `next`
+    and `previous` carry an opaque `cursor` instead of a page number.
+    Pages may be model instances or .values() dicts.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+
+    def __init__(self, ordering=None):
+        if ordering:
+            self.ordering = tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.model_fields = [queryset.model._meta.get_field(name) for name in self.fields]
+
+        position, reverse, self.number = self.decode_cursor(request)
+
+        self.count = queryset.count()
+
+        ordering = self._invert(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        if not self.has_previous:
+            self.number = 1
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            "count": self.count,
+            "total_pages": math.ceil(self.count / self.page_size),
+            "current_page": self.number,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data
+        })
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False, number=self.number + 1)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        if self.number <= 2:
+            # Back to the first page: always the newest rows
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True, number=self.number - 1)
+
+    # ── Cursor ─────────────────────────────────────────────────────────────────
+    def encode_cursor(self, row, reverse, number):
+        position = [self._key(row, name) for name in self.fields]
+        payload = {
+            "p": [
+                value.isoformat() if hasattr(value, "isoformat") else value
+                for value in position
+            ],
+            "r": reverse,
+            "n": number,
+        }
+        token = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False, 1
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            position = [
+                field.to_python(value)
+                for field, value in zip(self.model_fields, payload["p"], strict=True)
+            ]
+            return position, bool(payload["r"]), max(int(payload["n"]), 1)
+        except Exception:
+            raise NotFound("Invalid cursor")
+
+    # ── Helpers ────────────────────────────────────────────────────────────────
+    @staticmethod
+    def _key(row, name):
+        return row[name] if isinstance(row, dict) else getattr(row, name)
+
+    @staticmethod
+    def _invert(ordering):
+        return tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+
+    @staticmethod
+    def _after(ordering, position):
+        """Rows strictly after `position` in `ordering` (a row-value comparison)."""
+        condition = Q()
+        equal = {}
+        for name, value in zip(ordering, position):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return condition
@@ -27,6 +27,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third-party apps
     'corsheaders',
@@ -100,11 +101,29 @@ CHANNEL_LAYERS = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv("REDIS_URL", "redis://127.0.0.1:6379/1"),
+    }
+}
+
 CELERY_BROKER_URL = "redis://127.0.0.1:6379/0"
 # TODO: currenly working on 1 cpu because db is free version, Update later
 CELERY_WORKER_POOL = 'solo'
 CELERY_WORKER_CONCURRENCY = 1 
 
+# ----------------- Booking -----------------
+# "aggregate": totals recomputed with SUM() once per transaction.
+# "incremental": subtotal changes applied to parents as F() deltas;
+#                audited nightly by booking.tasks.reconcile_booking_totals.
+BOOKING_TOTALS_MODE = os.getenv("BOOKING_TOTALS_MODE", "aggregate")
+
+# ----------------- Attendance -----------------
+# Redis set of (user, date) pairs whose attendance/salary reports are stale;
+# drained by attendance.tasks.drain_attendance_queue.
+ATTENDANCE_QUEUE_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/1")
+
 PUSH_NOTIFICATIONS_SETTINGS = {
     'FCM_API_KEY': 'your-firebase-key',   # Android
     'APNS_CERTIFICATE': '/path/to/cert',  # iOS
@@ -193,6 +212,10 @@ STORAGES = {
     "default": {
         "BACKEND": "cloudinary_storage.storage.MediaCloudinaryStorage"
     },
+    # CSV/XLSX ledger exports (booking.tasks.export_ledger)
+    "exports": {
+        "BACKEND": "cloudinary_storage.storage.RawMediaCloudinaryStorage"
+    },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
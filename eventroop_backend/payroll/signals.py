@@ -1,10 +1,9 @@
 from decimal import Decimal
-from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
-from .models import SalaryStructure
-from .utils import SalaryCalculator
+from attendance import recompute
+from .models import SalaryReport, SalaryStructure, SalaryTransaction
 
 # SalaryStructure chain recalculation
 def calculate_final_salary(change_type, amount, previous_salary):
@@ -48,7 +47,7 @@ def rebuild_salary_chain(user):
 def handle_salary_structure_change(instance):
     """
     Rebuild salary chain immediately.
-    Refresh SalaryReports AFTER transaction commits.
+    Mark the user's reports stale from effective_from (see attendance.recompute).
     """
 
     user = instance.user
@@ -56,10 +55,8 @@ def handle_salary_structure_change(instance):
 
     rebuild_salary_chain(user)
 
-    # IMPORTANT: refresh salary reports only after commit
-    transaction.on_commit(
-        lambda: SalaryCalculator(user).refresh_salary_reports()
-    )
+    # Reports from effective_from on are rebuilt by the attendance worker after commit
+    recompute.mark_stale(user.pk, effective_from)
 
 # Signals
 @receiver(post_save, sender=SalaryStructure)
@@ -69,3 +66,16 @@ def on_salary_structure_save(sender, instance, **kwargs):
 @receiver(post_delete, sender=SalaryStructure)
 def on_salary_structure_delete(sender, instance, **kwargs):
     handle_salary_structure_change(instance)
+
+# SalaryTransaction → carry-forward of every later SalaryReport
+@receiver(post_save, sender=SalaryTransaction)
+@receiver(post_delete, sender=SalaryTransaction)
+def on_salary_transaction_change(sender, instance, **kwargs):
+    report = (
+        SalaryReport.objects
+        .filter(pk=instance.salary_report_id)
+        .values_list("user_id", "start_date")
+        .first()
+    )
+    if report:
+        recompute.mark_stale(*report)
@@ -1,3 +1,89 @@
+from datetime import date
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import CustomUser
+from attendance.models import Attendance
+from attendance.tests import make_staff, make_statuses, seed_attendance
+from attendance.utils import AttendanceCalculator
+
+from .models import SalaryReport, SalaryStructure, SalaryTransaction
+from .utils import SalaryCalculator
+
+
+# ----------------------------------------------------------
+# LEDGER TAIL REFRESH (since=) vs. FULL REFRESH
+# ----------------------------------------------------------
+class SalaryLedgerRefreshTests(TestCase):
+    START = date(2030, 10, 1)
+    END = date(2031, 3, 31)
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = CustomUser.objects.create_superuser(
+            "admin@payroll.test", "7120000000", "pw", first_name="A", last_name="P",
+            gender="M", address="-", city="-",
+        )
+        cls.statuses = {status.code: status for status in make_statuses(owner)}
+        cls.user = make_staff(1)
+        seed_attendance([cls.user], list(cls.statuses.values()), cls.START, cls.END, seed=25)
+
+        SalaryStructure.objects.create(
+            user=cls.user, salary_type="MONTHLY", change_type="BASE_SALARY",
+            amount=Decimal("30000.00"), effective_from=cls.START,
+        )
+        SalaryStructure.objects.create(
+            user=cls.user, salary_type="MONTHLY", change_type="INCREMENT",
+            amount=Decimal("3000.00"), effective_from=date(2031, 1, 16),
+        )
+
+        AttendanceCalculator(cls.user).get_all_periods_attendance(cls.START, cls.END, "MONTHLY")
+        SalaryCalculator(cls.user).refresh_salary_reports()
+        for start, amount in ((date(2030, 10, 1), "20000.00"), (date(2030, 11, 1), "45000.00")):
+            cls.pay(start, amount)
+        SalaryCalculator(cls.user).refresh_salary_reports()
+
+    @classmethod
+    def pay(cls, start, amount):
+        return SalaryTransaction.objects.create(
+            salary_report=SalaryReport.objects.get(user=cls.user, start_date=start),
+            amount_paid=Decimal(amount), payment_method="CASH", status="SUCCESS",
+        )
+
+    def ledger(self):
+        return list(
+            SalaryReport.objects
+            .filter(user=self.user)
+            .order_by("start_date", "end_date")
+            .values_list("start_date", "end_date", *SalaryCalculator.LEDGER_FIELDS)
+        )
+
+    def assert_refreshed_like_full(self, since):
+        changed = SalaryCalculator(self.user).refresh_salary_reports(since=since)
+        self.assertTrue(changed)
+        self.assertTrue(all(report.end_date >= since for report in changed))
+
+        ledger = self.ledger()
+        # Everything since= should have rewritten is already in place
+        self.assertEqual(SalaryCalculator(self.user).refresh_salary_reports(), [])
+        self.assertEqual(self.ledger(), ledger)
+
+    def test_attendance_change_mid_history(self):
+        changed_day = date(2031, 1, 10)
+        Attendance.objects.filter(user=self.user, date__month=1).update(status=self.statuses["ABSENT"])
+        AttendanceCalculator(self.user).get_all_periods_attendance(changed_day, changed_day, "MONTHLY")
+
+        self.assert_refreshed_like_full(changed_day)
+
+    def test_salary_transaction_added_mid_history(self):
+        self.pay(date(2030, 12, 1), "15000.00")
+
+        self.assert_refreshed_like_full(date(2030, 12, 1))
+
+    def test_salary_transaction_changed_mid_history(self):
+        payment = SalaryTransaction.objects.get(salary_report__start_date=date(2030, 11, 1))
+        payment.amount_paid = Decimal("5000.00")
+        payment.save()
+
+        self.assert_refreshed_like_full(date(2030, 11, 1))
@@ -1,6 +1,7 @@
+import bisect
 from decimal import Decimal, ROUND_HALF_UP
 from datetime import date
-from django.db.models import Sum,F
+from django.db.models import Exists, Min, OuterRef, Sum,F
 from collections import defaultdict
 from payroll.models import SalaryStructure, SalaryReport,SalaryTransaction
 from attendance.models import AttendanceReport
@@ -45,21 +46,98 @@ class SalaryCalculator:
         )
 
     # --------------------------------------------------
-    def refresh_salary_reports(self):
-        attendance_reports = list(
+    LEDGER_FIELDS = [
+        "daily_rate",
+        "total_payable_amount",
+        "paid_amount",
+        "advance_amount",
+        "remaining_payment",
+        "final_salary",
+    ]
+
+    def _salary_timeline(self):
+        """Salary structures of the user by effective_from, for get_salary_snapshot() without a query each."""
+        structures = list(
+            SalaryStructure.objects
+            .filter(user=self.user, change_type__in=["BASE_SALARY", "INCREMENT"])
+            .order_by("effective_from")
+        )
+        return [structure.effective_from for structure in structures], structures
+
+    @staticmethod
+    def _snapshot_on(timeline, check_date):
+        dates, structures = timeline
+        index = bisect.bisect_right(dates, check_date)
+        return structures[index - 1] if index else None
+
+    def _tail_start(self, since):
+        """Start of the first period (in ledger order) a change on `since` affects."""
+        return (
             AttendanceReport.objects
-            .filter(user=self.user)
+            .filter(user=self.user, end_date__gte=since)
+            .aggregate(first=Min("start_date"))["first"]
+        )
+
+    def _opening_balance(self, tail_start):
+        """
+        remaining_payment of the last ledger row before the tail (the anchor):
+        the running balance carried into the tail.
+        """
+        anchor = (
+            SalaryReport.objects
+            .filter(
+                # Only rows the ledger maintains: those backed by an attendance report
+                Exists(
+                    AttendanceReport.objects.filter(
+                        user=OuterRef("user"),
+                        start_date=OuterRef("start_date"),
+                        end_date=OuterRef("end_date"),
+                    )
+                ),
+                user=self.user,
+                start_date__lt=tail_start,
+            )
+            .order_by("-start_date", "-end_date")
+            .values_list("remaining_payment", flat=True)
+            .first()
+        )
+        return anchor if anchor is not None else Decimal("0.00")
+
+    def refresh_salary_reports(self, since=None):
+        """
+        Rebuild the user's SalaryReport ledger (one row per AttendanceReport,
+        in start/end date order, each carrying the running balance forward)
+        from the period affected by a change on `since` onward; everything
+        when `since` is None.
+
+        The opening balance is read from the single anchor row before that
+        period, and only the rows of the tail whose values changed are
+        upserted. Returns the upserted rows.
+        """
+        attendance_qs = AttendanceReport.objects.filter(user=self.user)
+        salary_qs = SalaryReport.objects.filter(user=self.user)
+        paid_qs = SalaryTransaction.objects.filter(salary_report__user=self.user, status="SUCCESS")
+        carry_forward = Decimal("0.00")
+
+        if since is not None:
+            tail_start = self._tail_start(since)
+            if tail_start is None:
+                return []
+            attendance_qs = attendance_qs.filter(start_date__gte=tail_start)
+            salary_qs = salary_qs.filter(start_date__gte=tail_start)
+            paid_qs = paid_qs.filter(salary_report__start_date__gte=tail_start)
+            carry_forward = self._opening_balance(tail_start)
+
+        attendance_reports = list(
+            attendance_qs
+            .order_by("start_date", "end_date")
             .only("start_date", "end_date", "total_payable_days")
         )
 
         # Aggregate all paid amounts in ONE query
         paid_amount_map = defaultdict(Decimal)
         paid_qs = (
-            SalaryTransaction.objects
-            .filter(
-                salary_report__user=self.user,
-                status="SUCCESS",
-            )
+            paid_qs
             .values(
                 "salary_report__start_date",
                 "salary_report__end_date",
@@ -72,21 +150,16 @@ class SalaryCalculator:
                 (row["salary_report__start_date"], row["salary_report__end_date"])
             ] = row["total"] or Decimal("0.00")
 
-        
-        # Cache salary snapshot per end_date
-        salary_reports = []
-        salary_cache = {}
-        carry_forward = Decimal("0.00")
+        existing = {
+            (row[0], row[1]): row[2:]
+            for row in salary_qs.values_list("start_date", "end_date", *self.LEDGER_FIELDS)
+        }
 
-        attendance_reports = sorted(attendance_reports, key=lambda x: x.start_date)
+        timeline = self._salary_timeline()
+        salary_reports = []
 
         for attendance in attendance_reports:
-            if attendance.end_date not in salary_cache:
-                salary_cache[attendance.end_date] = self.get_salary_snapshot(
-                    attendance.end_date
-                )
-
-            salary_obj = salary_cache[attendance.end_date]
+            salary_obj = self._snapshot_on(timeline, attendance.end_date)
 
             daily_rate = self.get_daily_rate(salary_obj)
             payable_days = attendance.total_payable_days or Decimal("0")
@@ -116,30 +189,28 @@ class SalaryCalculator:
             
             advance_total = remaining_payment if remaining_payment > 0 else Decimal("0.00")
 
-            salary_reports.append(
-                SalaryReport(
-                    user=self.user,
-                    start_date=attendance.start_date,
-                    end_date=attendance.end_date,
-                    daily_rate=daily_rate.quantize(Decimal("0.01")),
-                    total_payable_amount=total_amount,
-                    advance_amount = advance_total,
-                    paid_amount=paid_amount,
-                    remaining_payment=remaining_payment,
-                    final_salary=salary_obj.final_salary if salary_obj else Decimal("0"),
-                )
+            report = SalaryReport(
+                user=self.user,
+                start_date=attendance.start_date,
+                end_date=attendance.end_date,
+                daily_rate=daily_rate.quantize(Decimal("0.01")),
+                total_payable_amount=total_amount,
+                advance_amount = advance_total,
+                paid_amount=paid_amount,
+                remaining_payment=remaining_payment,
+                final_salary=salary_obj.final_salary if salary_obj else Decimal("0"),
             )
-        
-        SalaryReport.objects.bulk_create(
-            salary_reports,
-            update_conflicts=True,
-            unique_fields=["user", "start_date", "end_date"],
-            update_fields=[
-                "daily_rate",
-                "total_payable_amount",
-                "paid_amount",
-                "advance_amount",
-                "remaining_payment",
-                "final_salary",
-            ],
-        )
\ No newline at end of file
+
+            # Upsert only what changed
+            values = tuple(getattr(report, field) for field in self.LEDGER_FIELDS)
+            if existing.get((report.start_date, report.end_date)) != values:
+                salary_reports.append(report)
+
+        if salary_reports:
+            SalaryReport.objects.bulk_create(
+                salary_reports,
+                update_conflicts=True,
+                unique_fields=["user", "start_date", "end_date"],
+                update_fields=self.LEDGER_FIELDS + ["updated_at"],
+            )
+        return salary_reports
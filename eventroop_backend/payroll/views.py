@@ -2,14 +2,13 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import *
 from .serializers import *
-from .utils import SalaryCalculator 
+from attendance import recompute
 from rest_framework import viewsets, status
 from datetime import datetime, timedelta
 from rest_framework.views import APIView
 from dateutil.relativedelta import relativedelta
 from django.db import transaction as db_transaction
 from django.utils import timezone
-from django.shortcuts import get_object_or_404
 from django.db.models import Sum
 
 class SalaryStructureViewSet(viewsets.ModelViewSet):
@@ -97,11 +96,7 @@ class SalaryReportAPIView(APIView):
                 queryset = queryset.filter(user_id=user_id)
             except ValueError:
                 return queryset.none()
-            report_user = get_object_or_404(CustomUser, id=user_id)
-                
-            with db_transaction.atomic():
-                SalaryCalculator(report_user).refresh_salary_reports()
-                
+
         # Initialize default date range (6 months to end of current month)
         today = datetime.now().date()
         end_date = (today.replace(day=1) + relativedelta(months=1)) - timedelta(days=1)  # Last day of current month
@@ -157,7 +152,15 @@ class SalaryReportAPIView(APIView):
 
         # ----- List reports -----
         serializer = SalaryReportSerializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+
+        # Read-only: stored rows are served as they are, stale ones are rebuilt by the worker
+        user_id = request.query_params.get("user_id")
+        if user_id and user_id.isdigit():
+            stale_from = recompute.stale_from(int(user_id))
+            if stale_from:
+                response["X-Reports-Stale-From"] = stale_from.isoformat()
+        return response
 
 class SalaryTransactionViewSet(viewsets.ModelViewSet):
     serializer_class = SalaryTransactionSerializer